@@ -0,0 +1,449 @@
+#!/usr/bin/env python3
+"""
+Calendar Benchmarks
+
+Runs reproducible performance scenarios for the calendar scripts.
+Inputs are generated from a fixed seed, so results are comparable between runs.
+
+Usage:
+  python benchmark.py                    # run all scenarios
+  python benchmark.py parse --size 100000
+  python benchmark.py diff serialize
+"""
+
+import io
+import os
+import re
+import sys
+import time
+import tempfile
+import random
+import argparse
+import threading
+import contextlib
+import http.client
+import http.server
+from concurrent.futures import ThreadPoolExecutor
+
+import icalendar
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from series_parser import SummaryParser
+from feed_server import FeedServer
+from calendar_diff import diff_calendars, iter_events
+from event_hash import unfold
+from ics_writer import ICSWriter
+from update_calendar_images import write_calendar
+from calendar_snapshot import load_calendar, discard_snapshot
+from tmdb_cache import ResponseCache
+from check_images import ALIVE_TTL, DEAD_TTL, ImageChecker, check_calendar_images
+from memory_profile import MemoryProfiler, format_bytes
+
+SEED = 20250519
+
+SAMPLE_TITLES = [
+    "The Apothecary Diaries",
+    "The Shiunji Family Children",
+    "Demon Slayer",
+    "My Hero Academia",
+    "Frieren: Beyond Journey's End",
+    "Re:Zero - Starting Life in Another World",
+    "Solo Leveling",
+    "Kaiju No. 8",
+]
+
+
+def legacy_extract_series_info(summary):
+    """The original per-call re.search implementation, kept as a baseline."""
+    pattern = r"(.*?)(?:S(\d+)|Season (\d+))?\s*-\s*Episode\s*(\d+)"
+    match = re.search(pattern, summary, re.IGNORECASE)
+
+    if match:
+        series = match.group(1).strip()
+        season = match.group(2) or match.group(3) or "1"
+        episode = match.group(4)
+        return series, int(season), int(episode)
+
+    return None, None, None
+
+
+def generate_summaries(size, seed=SEED):
+    """Generate a realistic mix of event summaries."""
+    rng = random.Random(seed)
+    summaries = []
+    for _ in range(size):
+        title = rng.choice(SAMPLE_TITLES)
+        episode = rng.randint(1, 60)
+        form = rng.random()
+        if form < 0.6:
+            summaries.append(f"{title} S{rng.randint(1, 5)} - Episode {episode}")
+        elif form < 0.85:
+            summaries.append(f"{title} - Episode {episode}")
+        elif form < 0.95:
+            summaries.append(f"{title} Season {rng.randint(1, 5)} - Episode {episode}")
+        else:
+            summaries.append(f"{title} Special Broadcast")
+    return summaries
+
+
+def generate_event(index, rng):
+    """Generate one VEVENT in the style of main.ics."""
+    title = rng.choice(SAMPLE_TITLES)
+    day = index // 24
+    return '\n'.join([
+        "BEGIN:VEVENT",
+        f"UID:bench-{index}@anime-calendar",
+        f"DTSTAMP:20250519T000000Z",
+        f"DTSTART:2025{1 + day // 28 % 12:02d}{1 + day % 28:02d}T{index % 24:02d}0000Z",
+        f"DTEND:2025{1 + day // 28 % 12:02d}{1 + day % 28:02d}T{index % 24:02d}3000Z",
+        f"SUMMARY:{title} S{rng.randint(1, 5)} - Episode {rng.randint(1, 60)}",
+        f"DESCRIPTION:New episode of {title}. Streaming weekly with subtitles in \n",
+        " multiple languages.",
+        "CATEGORIES:Anime",
+        "STATUS:CONFIRMED",
+        "BEGIN:VALARM",
+        "ACTION:DISPLAY",
+        f"DESCRIPTION:Reminder: {title} airs soon!",
+        "TRIGGER:-PT15M",
+        "END:VALARM",
+        "END:VEVENT",
+    ])
+
+
+def generate_calendar(size, seed=SEED):
+    """Generate a calendar with the given number of events."""
+    rng = random.Random(seed)
+    events = [generate_event(i, rng) for i in range(size)]
+    return "BEGIN:VCALENDAR\nVERSION:2.0\nPRODID:-//Benchmark//EN\n" + '\n'.join(events) + "\nEND:VCALENDAR\n"
+
+
+def timed(func, *args):
+    start = time.perf_counter()
+    result = func(*args)
+    return result, time.perf_counter() - start
+
+
+def report(name, seconds, count, unit='items'):
+    rate = count / seconds if seconds else float('inf')
+    print(f"  {name:<32} {seconds * 1000:10.1f} ms  {rate:14,.0f} {unit}/s")
+
+
+def bench_parse(args):
+    """Summary parsing: legacy regex vs. precompiled/fast-path parser (cold and memoized)."""
+    summaries = generate_summaries(args.size)
+    unique = len(set(summaries))
+    print(f"parse: {len(summaries):,} summaries ({unique:,} unique)")
+
+    legacy, seconds = timed(lambda: [legacy_extract_series_info(s) for s in summaries])
+    report("legacy re.search", seconds, len(summaries))
+
+    parser = SummaryParser(cache_size=0)
+    uncached, seconds = timed(lambda: [parser.parse(s) for s in summaries])
+    report("precompiled, no cache", seconds, len(summaries))
+
+    parser = SummaryParser()
+    cached, seconds = timed(lambda: [parser.parse(s) for s in summaries])
+    report("precompiled + memoized", seconds, len(summaries))
+
+    mismatches = sum(1 for a, b in zip(legacy, cached) if a != b)
+    if uncached != cached or mismatches:
+        print(f"  ⚠️ {mismatches} results differ from the legacy parser")
+        return False
+    return True
+
+
+def bench_serve(args):
+    """Feed server under concurrent polling clients using conditional GETs."""
+    feed_file = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'main.ics')
+    server = FeedServer(('127.0.0.1', 0), [feed_file], quiet=True)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+
+    host, port = server.server_address[:2]
+    per_client = max(1, args.requests // args.clients)
+    print(f"serve: {args.clients} clients x {per_client} polls of {os.path.basename(feed_file)}")
+
+    def poll():
+        statuses = []
+        received = 0
+        etag = None
+        connection = http.client.HTTPConnection(host, port)
+        try:
+            for _ in range(per_client):
+                headers = {'Accept-Encoding': 'gzip'}
+                if etag:
+                    headers['If-None-Match'] = etag
+                connection.request('GET', '/main.ics', headers=headers)
+                response = connection.getresponse()
+                received += len(response.read())
+                etag = response.getheader('ETag') or etag
+                statuses.append(response.status)
+        finally:
+            connection.close()
+        return statuses, received
+
+    try:
+        with ThreadPoolExecutor(max_workers=args.clients) as pool:
+            results, seconds = timed(lambda: list(pool.map(lambda _: poll(), range(args.clients))))
+    finally:
+        server.shutdown()
+        server.server_close()
+
+    statuses = [status for client, _ in results for status in client]
+    received = sum(size for _, size in results)
+    full_size = os.path.getsize(feed_file) * len(statuses)
+    report("conditional GET polls", seconds, len(statuses), 'requests')
+    print(f"  {statuses.count(200)} x 200, {statuses.count(304)} x 304, "
+          f"{received:,} body bytes (vs {full_size:,} for uncompressed full downloads)")
+    return all(status in (200, 304) for status in statuses)
+
+
+def bench_diff(args):
+    """Semantic calendar diff between two versions of a generated calendar."""
+    old_content = generate_calendar(args.size)
+    events = re.findall(r'BEGIN:VEVENT.*?END:VEVENT', old_content, re.DOTALL)
+    rng = random.Random(SEED + 1)
+
+    new_events = []
+    expected = {'modified': 0, 'removed': 0}
+    for i, event in enumerate(events):
+        if i % 100 == 0:
+            expected['removed'] += 1
+            continue
+        if i % 50 == 25:
+            event = event.replace('STATUS:CONFIRMED', 'STATUS:CANCELLED')
+            expected['modified'] += 1
+        elif i % 10 == 3:
+            # Refold the description and bump bookkeeping: not a semantic change
+            event = event.replace('in \n multiple', 'in\n  multiple')
+            event = event.replace('DTSTAMP:20250519T000000Z', 'DTSTAMP:20250601T000000Z')
+        new_events.append(event)
+    new_events += [generate_event(args.size + i, rng) for i in range(args.size // 100)]
+    rng.shuffle(new_events)
+    new_content = "BEGIN:VCALENDAR\nVERSION:2.0\n" + '\n'.join(new_events) + "\nEND:VCALENDAR\n"
+
+    print(f"diff: {len(events):,} events vs {len(new_events):,} events (shuffled)")
+    diff, seconds = timed(diff_calendars, old_content, new_content)
+    report("diff_calendars", seconds, len(events) + len(new_events), 'events')
+
+    counts = {'added': len(diff.added), 'removed': len(diff.removed), 'modified': len(diff.modified)}
+    expected['added'] = args.size // 100
+    if counts != expected:
+        print(f"  ⚠️ expected {expected}, got {counts}")
+        return False
+    return True
+
+
+def bench_serialize(args):
+    """Calendar serialization: icalendar's to_ical() vs. the streaming ICSWriter."""
+    # icalendar parsing dominates the setup time, so cap the input size
+    size = min(args.size, 20000)
+    content = generate_calendar(size)
+    cal = icalendar.Calendar.from_ical(content)
+    print(f"serialize: {size:,} events")
+
+    baseline, seconds = timed(lambda: cal.to_ical(sorted=False))
+    report("icalendar to_ical()", seconds, size, 'events')
+
+    def stream_all():
+        buffer = io.StringIO()
+        ICSWriter(buffer).write_component(cal)
+        return buffer.getvalue()
+
+    streamed, seconds = timed(stream_all)
+    report("ICSWriter, every event", seconds, size, 'events')
+
+    changed = {id(component) for component in list(cal.walk('VEVENT'))[::100]}
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, 'calendar.ics')
+        _, seconds = timed(write_calendar, path, content, cal, changed)
+        report("ICSWriter, 1% changed, to disk", seconds, size, 'events')
+        with open(path, 'r', newline='') as f:
+            written = f.read()
+
+    if unfold(streamed) != unfold(baseline.decode('utf-8')) or written.count('BEGIN:VEVENT') != size:
+        print("  ⚠️ serialized output differs from icalendar's")
+        return False
+    return True
+
+
+def bench_snapshot(args):
+    """Loading a calendar: parsing the text vs. its pickled snapshot."""
+    size = min(args.size, 20000)
+    content = generate_calendar(size)
+    print(f"snapshot: {size:,} events")
+
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, 'calendar.ics')
+        with open(path, 'w', newline='') as f:
+            f.write(content)
+        try:
+            (_, parsed), seconds = timed(load_calendar, path)
+            report("parse + write snapshot", seconds, size, 'events')
+
+            (_, loaded), seconds = timed(load_calendar, path)
+            report("snapshot, file unchanged", seconds, size, 'events')
+
+            # Same content with a new mtime: only the content hash is checked
+            os.utime(path, ns=(0, 0))
+            (_, touched), seconds = timed(load_calendar, path)
+            report("snapshot, file touched", seconds, size, 'events')
+        finally:
+            discard_snapshot(path)
+
+    expected = parsed.to_ical(sorted=False)
+    if loaded.to_ical(sorted=False) != expected or touched.to_ical(sorted=False) != expected:
+        print("  ⚠️ snapshot differs from the parsed calendar")
+        return False
+    return True
+
+
+class StubImageHandler(http.server.BaseHTTPRequestHandler):
+    """Stub image host: /alive/* exists, /dead/* is gone, /nohead/* exists but rejects HEAD."""
+
+    protocol_version = 'HTTP/1.1'
+
+    def _respond(self, status):
+        self.send_response(status)
+        self.send_header('Content-Length', '0')
+        self.end_headers()
+
+    def do_HEAD(self):
+        if self.path.startswith('/nohead/'):
+            self._respond(405)
+        else:
+            self._respond(404 if self.path.startswith('/dead/') else 200)
+
+    def do_GET(self):
+        self._respond(404 if self.path.startswith('/dead/') else 200)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def bench_images(args):
+    """Image liveness checks against a local stub server, cold and cached."""
+    size = min(args.size, 5000)
+    server = http.server.ThreadingHTTPServer(('127.0.0.1', 0), StubImageHandler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    host, port = server.server_address[:2]
+
+    # Every 20th image is dead and every 50th only answers GET; images are shared by two events
+    def image_url(index):
+        kind = 'dead' if index % 20 == 0 else 'nohead' if index % 50 == 1 else 'alive'
+        return f"http://{host}:{port}/{kind}/{index}.jpg"
+
+    rng = random.Random(SEED)
+    events = [
+        generate_event(i, rng).replace("STATUS:CONFIRMED",
+                                       f"STATUS:CONFIRMED\nIMAGE;VALUE=URI:{image_url(i // 2)}")
+        for i in range(size * 2)
+    ]
+    content = "BEGIN:VCALENDAR\nVERSION:2.0\nPRODID:-//Benchmark//EN\n" + '\n'.join(events) + "\nEND:VCALENDAR\n"
+    expected_dead = sum(1 for index in range(size) if index % 20 == 0)
+    print(f"images: {size:,} unique images on {size * 2:,} events")
+
+    try:
+        with tempfile.TemporaryDirectory() as directory:
+            ics_file = os.path.join(directory, 'calendar.ics')
+            with open(ics_file, 'w') as f:
+                f.write(content)
+            cache = ResponseCache(os.path.join(directory, 'liveness.db'), ALIVE_TTL, DEAD_TTL)
+            queue_file = os.path.join(directory, 'queue.json')
+            try:
+                with contextlib.redirect_stdout(io.StringIO()):
+                    checker = ImageChecker(cache, rate=0, workers=16)
+                    (cold, uids), cold_seconds = timed(check_calendar_images, ics_file, checker, queue_file)
+                    checker.close()
+                    checker = ImageChecker(cache, rate=0, workers=16)
+                    (cached, _), cached_seconds = timed(check_calendar_images, ics_file, checker, queue_file)
+                    checker.close()
+            finally:
+                cache.close()
+    finally:
+        server.shutdown()
+        server.server_close()
+
+    report("HEAD checks, 16 workers", cold_seconds, size, 'images')
+    report("cached results", cached_seconds, size, 'images')
+    dead = sum(1 for state in cold.values() if state == 'dead')
+    print(f"  {dead} dead images, {len(uids)} events queued for re-enrichment")
+    if dead != expected_dead or len(uids) != expected_dead * 2 or cold != cached:
+        print("  ⚠️ liveness results differ from the stub server's")
+        return False
+    return True
+
+
+# Traced peak per event allowed while parsing with icalendar (measured: ~8 KiB)
+PARSE_BYTES_PER_EVENT = 16 * 1024
+
+
+def bench_memory(args):
+    """Memory per stage of a refresh-like run: split, parse, stream to disk."""
+    # Tracing makes icalendar parsing several times slower
+    size = min(args.size, 5000)
+    content = generate_calendar(size)
+    print(f"memory: {size:,} events")
+
+    profiler = MemoryProfiler(top=5)
+    profiler.start()
+    try:
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'calendar.ics')
+            with profiler.stage('split events') as split:
+                events = list(iter_events(content))
+                split.events = len(events)
+            del events
+            with profiler.stage('icalendar parse') as parse:
+                cal = icalendar.Calendar.from_ical(content)
+                parse.events = size
+            with profiler.stage('stream write') as write:
+                changed = {id(component) for component in list(cal.walk('VEVENT'))[::100]}
+                write_calendar(path, content, cal, changed)
+                write.events = size
+        profiler.report()
+    finally:
+        profiler.stop()
+
+    per_event = parse.peak / size
+    if per_event > PARSE_BYTES_PER_EVENT:
+        print(f"  ⚠️ parsing took {format_bytes(per_event)} per event "
+              f"(budget {format_bytes(PARSE_BYTES_PER_EVENT)})")
+        return False
+    return True
+
+
+SCENARIOS = {
+    'parse': bench_parse,
+    'serve': bench_serve,
+    'diff': bench_diff,
+    'serialize': bench_serialize,
+    'snapshot': bench_snapshot,
+    'images': bench_images,
+    'memory': bench_memory,
+}
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Run calendar performance benchmarks.')
+    parser.add_argument('scenarios', nargs='*', metavar='SCENARIO',
+                        help=f"Scenarios to run: {', '.join(SCENARIOS)} (default: all)")
+    parser.add_argument('--size', type=int, default=100000, help='Number of generated items per scenario')
+    parser.add_argument('--requests', type=int, default=2000, help='Total HTTP requests for the serve scenario')
+    parser.add_argument('--clients', type=int, default=16, help='Concurrent clients for the serve scenario')
+
+    args = parser.parse_args()
+
+    unknown = [name for name in args.scenarios if name not in SCENARIOS]
+    if unknown:
+        parser.error(f"unknown scenario: {', '.join(unknown)}")
+
+    ok = True
+    for name in args.scenarios or SCENARIOS:
+        ok = SCENARIOS[name](args) and ok
+    return 0 if ok else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,317 @@
+#!/usr/bin/env python3
+"""
+Build the Schedule Site
+
+Generates a static, multi-page preview of the schedule under docs/schedule/:
+
+  index.html              links to every month and show
+  months/2025-05.html     episodes airing in a month (UTC)
+  shows/<slug>.html       every episode of one show
+
+Builds are incremental. A manifest next to the pages records a content hash
+per event and per page; an event whose text is unchanged is not parsed
+again, and only pages whose events changed are re-rendered and written, so a
+rebuild costs about as much as the change itself. Pages of months or shows
+that disappeared from the calendar are removed.
+
+Usage:
+  python build_site.py [--ics-file main.ics] [--output-dir docs/schedule] [--full]
+"""
+
+import os
+import re
+import sys
+import json
+import html
+import hashlib
+import argparse
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from output_writer import AtomicWriter
+from calendar_diff import iter_events
+from export_json import event_record
+from tmdb_images import resize_image_url
+import memory_profile
+
+# Bump when the page templates change, so every page is rendered again
+TEMPLATE_VERSION = 2
+
+MANIFEST_NAME = '.manifest.json'
+SLUG_INVALID = re.compile(r'[^a-z0-9]+')
+
+STYLE = """
+        body { font-family: Arial, sans-serif; margin: 20px; max-width: 900px; }
+        h1 { color: #31a59f; }
+        nav { margin-bottom: 20px; }
+        .event {
+            margin-bottom: 20px;
+            padding: 15px;
+            border: 1px solid #ccc;
+            border-radius: 8px;
+            display: flex;
+            align-items: center;
+        }
+        .event-details { margin-left: 20px; }
+        .event-image, .no-image {
+            width: 150px;
+            height: 85px;
+            object-fit: cover;
+            border-radius: 4px;
+            flex-shrink: 0;
+        }
+        .no-image {
+            background-color: #f0f0f0;
+            display: flex;
+            align-items: center;
+            justify-content: center;
+        }
+        .columns { columns: 2; }"""
+
+
+def _digest(value):
+    return hashlib.sha256(value.encode('utf-8')).hexdigest()[:16]
+
+
+def show_slug(title):
+    """File name for a show page: "Re:Zero (2016)" -> "re-zero-2016"."""
+    slug = SLUG_INVALID.sub('-', title.lower()).strip('-')
+    return slug or _digest(title)[:8]
+
+
+def _assign_slugs(titles):
+    """Map show titles to unique slugs; titles that would share one get a hash suffix."""
+    by_slug = {}
+    for title in titles:
+        by_slug.setdefault(show_slug(title), []).append(title)
+    slugs = {}
+    for slug, shared in by_slug.items():
+        for title in shared:
+            slugs[title] = slug if len(shared) == 1 else f"{slug}-{_digest(title)[:6]}"
+    return slugs
+
+
+def _format_start(start):
+    # 2025-05-24T13:00:00Z -> 2025-05-24 13:00 UTC
+    return f"{start[:10]} {start[11:16]} UTC" if start else 'No Date'
+
+
+def _render_page(title, body, root):
+    return f"""<!DOCTYPE html>
+<html lang="en">
+<head>
+    <meta charset="UTF-8">
+    <meta name="viewport" content="width=device-width, initial-scale=1.0">
+    <title>{html.escape(title)} - Anime Schedule</title>
+    <style>{STYLE}
+    </style>
+</head>
+<body>
+    <nav><a href="{root}index.html">Anime Schedule</a></nav>
+    <h1>{html.escape(title)}</h1>
+{body}
+</body>
+</html>
+"""
+
+
+def _render_event(record, show_link=None, month_link=None):
+    summary = html.escape(record['summary'] or 'No Title')
+    if record['image']:
+        image_url = resize_image_url(record['image'], 'preview')
+        image = f'<img class="event-image" src="{html.escape(image_url)}" alt="{summary}" loading="lazy" />'
+    else:
+        image = '<div class="no-image">No Image</div>'
+    links = []
+    if show_link:
+        links.append(f'<a href="{show_link}">All episodes</a>')
+    if month_link:
+        links.append(f'<a href="{month_link}">Month</a>')
+    return f"""    <div class="event">
+        {image}
+        <div class="event-details">
+            <h3>{summary}</h3>
+            <p>{_format_start(record['start'])}</p>
+            {' · '.join(links)}
+        </div>
+    </div>"""
+
+
+def render_month_page(month, records, slugs):
+    body = '\n'.join(
+        _render_event(record, show_link=f"../shows/{slugs[show_key(record)]}.html")
+        for record in records
+    )
+    return _render_page(f"Episodes in {month}", f"    <p>{len(records)} episodes</p>\n{body}", '../')
+
+
+def render_show_page(show, records):
+    body = '\n'.join(
+        _render_event(record, month_link=f"../months/{record['start'][:7]}.html" if record['start'] else None)
+        for record in records
+    )
+    return _render_page(show, f"    <p>{len(records)} episodes</p>\n{body}", '../')
+
+
+def render_index(months, shows, slugs):
+    month_items = '\n'.join(
+        f'        <li><a href="months/{month}.html">{month}</a> ({count})</li>' for month, count in months
+    )
+    show_items = '\n'.join(
+        f'        <li><a href="shows/{slugs[show]}.html">{html.escape(show)}</a> ({count})</li>' for show, count in shows
+    )
+    body = f"""    <h2>Months</h2>
+    <ul>
+{month_items}
+    </ul>
+    <h2>Shows</h2>
+    <ul class="columns">
+{show_items}
+    </ul>"""
+    return _render_page('Anime Schedule', body, '')
+
+
+def show_key(record):
+    """The show an event is listed under."""
+    return record['series'] or record['summary'] or 'Untitled'
+
+
+def _load_manifest(path):
+    try:
+        with open(path, 'r') as f:
+            manifest = json.load(f)
+    except (OSError, ValueError):
+        return {'events': {}, 'pages': {}}
+    if manifest.get('version') != TEMPLATE_VERSION:
+        return {'events': {}, 'pages': {}}
+    return manifest
+
+
+@memory_profile.profiled('build site')
+def build_site(ics_file, output_dir, full=False):
+    """
+    Generate the site, rewriting only pages whose events changed.
+    Returns (pages written, pages removed).
+    """
+    print(f"Building schedule site from {ics_file} in {output_dir}...")
+
+    with open(ics_file, 'r') as f:
+        content = f.read()
+
+    manifest_path = os.path.join(output_dir, MANIFEST_NAME)
+    manifest = {'events': {}, 'pages': {}} if full else _load_manifest(manifest_path)
+    known = manifest['events']
+
+    # Group events by month and show. Only new or changed events are parsed;
+    # for the rest, the manifest already knows where they are listed.
+    events = {}      # event hash -> event text
+    keys = {}        # event hash -> (month, show)
+    months = {}      # month -> [event hash]
+    shows = {}       # show -> [event hash]
+    records = {}     # event hash -> parsed record
+    for event in iter_events(content):
+        key = _digest(event)
+        if key not in keys:
+            events[key] = event
+            if key in known:
+                keys[key] = tuple(known[key])
+            else:
+                records[key] = event_record(event)
+                keys[key] = ((records[key]['start'] or '')[:7], show_key(records[key]))
+        month, show = keys[key]
+        if month:
+            months.setdefault(month, []).append(key)
+        shows.setdefault(show, []).append(key)
+
+    memory_profile.set_events(sum(len(hashes) for hashes in shows.values()))
+
+    def page_records(hashes):
+        for key in hashes:
+            if key not in records:
+                records[key] = event_record(events[key])
+        return [records[key] for key in hashes]
+
+    slugs = _assign_slugs(shows)
+    pages = {}       # relative path -> (content hash, render function)
+    for month, hashes in months.items():
+        pages[f"months/{month}.html"] = (
+            _digest('\n'.join(hashes)),
+            lambda month=month, hashes=hashes: render_month_page(month, page_records(hashes), slugs),
+        )
+    for show, hashes in shows.items():
+        # Month pages link to show pages, so a show's slug is part of its month pages' content
+        pages[f"shows/{slugs[show]}.html"] = (
+            _digest(show + '\n' + '\n'.join(hashes)),
+            lambda show=show, hashes=hashes: render_show_page(show, page_records(hashes)),
+        )
+    for path, (page_hash, render) in list(pages.items()):
+        if path.startswith('months/'):
+            linked = sorted({slugs[keys[key][1]] for key in months[path[7:-5]]})
+            pages[path] = (_digest(page_hash + '\n' + '\n'.join(linked)), render)
+
+    month_counts = [(month, len(months[month])) for month in sorted(months)]
+    show_counts = [(show, len(shows[show])) for show in sorted(shows, key=str.casefold)]
+    pages['index.html'] = (
+        _digest(json.dumps([month_counts, show_counts, slugs], sort_keys=True)),
+        lambda: render_index(month_counts, show_counts, slugs),
+    )
+
+    written = 0
+    previous = manifest['pages']
+    for path, (page_hash, render) in pages.items():
+        target = os.path.join(output_dir, path)
+        if previous.get(path) == page_hash and os.path.isfile(target):
+            continue
+        os.makedirs(os.path.dirname(target), exist_ok=True)
+        writer = AtomicWriter(target, ignore_volatile=False)
+        with writer as f:
+            f.write(render())
+        written += writer.changed
+
+    removed = 0
+    for path in previous:
+        target = os.path.join(output_dir, path)
+        if path not in pages and os.path.isfile(target):
+            os.unlink(target)
+            removed += 1
+
+    os.makedirs(output_dir, exist_ok=True)
+    with AtomicWriter(manifest_path, ignore_volatile=False) as f:
+        json.dump({
+            'version': TEMPLATE_VERSION,
+            'events': {key: list(value) for key, value in sorted(keys.items())},
+            'pages': {path: page_hash for path, (page_hash, _) in sorted(pages.items())},
+        }, f, ensure_ascii=False, separators=(',', ':'))
+
+    print(f"Site built: {len(pages)} pages, {written} written, {removed} removed "
+          f"({len(records)} of {len(events)} events parsed)")
+    return written, removed
+
+
+def main():
+    root_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+    parser = argparse.ArgumentParser(description='Build the static schedule site (index, month and show pages).')
+    parser.add_argument('--ics-file', default='main.ics', help='Path to the ICS calendar file')
+    parser.add_argument('--output-dir', default=os.path.join(root_dir, 'docs', 'schedule'),
+                        help='Directory for the generated pages')
+    parser.add_argument('--full', action='store_true', help='Render every page, ignoring the manifest')
+    memory_profile.add_argument(parser)
+
+    args = parser.parse_args()
+    if args.profile_memory:
+        memory_profile.enable()
+
+    if not os.path.isfile(args.ics_file):
+        print(f"Error: Calendar file not found: {args.ics_file}")
+        return 1
+
+    try:
+        build_site(args.ics_file, args.output_dir, args.full)
+        return 0
+    except Exception as e:
+        print(f"Error: {e}")
+        return 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
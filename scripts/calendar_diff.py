@@ -0,0 +1,229 @@
+#!/usr/bin/env python3
+"""
+Calendar Diff
+
+Semantic diff of two calendar versions keyed on UID. Events are compared by
+their unfolded properties, so re-folded lines and reordered properties do not
+show up as changes. The report lists added, removed and modified events with
+property-level changes, as text or JSON.
+
+Bookkeeping properties (DTSTAMP, LAST-MODIFIED, SEQUENCE and the content
+hash) are ignored unless --all-properties is given.
+
+Usage:
+  python calendar_diff.py OLD.ics NEW.ics [--json] [--all-properties]
+
+Exit status is 0 when the calendars match, 1 when they differ and 2 on error.
+"""
+
+import os
+import re
+import sys
+import json
+import argparse
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from event_hash import BOOKKEEPING_PROPERTIES, unfold, property_name, get_event_property
+
+UID_LINE = re.compile(r'^UID[;:][^\r\n]*(?:\r?\n[ \t][^\r\n]*)*', re.MULTILINE | re.IGNORECASE)
+
+
+def iter_event_spans(content):
+    """Yield the (start, end) offsets of each VEVENT in a calendar."""
+    # str.find is much faster than a lazy DOTALL regex on large calendars
+    start = content.find('BEGIN:VEVENT')
+    while start != -1:
+        end = content.find('END:VEVENT', start)
+        if end == -1:
+            return
+        end += len('END:VEVENT')
+        yield start, end
+        start = content.find('BEGIN:VEVENT', end)
+
+
+def iter_events(content):
+    """Yield the text of each VEVENT in a calendar."""
+    for start, end in iter_event_spans(content):
+        yield content[start:end]
+
+
+def event_uid(event_text):
+    """Return an event's UID (the first UID line, which precedes any sub-component)."""
+    match = UID_LINE.search(event_text)
+    return unfold(match.group(0)).split(':', 1)[1].strip() if match else ''
+
+
+def index_events(content):
+    """Map UID to event text. Later duplicates of a UID win, as in most clients."""
+    events = {}
+    for event in iter_events(content):
+        uid = event_uid(event)
+        if uid:
+            events[uid] = event
+    return events
+
+
+def event_properties(event_text, ignore=BOOKKEEPING_PROPERTIES):
+    """
+    Return {property: sorted values} for an event. Properties of nested
+    components are prefixed with the component name, e.g. VALARM.TRIGGER.
+    Values keep their parameters, e.g. "TZID=Asia/Tokyo:20250601T120000".
+    """
+    properties = {}
+    components = []
+    for line in unfold(event_text).splitlines():
+        if not line:
+            continue
+        name = property_name(line)
+        if name == 'BEGIN':
+            components.append(line.split(':', 1)[1].strip().upper())
+            continue
+        if name == 'END':
+            if components:
+                components.pop()
+            continue
+        if len(components) == 1 and name in ignore:
+            continue
+        key = '.'.join(components[1:] + [name])
+        properties.setdefault(key, []).append(line[len(name) + 1:])
+
+    for values in properties.values():
+        values.sort()
+    return properties
+
+
+class PropertyChange:
+    """One property that differs between two versions of an event."""
+
+    def __init__(self, name, old, new):
+        self.name = name
+        self.old = old
+        self.new = new
+
+    def to_dict(self):
+        return {'property': self.name, 'old': self.old, 'new': self.new}
+
+
+class CalendarDiff:
+    """The result of comparing two calendars."""
+
+    def __init__(self, added, removed, modified, unchanged):
+        self.added = added          # {uid: event text}
+        self.removed = removed      # {uid: event text}
+        self.modified = modified    # {uid: (new event text, [PropertyChange])}
+        self.unchanged = unchanged  # count
+
+    @property
+    def changed_uids(self):
+        """UIDs of events that are new or modified in the new calendar."""
+        return set(self.added) | set(self.modified)
+
+    def __bool__(self):
+        return bool(self.added or self.removed or self.modified)
+
+    def to_dict(self):
+        def describe(uid, event):
+            return {'uid': uid, 'summary': (get_event_property(event, 'SUMMARY') or '').strip()}
+
+        return {
+            'added': [describe(uid, event) for uid, event in self.added.items()],
+            'removed': [describe(uid, event) for uid, event in self.removed.items()],
+            'modified': [
+                dict(describe(uid, event), changes=[change.to_dict() for change in changes])
+                for uid, (event, changes) in self.modified.items()
+            ],
+            'unchanged': self.unchanged,
+        }
+
+    def format_text(self):
+        report = self.to_dict()
+        lines = [
+            f"{len(self.added)} added, {len(self.removed)} removed, "
+            f"{len(self.modified)} modified, {self.unchanged} unchanged"
+        ]
+        for marker, key in (('+', 'added'), ('-', 'removed')):
+            for event in report[key]:
+                lines.append(f"{marker} {event['summary']} ({event['uid']})")
+        for event in report['modified']:
+            lines.append(f"~ {event['summary']} ({event['uid']})")
+            for change in event['changes']:
+                old = ' | '.join(change['old']) or '(none)'
+                new = ' | '.join(change['new']) or '(none)'
+                lines.append(f"    {change['property']}: {old} -> {new}")
+        return '\n'.join(lines)
+
+
+def diff_events(old_event, new_event, ignore=BOOKKEEPING_PROPERTIES):
+    """Return the list of PropertyChanges between two versions of an event."""
+    old_properties = event_properties(old_event, ignore)
+    new_properties = event_properties(new_event, ignore)
+    changes = []
+    for name in sorted(old_properties.keys() | new_properties.keys()):
+        old = old_properties.get(name, [])
+        new = new_properties.get(name, [])
+        if old != new:
+            changes.append(PropertyChange(name, old, new))
+    return changes
+
+
+def diff_calendars(old_content, new_content, ignore=BOOKKEEPING_PROPERTIES):
+    """Compare two calendars' events by UID."""
+    old_events = index_events(old_content)
+    new_events = index_events(new_content)
+
+    added = {uid: event for uid, event in new_events.items() if uid not in old_events}
+    removed = {uid: event for uid, event in old_events.items() if uid not in new_events}
+    modified = {}
+    unchanged = 0
+
+    for uid, new_event in new_events.items():
+        old_event = old_events.get(uid)
+        if old_event is None:
+            continue
+        # Identical text needs no property comparison
+        if old_event == new_event:
+            unchanged += 1
+            continue
+        changes = diff_events(old_event, new_event, ignore)
+        if changes:
+            modified[uid] = (new_event, changes)
+        else:
+            unchanged += 1
+
+    return CalendarDiff(added, removed, modified, unchanged)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Show the event-level differences between two calendar files.')
+    parser.add_argument('old', help='Previous calendar file')
+    parser.add_argument('new', help='New calendar file')
+    parser.add_argument('--json', action='store_true', help='Output the report as JSON')
+    parser.add_argument('--all-properties', action='store_true',
+                        help='Also compare DTSTAMP, LAST-MODIFIED, SEQUENCE and the content hash')
+
+    args = parser.parse_args()
+
+    for path in (args.old, args.new):
+        if not os.path.isfile(path):
+            print(f"Error: Calendar file not found: {path}")
+            return 2
+
+    try:
+        with open(args.old, 'r') as f:
+            old_content = f.read()
+        with open(args.new, 'r') as f:
+            new_content = f.read()
+
+        diff = diff_calendars(old_content, new_content, ignore=set() if args.all_properties else BOOKKEEPING_PROPERTIES)
+        if args.json:
+            print(json.dumps(diff.to_dict(), indent=2, ensure_ascii=False))
+        else:
+            print(diff.format_text())
+        return 1 if diff else 0
+    except Exception as e:
+        print(f"Error: {e}")
+        return 2
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -3,24 +3,59 @@
 Calendar Image Demo
 
 Creates a sample calendar with episode images to demonstrate
-how anime images look in compatible calendar applications.
+how anime images look in compatible calendar applications, or, from a
+manifest of many shows, large realistic calendars for load tests.
+
+The shows to generate are read from a JSON manifest (three sample shows are
+used without one):
+
+  {
+    "name": "Anime Load Test",
+    "shows": [
+      {"title": "One Piece", "season": 1, "episodes": "1-1100", "start": "2005-01-09T01:30:00Z"},
+      {"title": "Demon Slayer", "season": 3, "episodes": "1-11", "start_in_days": 3},
+      {"title": "Frieren", "episodes": [1, 2, "5-28"], "start": "2023-09-29T15:00:00Z",
+       "interval_days": 7, "duration_minutes": 24}
+    ]
+  }
+
+Each entry is one season of a show. `episodes` is a range ("1-24"), a list
+of numbers and ranges, or a single number; the first listed episode airs at
+`start` (or `start_in_days` from now) and the others every `interval_days`
+(default 7) after it. UIDs are made from the title, season and episode number, so
+no episode may be listed twice for the same title and season (titles that
+differ only in punctuation count as the same).
+
+Images are resolved once per season: one season lookup returns the stills of
+all its episodes, with the season or show poster for episodes without one.
+Events are written to the file as they are generated, so calendars with tens
+of thousands of events take seconds. Use --no-images to skip TMDB entirely.
 
 Usage:
   python calendar_image_demo.py --access-token YOUR_TMDB_ACCESS_TOKEN --output demo_calendar.ics
   or
   python calendar_image_demo.py --api-key YOUR_TMDB_API_KEY --output demo_calendar.ics
+  or, without network access, from previously recorded TMDB responses
+  python calendar_image_demo.py --replay fixtures/tmdb.json.gz --output demo_calendar.ics
+  or, for a load test calendar without images
+  python calendar_image_demo.py --manifest shows.json --no-images --output load_test.ics
 """
 
 import os
+import re
 import sys
+import json
 import argparse
-from datetime import datetime, timedelta
-import icalendar
+from datetime import datetime, timedelta, timezone
+from concurrent.futures import ThreadPoolExecutor
 
 # Use local import
 sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
-from tmdb_api import TMDBApi
-from config import get_tmdb_credentials
+from tmdb_api import TMDBApi, CircuitOpenError
+from config import get_tmdb_credentials, get_tmdb_fixture_settings
+from output_writer import AtomicWriter
+from ics_writer import ICSWriter
+from update_calendar_images import DEFAULT_WORKERS, IMAGE_PARAMETERS
 
 # Sample anime series to demonstrate the image feature
 SAMPLE_ANIME = [
@@ -28,155 +63,279 @@ SAMPLE_ANIME = [
         "title": "The Apothecary Diaries",
         "season": 1,
         "episodes": [1, 2],
-        "start_date": datetime.now() + timedelta(days=1)
+        "start_in_days": 1
     },
     {
         "title": "Demon Slayer",
         "season": 3,
         "episodes": [1, 2],
-        "start_date": datetime.now() + timedelta(days=3)
+        "start_in_days": 3
     },
     {
         "title": "My Hero Academia",
         "season": 6,
         "episodes": [1, 2],
-        "start_date": datetime.now() + timedelta(days=5)
+        "start_in_days": 5
     }
 ]
 
-def create_demo_calendar(tmdb_api, output_file="demo_calendar.ics"):
-    """Create a demo calendar with images for various anime series."""
+DEFAULT_NAME = 'Anime Demo Calendar'
+UID_INVALID = re.compile(r'[^A-Za-z0-9]+')
+
+
+def parse_episodes(spec):
+    """Expand an episode spec (12, "1-24", "1-3,5" or [1, "3-5"]) into a list of episode numbers."""
+    if isinstance(spec, int):
+        return [spec]
+    parts = spec if isinstance(spec, list) else str(spec).split(',')
+    episodes = []
+    for part in parts:
+        if isinstance(part, int):
+            episodes.append(part)
+            continue
+        first, _, last = str(part).strip().partition('-')
+        if not first.isdigit() or (last and not last.isdigit()):
+            raise ValueError(f"Invalid episode range '{part}'")
+        episodes.extend(range(int(first), int(last or first) + 1))
+    return episodes
+
+
+class ShowSeason:
+    """One manifest entry: a run of episodes of one season of a show."""
+
+    def __init__(self, entry, now):
+        if not entry.get('title'):
+            raise ValueError(f"Manifest entry without a title: {entry}")
+        self.title = entry['title']
+        self.season = int(entry.get('season', 1))
+        self.episodes = parse_episodes(entry.get('episodes', [1]))
+        if not self.episodes:
+            raise ValueError(f"No episodes listed for {self.title} (Season {self.season})")
+        if 'start' in entry:
+            start = datetime.fromisoformat(entry['start'].replace('Z', '+00:00'))
+            self.start = start.astimezone(timezone.utc) if start.tzinfo else start.replace(tzinfo=timezone.utc)
+        else:
+            self.start = now + timedelta(days=entry.get('start_in_days', 1))
+        self.interval = timedelta(days=entry.get('interval_days', 7))
+        self.duration = timedelta(minutes=entry.get('duration_minutes', 30))
+
+    @property
+    def key(self):
+        return self.title, self.season
+
+    @property
+    def uid_prefix(self):
+        return f"{UID_INVALID.sub('-', self.title).strip('-')}-S{self.season}"
+
+    def uid(self, episode):
+        return f"{self.uid_prefix}E{episode}@anime-calendar-demo"
+
+    def airings(self):
+        """Yield (episode, start) for every listed episode."""
+        first = self.episodes[0]
+        for episode in self.episodes:
+            yield episode, self.start + (episode - first) * self.interval
+
+
+def load_manifest(manifest_file=None):
+    """Read a manifest file (or the built-in sample). Returns (calendar name, [ShowSeason])."""
+    if manifest_file:
+        with open(manifest_file) as f:
+            manifest = json.load(f)
+    else:
+        manifest = {'shows': SAMPLE_ANIME}
+
+    # Relative start dates are whole minutes from now
+    now = datetime.now(timezone.utc).replace(second=0, microsecond=0)
+    seasons = [ShowSeason(entry, now) for entry in manifest.get('shows', [])]
+    _check_unique_uids(seasons)
+    return manifest.get('name', DEFAULT_NAME), seasons
+
+
+def _check_unique_uids(seasons):
+    """Reject entries that would write the same UID twice (overlapping ranges, or titles differing only in punctuation)."""
+    listed = {}  # UID prefix -> (show, episodes)
+    for show in seasons:
+        episodes = set(show.episodes)
+        if len(episodes) != len(show.episodes):
+            raise ValueError(f"Episodes listed twice for {show.title} (Season {show.season})")
+        if show.uid_prefix in listed:
+            other, other_episodes = listed[show.uid_prefix]
+            overlap = episodes & other_episodes
+            if overlap:
+                raise ValueError(f"{show.title} (Season {show.season}) and {other.title} (Season {other.season}) "
+                                 f"both list episode {min(overlap)}")
+            other_episodes |= episodes
+        else:
+            listed[show.uid_prefix] = (show, episodes)
+
+
+def lookup_season_images(tmdb_api, title, season):
+    """
+    Resolve the images of every episode of a season with one season lookup.
+    Returns ({episode number: still URL}, fallback poster URL or None).
+    """
+    try:
+        results = tmdb_api.search_anime(title)
+        if not results.get('results'):
+            print(f"  No results found for anime: {title}")
+            return {}, None
+        show_id = results['results'][0]['id']
+
+        season_details = tmdb_api.get_season_details(show_id, season)
+        stills = {}
+        for episode in season_details.get('episodes') or []:
+            url = tmdb_api.get_image_url(episode.get('still_path'), image_type='still', usage=tmdb_api.IMAGE_USAGE)
+            if url:
+                stills[episode.get('episode_number')] = url
+
+        poster = tmdb_api.get_image_url(season_details.get('poster_path'), image_type='poster',
+                                        usage=tmdb_api.IMAGE_USAGE)
+        if not poster:
+            show_details = tmdb_api.get_tv_details(show_id)
+            poster = tmdb_api.get_image_url(show_details.get('poster_path'), image_type='poster',
+                                            usage=tmdb_api.IMAGE_USAGE)
+        return stills, poster
+    except CircuitOpenError:
+        return {}, None
+    except Exception as e:
+        print(f"  Error getting images for {title} (Season {season}): {e}")
+        return {}, None
+
+
+def resolve_images(tmdb_api, seasons, workers=DEFAULT_WORKERS):
+    """Look up every distinct season once, concurrently. Returns {(title, season): (stills, poster)}."""
+    keys = list(dict.fromkeys(season.key for season in seasons))
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        return dict(zip(keys, pool.map(lambda key: lookup_season_images(tmdb_api, *key), keys)))
+
+
+def _format_utc(value):
+    return value.strftime('%Y%m%dT%H%M%SZ')
+
+
+def write_header(writer, name):
+    writer.begin('VCALENDAR')
+    for prop, value in (('PRODID', '-//Demo Anime Calendar//EN'), ('VERSION', '2.0'),
+                        ('CALSCALE', 'GREGORIAN'), ('METHOD', 'PUBLISH')):
+        writer.write_property(prop, value, escape=False)
+    writer.write_property('NAME', name)
+    writer.write_property('DESCRIPTION', 'Demonstration of anime images in calendar events')
+    writer.write_property('X-WR-CALNAME', name)
+    writer.write_property('X-WR-CALDESC', 'Demonstration of anime images in calendar events')
+    writer.write_property('REFRESH-INTERVAL', 'PT12H', {'VALUE': 'DURATION'}, escape=False)
+    writer.write_property('COLOR', '#6a1b9a', escape=False)
+    writer.write_property('CATEGORIES', 'Demo,Anime,Calendar', escape=False)
+
+
+def write_event(writer, show, episode, start, dtstamp, image_url=None):
+    title, season = show.title, show.season
+    writer.begin('VEVENT')
+    writer.write_property('UID', show.uid(episode), escape=False)
+    writer.write_property('DTSTAMP', dtstamp, escape=False)
+    writer.write_property('DTSTART', _format_utc(start), escape=False)
+    writer.write_property('DTEND', _format_utc(start + show.duration), escape=False)
+    writer.write_property('SUMMARY', f"{title} S{season} - Episode {episode}")
+    writer.write_property('DESCRIPTION', f"Watch {title} Season {season} Episode {episode}")
+    writer.write_property('LOCATION', 'Crunchyroll/Streaming Services')
+    writer.write_property('STATUS', 'TENTATIVE', escape=False)
+    writer.write_property('TRANSP', 'OPAQUE', escape=False)
+    writer.write_property('SEQUENCE', '0', escape=False)
+    if image_url:
+        writer.write_property('IMAGE', image_url, IMAGE_PARAMETERS, escape=False)
+
+    # Add reminder
+    writer.begin('VALARM')
+    writer.write_property('ACTION', 'DISPLAY', escape=False)
+    writer.write_property('DESCRIPTION', f"Reminder: {title} S{season} E{episode} is about to start!")
+    writer.write_property('TRIGGER', '-PT15M', escape=False)
+    writer.end('VALARM')
+    writer.end('VEVENT')
+
+
+def create_demo_calendar(tmdb_api, output_file="demo_calendar.ics", manifest_file=None, workers=DEFAULT_WORKERS):
+    """
+    Create a demo calendar for the shows in a manifest (the sample shows by default).
+    With tmdb_api=None no images are added. Returns (events, events with images).
+    """
     print(f"Creating demo calendar: {output_file}")
-    
-    # Create a new calendar
-    cal = icalendar.Calendar()
-    cal.add('prodid', '-//Demo Anime Calendar//EN')
-    cal.add('version', '2.0')
-    cal.add('calscale', 'GREGORIAN')
-    cal.add('method', 'PUBLISH')
-    cal.add('NAME', 'Anime Calendar Image Demo')
-    cal.add('DESCRIPTION', 'Demonstration of anime images in calendar events')
-    cal.add('X-WR-CALNAME', 'Anime Demo Calendar')
-    cal.add('X-WR-CALDESC', 'Demonstration of anime images in calendar events')
-    cal.add('REFRESH-INTERVAL', timedelta(hours=12), parameters={'VALUE': 'DURATION'})
-    cal.add('COLOR', '#6a1b9a')
-    cal.add('CATEGORIES', ['Demo', 'Anime', 'Calendar'])
-    
+    name, seasons = load_manifest(manifest_file)
+
+    images = {}
+    if tmdb_api is not None:
+        print(f"Looking up images for {len(set(season.key for season in seasons))} seasons...")
+        images = resolve_images(tmdb_api, seasons, workers)
+
     event_count = 0
     image_count = 0
-    
-    # Create events for each anime
-    for anime in SAMPLE_ANIME:
-        # Try to get anime images first
-        try:
-            anime_images = tmdb_api.get_anime_images(anime["title"], anime["season"])
-            
-            # If we found the anime, create events for each episode
-            print(f"Creating events for: {anime['title']} (Season {anime['season']})")
-            
-            start_date = anime["start_date"]
-            
-            for episode_num in anime["episodes"]:
-                event = icalendar.Event()
-                
-                # Create a unique ID
-                now = datetime.now()
-                uid = f"{now.strftime('%Y%m%dT%H%M%SZ')}-{anime['title'].replace(' ', '-')}-S{anime['season']}E{episode_num}"
-                event.add('uid', uid)
-                
-                # Add basic event properties
-                event_start = start_date + timedelta(days=(episode_num-1) * 7)  # Weekly episodes
-                event_end = event_start + timedelta(minutes=30)  # 30-minute episodes
-                
-                event.add('dtstamp', datetime.now())
-                event.add('dtstart', event_start)
-                event.add('dtend', event_end)
-                event.add('summary', f"{anime['title']} S{anime['season']} - Episode {episode_num}")
-                event.add('description', f"Watch {anime['title']} Season {anime['season']} Episode {episode_num}")
-                event.add('location', 'Crunchyroll/Streaming Services')
-                event.add('status', 'TENTATIVE')
-                event.add('TRANSP', 'OPAQUE')
-                event.add('SEQUENCE', 0)
-                
-                # Add image - first try episode image
-                episode_image = None
-                try:
-                    episode_image = tmdb_api.get_episode_image(anime["title"], anime["season"], episode_num)
-                except Exception as e:
-                    print(f"  Could not get episode image: {e}")
-                
-                if episode_image and episode_image.get('episode_still'):
-                    # Add episode still as IMAGE property
-                    image_url = episode_image.get('episode_still')
-                    event.add('IMAGE', image_url, parameters={
-                        'VALUE': 'URI',
-                        'DISPLAY': 'THUMBNAIL',
-                        'FMTTYPE': 'image/jpeg'
-                    })
-                    print(f"  Added episode thumbnail: {image_url}")
-                    image_count += 1
-                elif anime_images:
-                    # Fall back to season poster or series poster
-                    if anime_images.get('season_poster'):
-                        image_url = anime_images.get('season_poster')
-                    elif anime_images.get('poster'):
-                        image_url = anime_images.get('poster')
-                    else:
-                        image_url = None
-                        
-                    if image_url:
-                        event.add('IMAGE', image_url, parameters={
-                            'VALUE': 'URI',
-                            'DISPLAY': 'THUMBNAIL',
-                            'FMTTYPE': 'image/jpeg'
-                        })
-                        print(f"  Added series poster: {image_url}")
-                        image_count += 1
-                
-                # Add reminder
-                alarm = icalendar.Alarm()
-                alarm.add('ACTION', 'DISPLAY')
-                alarm.add('DESCRIPTION', f"Reminder: {anime['title']} S{anime['season']} E{episode_num} is about to start!")
-                alarm.add('TRIGGER', timedelta(minutes=-15))
-                event.add_component(alarm)
-                
-                # Add the event to the calendar
-                cal.add_component(event)
+    dtstamp = _format_utc(datetime.now(timezone.utc))
+
+    writer = AtomicWriter(output_file)
+    with writer as f:
+        ics = ICSWriter(f)
+        write_header(ics, name)
+        for show in seasons:
+            stills, poster = images.get(show.key, ({}, None))
+            for episode, start in show.airings():
+                # Episode still first, then the season or series poster
+                image_url = stills.get(episode) or poster
+                write_event(ics, show, episode, start, dtstamp, image_url)
                 event_count += 1
-                
-        except Exception as e:
-            print(f"Error processing {anime['title']}: {e}")
-    
-    # Write the calendar to file
-    with open(output_file, 'wb') as f:
-        f.write(cal.to_ical())
-    
+                image_count += bool(image_url)
+        ics.end('VCALENDAR')
+
+    if not writer.changed:
+        print(f"No changes to write to {output_file}")
     print(f"Demo calendar created with {event_count} events ({image_count} with images)")
     print(f"File saved to: {output_file}")
+    return event_count, image_count
+
 
 def main():
     parser = argparse.ArgumentParser(description='Create a demo calendar with anime images.')
     parser.add_argument('--api-key', help='TMDB API key')
     parser.add_argument('--access-token', help='TMDB access token')
     parser.add_argument('--output', default='demo_calendar.ics', help='Output ICS file')
-    
+    parser.add_argument('--manifest', help='JSON manifest of shows, seasons and episode ranges to generate')
+    parser.add_argument('--no-images', action='store_true', help='Generate events without looking up images')
+    parser.add_argument('--workers', type=int, default=DEFAULT_WORKERS,
+                        help=f'Concurrent season lookups (default: {DEFAULT_WORKERS})')
+    fixtures = parser.add_mutually_exclusive_group()
+    fixtures.add_argument('--record', metavar='FIXTURE_FILE', help='Record TMDB responses to a fixture file')
+    fixtures.add_argument('--replay', metavar='FIXTURE_FILE', help='Serve TMDB responses from a fixture file (no network)')
+
     args = parser.parse_args()
-    
+
+    if args.no_images:
+        try:
+            create_demo_calendar(None, args.output, args.manifest)
+            return 0
+        except Exception as e:
+            print(f"Error: {e}")
+            return 1
+
     # Get credentials from .env file or environment variables
     env_access_token, env_api_key = get_tmdb_credentials()
-    
+    mode, fixture_file = get_tmdb_fixture_settings(args.record, args.replay)
+
     # Command line arguments take precedence over environment variables
     access_token = args.access_token or env_access_token
     api_key = args.api_key or env_api_key
-    
-    if not access_token and not api_key:
+
+    if mode != 'replay' and not access_token and not api_key:
         print("Error: Either TMDB API key or access token is required.")
         print("Please create a .env file based on .env.example or provide credentials via command line.")
         return 1
-    
+
     try:
-        tmdb_api = TMDBApi(access_token=access_token, api_key=api_key)
-        create_demo_calendar(tmdb_api, args.output)
+        tmdb_api = TMDBApi(access_token=access_token, api_key=api_key,
+                           mode=mode, fixture_file=fixture_file)
+        try:
+            create_demo_calendar(tmdb_api, args.output, args.manifest, args.workers)
+        finally:
+            tmdb_api.save_catalog()
+            if tmdb_api.save_fixtures():
+                print(f"Recorded TMDB responses to {fixture_file}")
         return 0
     except Exception as e:
         print(f"Error: {e}")
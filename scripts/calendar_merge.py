@@ -0,0 +1,239 @@
+#!/usr/bin/env python3
+"""
+Calendar Merge
+
+Merges several source calendars (e.g. one per streaming service or per
+contributor) into a single calendar:
+- events are k-way merged by DTSTART with a heap, reading every input as a
+  stream, so only one event per input is held in memory at a time
+- events sharing a UID are deduplicated; the copy with the highest SEQUENCE
+  (or the latest LAST-MODIFIED, with --policy last-modified) wins, and ties
+  go to the input listed last
+- VTIMEZONE blocks are unified by TZID
+- calendar properties (name, refresh interval, ...) come from the first input
+
+Inputs should be sorted by DTSTART, as main.ics is; an unsorted input is
+sorted in memory on its own.
+
+Usage:
+  python calendar_merge.py crunchyroll.ics netflix.ics [...] [--output main.ics] [--policy sequence|last-modified]
+"""
+
+import os
+import re
+import sys
+import heapq
+import argparse
+from datetime import datetime, timezone
+
+try:
+    from zoneinfo import ZoneInfo
+except ImportError:  # Python < 3.9: local times are compared as if they were UTC
+    ZoneInfo = None
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from output_writer import AtomicWriter
+from event_hash import get_event_property, get_sequence, unfold
+
+POLICIES = ('sequence', 'last-modified')
+
+TZID_PARAM = re.compile(r';TZID=("?)([^;:"]+)\1', re.IGNORECASE)
+
+# Sorts after every real date, so events without a DTSTART go last
+NO_START = '99999999T999999Z'
+
+
+def read_components(path):
+    """
+    Stream a calendar file. Yields ('property', line) for calendar-level
+    properties (folded lines included) and (component name, text) for each
+    top-level component.
+    """
+    with open(path, 'r') as f:
+        lines = []
+        depth = 0
+        for line in f:
+            if depth == 0:
+                if line[:1] in (' ', '\t'):
+                    lines.append(line)
+                    continue
+                if lines:
+                    yield 'property', ''.join(lines)
+                    lines = []
+                if line.startswith(('BEGIN:VCALENDAR', 'END:VCALENDAR')) or not line.strip():
+                    continue
+                if line.startswith('BEGIN:'):
+                    name = line[6:].strip().upper()
+                    depth = 1
+                lines = [line]
+                continue
+
+            lines.append(line)
+            if line.startswith('BEGIN:'):
+                depth += 1
+            elif line.startswith('END:'):
+                depth -= 1
+                if depth == 0:
+                    yield name, ''.join(lines)
+                    lines = []
+
+        if lines and depth == 0:
+            yield 'property', ''.join(lines)
+
+
+def utc_timestamp(event_text, name='DTSTART'):
+    """Return a date-time property as a sortable UTC timestamp string, or None."""
+    match = re.search(rf'^{name}((?:;[^:\r\n]*)?):([^\r\n]*)', unfold(event_text), re.MULTILINE | re.IGNORECASE)
+    if not match:
+        return None
+    params, value = match.group(1), match.group(2).strip()
+
+    try:
+        if len(value) == 8:
+            return f"{value}T000000Z"
+        if value.endswith('Z'):
+            return value
+        tzid = TZID_PARAM.search(params)
+        if tzid and ZoneInfo is not None:
+            local = datetime.strptime(value, '%Y%m%dT%H%M%S').replace(tzinfo=ZoneInfo(tzid.group(2)))
+            return local.astimezone(timezone.utc).strftime('%Y%m%dT%H%M%SZ')
+        return f"{value}Z"
+    except (ValueError, KeyError, OSError):
+        return f"{value}Z"
+
+
+def start_key(event_text):
+    """Return an event's DTSTART as a sortable UTC timestamp string."""
+    return utc_timestamp(event_text, 'DTSTART') or NO_START
+
+
+def version_key(event_text, policy):
+    """Key deciding which copy of a duplicated UID wins (higher wins)."""
+    sequence = get_sequence(event_text)
+    last_modified = (get_event_property(event_text, 'LAST-MODIFIED') or '').strip()
+    if policy == 'last-modified':
+        return last_modified, sequence
+    return sequence, last_modified
+
+
+class MergeSource:
+    """One input calendar, with what the first pass learned about it."""
+
+    def __init__(self, index, path):
+        self.index = index
+        self.path = path
+        self.properties = []
+        self.timezones = {}
+        self.event_count = 0
+        self.sorted = True
+
+
+def scan_sources(paths, policy):
+    """
+    First pass: read every input once, keeping only calendar properties,
+    timezones and the winning (source, position) for each UID.
+    """
+    sources = [MergeSource(index, path) for index, path in enumerate(paths)]
+    winners = {}
+
+    for source in sources:
+        previous = ''
+        for kind, text in read_components(source.path):
+            if kind == 'property':
+                source.properties.append(text)
+            elif kind == 'VTIMEZONE':
+                tzid = (get_event_property(text, 'TZID') or '').strip()
+                source.timezones.setdefault(tzid, text)
+            elif kind == 'VEVENT':
+                position = source.event_count
+                source.event_count += 1
+
+                start = start_key(text)
+                if start < previous:
+                    source.sorted = False
+                previous = max(previous, start)
+
+                uid = (get_event_property(text, 'UID') or '').strip() or f"{source.path}#{position}"
+                candidate = (version_key(text, policy), source.index, position)
+                if uid not in winners or candidate > winners[uid]:
+                    winners[uid] = candidate
+
+    keep = {(source_index, position) for _, source_index, position in winners.values()}
+    return sources, keep
+
+
+def merged_timezones(sources):
+    """Unify VTIMEZONE blocks by TZID, keeping the first definition of each."""
+    timezones = {}
+    for source in sources:
+        for tzid, text in source.timezones.items():
+            if tzid not in timezones:
+                timezones[tzid] = text
+            elif unfold(text) != unfold(timezones[tzid]):
+                print(f"Note: {source.path} defines VTIMEZONE {tzid} differently; using the first definition")
+    return list(timezones.values())
+
+
+def _source_events(source, keep):
+    """Yield (start, source, position, text) for the events of one input that survive dedup."""
+    def events():
+        position = 0
+        for kind, text in read_components(source.path):
+            if kind == 'VEVENT':
+                if (source.index, position) in keep:
+                    yield start_key(text), source.index, position, text
+                position += 1
+
+    if source.sorted:
+        return events()
+    print(f"Note: {source.path} is not sorted by DTSTART; sorting it in memory")
+    return iter(sorted(events()))
+
+
+def merge_calendars(paths, output_file, policy='sequence'):
+    """Merge the input calendars into output_file. Returns (written events, duplicates dropped)."""
+    print(f"Merging {len(paths)} calendars into {output_file}...")
+    sources, keep = scan_sources(paths, policy)
+    total = sum(source.event_count for source in sources)
+
+    header = next((source.properties for source in sources if source.properties), [])
+    written = 0
+
+    with AtomicWriter(output_file) as f:
+        f.write("BEGIN:VCALENDAR\n")
+        f.writelines(header)
+        f.writelines(merged_timezones(sources))
+        # Second pass: heapq.merge keeps one pending event per input
+        for _, _, _, text in heapq.merge(*(_source_events(source, keep) for source in sources)):
+            f.write(text)
+            written += 1
+        f.write("END:VCALENDAR\n")
+
+    print(f"Merged {written} events ({total - written} duplicates dropped)")
+    return written, total - written
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Merge several calendars into one, deduplicating events by UID.')
+    parser.add_argument('inputs', nargs='+', help='Calendar files to merge (calendar properties come from the first)')
+    parser.add_argument('--output', default='main.ics', help='Path to the merged calendar')
+    parser.add_argument('--policy', choices=POLICIES, default='sequence',
+                        help='Which copy of a duplicated UID wins: highest SEQUENCE or latest LAST-MODIFIED')
+
+    args = parser.parse_args()
+
+    for path in args.inputs:
+        if not os.path.isfile(path):
+            print(f"Error: Calendar file not found: {path}")
+            return 1
+
+    try:
+        merge_calendars(args.inputs, args.output, args.policy)
+        return 0
+    except Exception as e:
+        print(f"Error: {e}")
+        return 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,151 @@
+#!/usr/bin/env python3
+"""
+Calendar Snapshots
+
+Parsing main.ics with icalendar is by far the slowest step of most scripts.
+This module keeps a pickled snapshot of the parsed calendar under
+.cache/snapshots/, so later stages and later runs load the parsed model
+instead of parsing the text again.
+
+A snapshot records the source file's mtime, size and content hash. When mtime
+and size are unchanged it is used without hashing the content; otherwise the
+content is hashed and the snapshot is only used if the hash still matches.
+Any edit to the calendar therefore invalidates it automatically. Snapshots
+also record the icalendar version, since pickles of its classes are not
+portable between versions.
+
+Usage:
+  content, cal = load_calendar('main.ics')
+  content, cal = load_calendar('main.ics', prepare=expand_if_compacted)
+  cal = parse_calendar(content, source='main.ics')
+"""
+
+import gc
+import os
+import sys
+import pickle
+import hashlib
+import icalendar
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from output_writer import AtomicWriter
+
+SNAPSHOT_FORMAT = 1
+
+
+def snapshot_path(source):
+    """Return the snapshot file for a calendar path (one per absolute path)."""
+    root_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    path_hash = hashlib.sha256(os.path.abspath(source).encode('utf-8')).hexdigest()[:8]
+    name = os.path.splitext(os.path.basename(source))[0]
+    return os.path.join(root_dir, '.cache', 'snapshots', f"{name}-{path_hash}.pickle")
+
+
+def content_hash(content):
+    return hashlib.sha256(content.encode('utf-8')).hexdigest()
+
+
+def _read_header(path):
+    """Return the snapshot header without unpickling the calendar, or None."""
+    try:
+        with open(path, 'rb') as f:
+            header = pickle.load(f)
+    except (OSError, EOFError, pickle.UnpicklingError, AttributeError, ImportError):
+        return None
+    if not isinstance(header, dict) or header.get('format') != SNAPSHOT_FORMAT \
+            or header.get('icalendar') != icalendar.__version__:
+        return None
+    return header
+
+
+def _read_calendar(path):
+    with open(path, 'rb') as f:
+        pickle.load(f)
+        # Unpickling creates millions of small objects; pausing the cyclic
+        # garbage collector meanwhile makes loading several times faster
+        enabled = gc.isenabled()
+        gc.disable()
+        try:
+            return pickle.load(f)
+        finally:
+            if enabled:
+                gc.enable()
+
+
+def _write_snapshot(path, header, calendar):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with AtomicWriter(path, ignore_volatile=False, binary=True) as f:
+        pickle.dump(header, f, protocol=pickle.HIGHEST_PROTOCOL)
+        pickle.dump(calendar, f, protocol=pickle.HIGHEST_PROTOCOL)
+
+
+def _prepare_name(prepare):
+    return f"{prepare.__module__}.{prepare.__qualname__}" if prepare else None
+
+
+def parse_calendar(content, source, stat=None, prepare=None):
+    """
+    Return the parsed icalendar.Calendar for content read from (or derived
+    from) the file `source`, reusing its snapshot if the content hash matches.
+    `stat` and `prepare` describe where the content came from, for
+    load_calendar's fast path.
+
+    Every call returns a fresh object, so callers may modify it.
+    """
+    digest = content_hash(content)
+    path = snapshot_path(source)
+    header = _read_header(path)
+    if header is not None and header['sha256'] == digest:
+        try:
+            return _read_calendar(path)
+        except Exception:
+            pass  # A damaged snapshot is simply rebuilt
+
+    calendar = icalendar.Calendar.from_ical(content)
+    header = {
+        'format': SNAPSHOT_FORMAT,
+        'icalendar': icalendar.__version__,
+        'sha256': digest,
+        'mtime_ns': stat.st_mtime_ns if stat else None,
+        'size': stat.st_size if stat else None,
+        'prepare': _prepare_name(prepare),
+    }
+    try:
+        _write_snapshot(path, header, calendar)
+    except OSError as e:
+        print(f"Warning: Could not write calendar snapshot {path}: {e}")
+    return calendar
+
+
+def load_calendar(ics_file, prepare=None):
+    """
+    Read an ICS file and return (content, parsed calendar), using its snapshot when valid.
+
+    `prepare` transforms the content before it is parsed (e.g. expanding
+    compacted runs) and must depend on nothing but the content; the prepared
+    content is returned.
+    """
+    stat = os.stat(ics_file)
+    with open(ics_file, 'r') as f:
+        content = f.read()
+    if prepare is not None:
+        content = prepare(content)
+
+    path = snapshot_path(ics_file)
+    header = _read_header(path)
+    if header is not None and header['mtime_ns'] == stat.st_mtime_ns and header['size'] == stat.st_size \
+            and header.get('prepare') == _prepare_name(prepare):
+        try:
+            return content, _read_calendar(path)
+        except Exception:
+            pass
+    return content, parse_calendar(content, ics_file, stat, prepare)
+
+
+def discard_snapshot(source):
+    """Delete the snapshot of a calendar file, if any."""
+    try:
+        os.unlink(snapshot_path(source))
+        return True
+    except FileNotFoundError:
+        return False
@@ -0,0 +1,242 @@
+#!/usr/bin/env python3
+"""
+Check Image Links
+
+Finds IMAGE URIs in a calendar that no longer resolve (TMDB occasionally
+replaces artwork, and clients then show a broken image). Every unique URI is
+checked once with a HEAD request, over a pooled keep-alive session, with a
+limited number of concurrent requests and a request rate limit.
+
+Results are kept in a small cache (see tmdb_cache.ResponseCache): live images
+are not checked again for a week, dead ones for a day. The UIDs of events
+with a dead image are written to a re-enrichment queue, and --reenrich looks
+up fresh images for exactly those events.
+
+The checker only talks to the URLs found in the calendar, so it can be tried
+against a local stub server (see `python benchmark.py images`).
+
+Usage:
+  python check_images.py [--ics-file main.ics] [--rate 20] [--workers 8] [--reenrich]
+"""
+
+import os
+import sys
+import json
+import argparse
+import threading
+import requests
+from requests.adapters import HTTPAdapter
+from pathlib import Path
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from tmdb_api import RateLimiter
+from tmdb_cache import ResponseCache
+from output_writer import AtomicWriter
+from event_hash import unfold, property_name
+from calendar_diff import iter_events, event_uid
+
+ROOT_DIR = Path(os.path.dirname(os.path.abspath(__file__))).parent
+DEFAULT_CACHE_FILE = str(ROOT_DIR / '.cache' / 'image_liveness.db')
+DEFAULT_QUEUE_FILE = str(ROOT_DIR / '.cache' / 'image_reenrich_queue.json')
+
+ALIVE_TTL = 7 * 24 * 60 * 60
+DEAD_TTL = 24 * 60 * 60
+DEFAULT_RATE = 20
+DEFAULT_WORKERS = 8
+REQUEST_TIMEOUT = 10
+
+# Statuses that mean the image is gone; anything else that fails is treated
+# as a transient problem and neither cached nor queued
+DEAD_STATUSES = {404, 410}
+
+ALIVE, DEAD, UNKNOWN = 'alive', 'dead', 'unknown'
+
+
+def property_value(line):
+    """Return the value of a content line: everything after the first colon outside quoted parameters."""
+    quoted = False
+    for index, char in enumerate(line):
+        if char == '"':
+            quoted = not quoted
+        elif char == ':' and not quoted:
+            return line[index + 1:]
+    return ''
+
+
+def collect_image_urls(content):
+    """Return {image URI: [UIDs of events using it]}, in calendar order."""
+    urls = {}
+    for event in iter_events(content):
+        uid = event_uid(event)
+        for line in unfold(event).splitlines():
+            if property_name(line) != 'IMAGE':
+                continue
+            url = property_value(line).strip()
+            if url:
+                users = urls.setdefault(url, [])
+                if uid not in users:
+                    users.append(uid)
+    return urls
+
+
+class ImageChecker:
+    """
+    Checks image URLs with pooled, rate-limited, concurrent HEAD requests.
+    """
+
+    def __init__(self, cache=None, rate=DEFAULT_RATE, workers=DEFAULT_WORKERS, timeout=REQUEST_TIMEOUT):
+        self.cache = cache
+        self.workers = workers
+        self.timeout = timeout
+        self.rate_limiter = RateLimiter(rate)
+        self.stats = {'cache_hits': 0, 'requests': 0}
+        self._lock = threading.Lock()
+
+        # One keep-alive connection per worker and host
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=workers, pool_maxsize=workers)
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+
+    def _request(self, url):
+        """Return the HTTP status of a URL, or None if it could not be reached."""
+        self.rate_limiter.wait()
+        with self._lock:
+            self.stats['requests'] += 1
+        try:
+            response = self.session.head(url, allow_redirects=True, timeout=self.timeout)
+            if response.status_code in (405, 501):
+                # Some servers do not implement HEAD; fetch headers only
+                self.rate_limiter.wait()
+                response = self.session.get(url, stream=True, timeout=self.timeout)
+                response.close()
+            return response.status_code
+        except requests.RequestException:
+            return None
+
+    def check(self, url):
+        """Return ALIVE, DEAD or UNKNOWN for one URL."""
+        cached = self.cache.get(url) if self.cache is not None else None
+        if cached is not None:
+            with self._lock:
+                self.stats['cache_hits'] += 1
+            status = cached[0]
+        else:
+            status = self._request(url)
+            if status is None:
+                return UNKNOWN
+            # Only definite answers are cached: live images for ALIVE_TTL, gone
+            # ones for DEAD_TTL. Anything else (401/403 from a CDN, 429, 5xx)
+            # may be transient and is checked again next time.
+            if self.cache is not None and (status < 400 or status in DEAD_STATUSES):
+                self.cache.put(url, status, None)
+
+        if status in DEAD_STATUSES:
+            return DEAD
+        return ALIVE if status < 400 else UNKNOWN
+
+    def check_all(self, urls):
+        """Check many URLs concurrently. Returns {url: ALIVE/DEAD/UNKNOWN}."""
+        urls = list(urls)
+        with ThreadPoolExecutor(max_workers=self.workers) as pool:
+            return dict(zip(urls, pool.map(self.check, urls)))
+
+    def close(self):
+        self.session.close()
+
+
+def open_liveness_cache(cache_file=DEFAULT_CACHE_FILE):
+    # ResponseCache applies its negative TTL to 404 and 410 answers, i.e. dead images
+    return ResponseCache(cache_file, ttl=ALIVE_TTL, negative_ttl=DEAD_TTL)
+
+
+def check_calendar_images(ics_file, checker, queue_file=DEFAULT_QUEUE_FILE):
+    """
+    Check every image in a calendar and queue the events with dead ones.
+    Returns (results by URL, UIDs queued for re-enrichment).
+    """
+    with open(ics_file, 'r') as f:
+        content = f.read()
+
+    urls = collect_image_urls(content)
+    print(f"Checking {len(urls)} unique images in {ics_file}...")
+    results = checker.check_all(urls)
+
+    dead = [url for url, state in results.items() if state == DEAD]
+    unknown = [url for url, state in results.items() if state == UNKNOWN]
+    uids = sorted({uid for url in dead for uid in urls[url] if uid})
+
+    for url in dead:
+        print(f"  dead: {url} ({len(urls[url])} events)")
+    print(f"Images: {len(results) - len(dead) - len(unknown)} alive, {len(dead)} dead, "
+          f"{len(unknown)} could not be checked ({checker.stats['requests']} requests, "
+          f"{checker.stats['cache_hits']} cached)")
+
+    if queue_file:
+        write_queue(queue_file, ics_file, uids)
+        if uids:
+            print(f"Queued {len(uids)} events for re-enrichment in {queue_file}")
+    return results, uids
+
+
+def write_queue(queue_file, ics_file, uids):
+    os.makedirs(os.path.dirname(os.path.abspath(queue_file)), exist_ok=True)
+    with AtomicWriter(queue_file, ignore_volatile=False) as f:
+        json.dump({'ics_file': os.path.abspath(ics_file), 'uids': uids}, f, indent=2)
+
+
+def reenrich(ics_file, uids, workers=None):
+    """Look up fresh images for the given events, bypassing cached TMDB responses."""
+    from config import get_tmdb_credentials
+    from tmdb_api import TMDBApi
+    from update_calendar_images import DEFAULT_WORKERS as IMAGE_WORKERS, update_calendar_with_images
+
+    access_token, api_key = get_tmdb_credentials()
+    if not access_token and not api_key:
+        raise ValueError("Either TMDB API key or access token is required to re-enrich events.")
+    # Cached responses may still point at the artwork that disappeared
+    tmdb_api = TMDBApi(access_token=access_token, api_key=api_key, cache_file=False)
+    try:
+        update_calendar_with_images(ics_file, tmdb_api, workers or IMAGE_WORKERS, uids=set(uids))
+    finally:
+        tmdb_api.save_catalog()
+        tmdb_api.save_fixtures()
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Find calendar images that no longer resolve.')
+    parser.add_argument('--ics-file', default='main.ics', help='Path to the ICS calendar file')
+    parser.add_argument('--rate', type=float, default=DEFAULT_RATE, help='Maximum requests per second')
+    parser.add_argument('--workers', type=int, default=DEFAULT_WORKERS, help='Concurrent requests')
+    parser.add_argument('--cache-file', default=DEFAULT_CACHE_FILE, help='Liveness cache database')
+    parser.add_argument('--no-cache', action='store_true', help='Check every image again')
+    parser.add_argument('--queue-file', default=DEFAULT_QUEUE_FILE, help='Re-enrichment queue file')
+    parser.add_argument('--reenrich', action='store_true',
+                        help='Fetch new images from TMDB for the events with dead images')
+
+    args = parser.parse_args()
+
+    if not os.path.isfile(args.ics_file):
+        print(f"Error: Calendar file not found: {args.ics_file}")
+        return 1
+
+    cache = None if args.no_cache else open_liveness_cache(args.cache_file)
+    checker = ImageChecker(cache, args.rate, args.workers)
+    try:
+        _, uids = check_calendar_images(args.ics_file, checker, args.queue_file)
+        if args.reenrich and uids:
+            reenrich(args.ics_file, uids, workers=args.workers)
+            write_queue(args.queue_file, args.ics_file, [])
+        return 0
+    except Exception as e:
+        print(f"Error: {e}")
+        return 1
+    finally:
+        checker.close()
+        if cache is not None:
+            cache.close()
+
+
+if __name__ == "__main__":
+    sys.exit(main())
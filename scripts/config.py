@@ -6,13 +6,36 @@ Loads environment variables from .env file if present.
 
 import os
 import sys
+import json
 from pathlib import Path
 
+_dotenv_result = None
+_dotenv_keys = set()
+
 def load_dotenv():
     """
     Load environment variables from .env file if it exists.
     Simple implementation without requiring the python-dotenv package.
+    The file is only read once per process.
+    """
+    global _dotenv_result
+    if _dotenv_result is None:
+        _dotenv_result = _read_dotenv()
+    return _dotenv_result
+
+def reload_dotenv():
+    """
+    Re-read the .env file, e.g. after it was edited while a process is running.
+    Variables previously set from the file are replaced; others are left alone.
     """
+    global _dotenv_result
+    for key in _dotenv_keys:
+        os.environ.pop(key, None)
+    _dotenv_keys.clear()
+    _dotenv_result = _read_dotenv()
+    return _dotenv_result
+
+def _read_dotenv():
     # Find the .env file (looking in parent directories if needed)
     script_dir = Path(os.path.dirname(os.path.abspath(__file__)))
     root_dir = script_dir.parent
@@ -49,6 +72,7 @@ def load_dotenv():
                 # Set environment variable if not already set
                 if key and key not in os.environ:
                     os.environ[key] = value
+                    _dotenv_keys.add(key)
     
     return True
 
@@ -66,9 +90,86 @@ def get_tmdb_credentials():
     
     return access_token, api_key
 
+def get_tmdb_fixture_settings(record_file=None, replay_file=None):
+    """
+    Get TMDB fixture record/replay settings.
+    Explicit record/replay files (e.g. from command line) take precedence over
+    the TMDB_MODE and TMDB_FIXTURE_FILE environment variables.
+    Returns tuple of (mode, fixture_file), where mode is 'live', 'record' or 'replay'.
+    """
+    if replay_file:
+        return 'replay', replay_file
+    if record_file:
+        return 'record', record_file
+    
+    load_dotenv()
+    
+    mode = os.environ.get('TMDB_MODE', 'live').strip().lower() or 'live'
+    fixture_file = os.environ.get('TMDB_FIXTURE_FILE')
+    
+    return mode, fixture_file
+
+def _seconds_setting(name, default):
+    try:
+        return int(os.environ.get(name, default))
+    except ValueError:
+        print(f"Warning: {name} must be a number of seconds; using {default}")
+        return default
+
+def get_tmdb_cache_settings():
+    """
+    Get settings for the persistent TMDB response cache.
+    TMDB_CACHE_FILE names the cache database (default: .cache/tmdb_responses.db
+    in the project root) and TMDB_CACHE_TTL its entry lifetime in seconds
+    (default: one day). A TTL of 0 disables the cache. "Not found" answers
+    expire after TMDB_NEGATIVE_CACHE_TTL seconds (default: six hours).
+    Returns tuple of (cache_file or None, ttl, negative_ttl).
+    """
+    load_dotenv()
+    
+    root_dir = Path(os.path.dirname(os.path.abspath(__file__))).parent
+    cache_file = os.environ.get('TMDB_CACHE_FILE') or str(root_dir / '.cache' / 'tmdb_responses.db')
+    ttl = _seconds_setting('TMDB_CACHE_TTL', 24 * 60 * 60)
+    negative_ttl = _seconds_setting('TMDB_NEGATIVE_CACHE_TTL', 6 * 60 * 60)
+    
+    return (cache_file if ttl > 0 else None), ttl, negative_ttl
+
+def get_output_settings():
+    """
+    Get settings for writing calendar output files.
+    Returns a dict with 'ignore_volatile': whether files that differ only in
+    DTSTAMP/LAST-MODIFIED stamps count as unchanged (CALENDAR_IGNORE_VOLATILE_STAMPS).
+    """
+    load_dotenv()
+    
+    ignore_volatile = os.environ.get('CALENDAR_IGNORE_VOLATILE_STAMPS', '').strip().lower()
+    return {'ignore_volatile': ignore_volatile in ('1', 'true', 'yes', 'on')}
+
+def get_summary_parser_config():
+    """
+    Get user-defined title aliases and summary patterns.
+    Reads the JSON file named by SUMMARY_PARSER_CONFIG, or summary_parser.json
+    in the project root. Returns a dict with 'aliases' and 'patterns' keys.
+    """
+    load_dotenv()
+    
+    root_dir = Path(os.path.dirname(os.path.abspath(__file__))).parent
+    config_path = Path(os.environ.get('SUMMARY_PARSER_CONFIG', root_dir / 'summary_parser.json'))
+    
+    settings = {'aliases': {}, 'patterns': []}
+    if config_path.exists():
+        with open(config_path) as f:
+            settings.update(json.load(f))
+    
+    return settings
+
 if __name__ == "__main__":
     # Test the config module
     load_dotenv()
     access_token, api_key = get_tmdb_credentials()
     print("TMDB Access Token:", "✓ Set" if access_token else "✗ Not set")
     print("TMDB API Key:", "✓ Set" if api_key else "✗ Not set")
+    mode, fixture_file = get_tmdb_fixture_settings()
+    print("TMDB Mode:", mode, f"({fixture_file})" if fixture_file else "")
+    cache_file, cache_ttl, negative_ttl = get_tmdb_cache_settings()
+    print("TMDB Cache:", f"{cache_file} (TTL {cache_ttl}s, not found {negative_ttl}s)" if cache_file else "disabled")
@@ -0,0 +1,115 @@
+#!/usr/bin/env python3
+"""
+Event Content Hashing
+
+Computes a hash of the meaningful content of a VEVENT so stages can tell
+whether an event actually changed between runs. The hash is stored in the
+event itself as an X-ANIME-CONTENT-HASH property, and LAST-MODIFIED/SEQUENCE
+are only bumped when it changes.
+
+Bookkeeping properties (DTSTAMP, LAST-MODIFIED, SEQUENCE and the hash itself)
+are excluded, lines are unfolded, and property order is ignored.
+"""
+
+import re
+import hashlib
+
+from ics_writer import detect_newline, fold_line
+
+CONTENT_HASH_PROPERTY = 'X-ANIME-CONTENT-HASH'
+
+# Properties that record when/how often an event changed, not what it contains
+BOOKKEEPING_PROPERTIES = {'DTSTAMP', 'LAST-MODIFIED', 'SEQUENCE', CONTENT_HASH_PROPERTY}
+
+FOLDED_LINE = re.compile(r'\r?\n[ \t]')
+PROPERTY_NAME = re.compile(r'[;:]')
+# End of an event's own properties: its first sub-component or its END line
+PROPERTIES_END = re.compile(r'\r?\n(?:BEGIN|END):')
+
+
+def unfold(text):
+    """Join folded continuation lines (RFC 5545 section 3.1)."""
+    return FOLDED_LINE.sub('', text)
+
+
+def property_name(line):
+    return PROPERTY_NAME.split(line, 1)[0].upper()
+
+
+def event_content_hash(event_text):
+    """Return a short hex digest of an event's meaningful content."""
+    lines = [
+        line for line in unfold(event_text).splitlines()
+        if line and property_name(line) not in BOOKKEEPING_PROPERTIES
+    ]
+    digest = hashlib.sha256('\n'.join(sorted(lines)).encode('utf-8'))
+    return digest.hexdigest()[:16]
+
+
+def _properties_span(event_text):
+    """Return the index where the event's own properties end."""
+    match = PROPERTIES_END.search(event_text)
+    return match.start() if match else len(event_text)
+
+
+def _property_pattern(name):
+    return re.compile(
+        rf'^{re.escape(name)}[;:][^\r\n]*(?:\r?\n[ \t][^\r\n]*)*',
+        re.MULTILINE | re.IGNORECASE
+    )
+
+
+def get_event_property(event_text, name):
+    """Return the (unfolded) value of a top-level event property, or None."""
+    head = event_text[:_properties_span(event_text)]
+    match = _property_pattern(name).search(head)
+    if not match:
+        return None
+    return unfold(match.group(0)).split(':', 1)[1]
+
+
+def set_event_property(event_text, name, value):
+    """Replace a top-level event property, or add it after the existing properties."""
+    end = _properties_span(event_text)
+    head, tail = event_text[:end], event_text[end:]
+    newline = detect_newline(event_text)
+    line = fold_line(f"{name}:{value}", newline)[:-len(newline)]
+
+    pattern = _property_pattern(name)
+    if pattern.search(head):
+        head = pattern.sub(lambda match: line, head, count=1)
+    else:
+        head = f"{head}{newline}{line}"
+    return head + tail
+
+
+def remove_event_property(event_text, name):
+    """Remove every top-level occurrence of an event property."""
+    end = _properties_span(event_text)
+    head, tail = event_text[:end], event_text[end:]
+    head = re.sub(
+        rf'(?:\r?\n)?^{re.escape(name)}[;:][^\r\n]*(?:\r?\n[ \t][^\r\n]*)*',
+        '', head, flags=re.MULTILINE | re.IGNORECASE
+    )
+    return head + tail
+
+
+def get_sequence(event_text):
+    """Return an event's SEQUENCE as an int (0 if missing or malformed)."""
+    value = get_event_property(event_text, 'SEQUENCE')
+    try:
+        return int(value.strip())
+    except (AttributeError, ValueError):
+        return 0
+
+
+def refresh_content_hash(event_text):
+    """
+    Recompute an event's content hash.
+    Returns (event_text, changed) with the hash property updated if it changed.
+    """
+    content_hash = event_content_hash(event_text)
+    stored_hash = get_event_property(event_text, CONTENT_HASH_PROPERTY)
+    if stored_hash and stored_hash.strip() == content_hash:
+        return event_text, False
+    return set_event_property(event_text, CONTENT_HASH_PROPERTY, content_hash), True
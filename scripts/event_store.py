@@ -0,0 +1,374 @@
+#!/usr/bin/env python3
+"""
+Event Store
+
+An indexed SQLite store of shows, seasons and episodes (air times, resolved
+TMDB ids and image URLs) that can act as the source of truth for the calendar.
+The .ics feeds become build artifacts generated by querying the store, so
+updates, image refreshes and range exports only touch the affected rows.
+
+Each episode keeps the verbatim text of its VEVENT, so a calendar imported
+from main.ics exports back byte for byte.
+
+Usage:
+  python event_store.py import [--ics-file main.ics] [--db anime_schedule.db]
+  python event_store.py export [--output main.ics]
+  python event_store.py export --output OUT.ics [--from 20250601] [--to 20250701] [--show TITLE]
+  python event_store.py refresh-images [--show TITLE] [--missing-only] [--from DATE] [--to DATE]
+  python event_store.py stats
+"""
+
+import os
+import re
+import sys
+import sqlite3
+import argparse
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from output_writer import write_if_changed
+from event_hash import event_content_hash, get_event_property, remove_event_property, set_event_property
+from series_parser import parse_summary
+
+DEFAULT_DB = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'anime_schedule.db')
+
+EVENT_PATTERN = re.compile(r'(BEGIN:VEVENT.*?END:VEVENT)', re.DOTALL)
+IMAGE_URL_PATTERN = re.compile(r'^IMAGE;[^:]*VALUE=URI[^:]*:(.*)$', re.MULTILINE)
+
+# VALUE=URI last, like every other stage writes it (and optimize_for_outlook expects)
+IMAGE_PROPERTY = 'IMAGE;DISPLAY=THUMBNAIL;FMTTYPE=image/jpeg;VALUE=URI'
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS calendar (
+    key TEXT PRIMARY KEY,
+    value TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS shows (
+    id INTEGER PRIMARY KEY,
+    title TEXT NOT NULL UNIQUE COLLATE NOCASE,
+    tmdb_id INTEGER,
+    poster_url TEXT
+);
+CREATE TABLE IF NOT EXISTS seasons (
+    show_id INTEGER NOT NULL REFERENCES shows(id),
+    season INTEGER NOT NULL,
+    poster_url TEXT,
+    PRIMARY KEY (show_id, season)
+);
+CREATE TABLE IF NOT EXISTS episodes (
+    uid TEXT PRIMARY KEY,
+    show_id INTEGER REFERENCES shows(id),
+    season INTEGER,
+    episode INTEGER,
+    summary TEXT,
+    dtstart TEXT,
+    dtend TEXT,
+    image_url TEXT,
+    content_hash TEXT NOT NULL,
+    position INTEGER NOT NULL,
+    raw TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS episodes_by_start ON episodes (dtstart);
+CREATE INDEX IF NOT EXISTS episodes_by_show ON episodes (show_id, season, episode);
+"""
+
+
+def _unfolded_image_url(event_text):
+    match = IMAGE_URL_PATTERN.search(re.sub(r'\r?\n[ \t]', '', event_text))
+    return match.group(1).strip() if match else None
+
+
+def normalize_date(value, end=False):
+    """Turn YYYYMMDD or YYYY-MM-DD into a bound comparable with UTC DTSTART strings."""
+    if not value:
+        return None
+    digits = value.replace('-', '')
+    if len(digits) == 8:
+        return f"{digits}T235959Z" if end else f"{digits}T000000Z"
+    return digits
+
+
+class EventStore:
+    """
+    SQLite-backed store of the calendar's shows, seasons and episodes.
+    """
+
+    def __init__(self, path=DEFAULT_DB):
+        self.path = path
+        self.db = sqlite3.connect(path)
+        self.db.row_factory = sqlite3.Row
+        self.db.executescript(SCHEMA)
+
+    def close(self):
+        self.db.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.db.commit()
+        self.close()
+        return False
+
+    def _show_id(self, title):
+        row = self.db.execute("SELECT id FROM shows WHERE title = ?", (title,)).fetchone()
+        if row:
+            return row['id']
+        return self.db.execute("INSERT INTO shows (title) VALUES (?)", (title,)).lastrowid
+
+    def import_calendar(self, content, source=None):
+        """
+        Sync the store with a calendar's content. Only new or changed events are
+        written, and events no longer in the calendar are removed.
+        `source` records the file the calendar was read from (see source_path).
+        Returns (added, updated, removed) counts and the UIDs skipped as duplicates.
+        """
+        parts = EVENT_PATTERN.split(content)
+        events = parts[1::2]
+        newline = '\r\n' if '\r\n' in content else '\n'
+
+        with self.db:
+            self.db.execute("INSERT OR REPLACE INTO calendar VALUES ('header', ?)", (parts[0],))
+            self.db.execute("INSERT OR REPLACE INTO calendar VALUES ('footer', ?)", (parts[-1] if events else '',))
+            self.db.execute("INSERT OR REPLACE INTO calendar VALUES ('newline', ?)", (newline,))
+            if source:
+                self.db.execute("INSERT OR REPLACE INTO calendar VALUES ('source', ?)", (os.path.abspath(source),))
+
+            existing = {row['uid']: (row['content_hash'], row['position'])
+                        for row in self.db.execute("SELECT uid, content_hash, position FROM episodes")}
+            added = updated = 0
+            seen = set()
+            moved = []
+            duplicates = []
+
+            for position, event in enumerate(events):
+                uid = (get_event_property(event, 'UID') or '').strip()
+                if not uid:
+                    continue
+                if uid in seen:
+                    # The first copy wins
+                    duplicates.append(uid)
+                    continue
+                seen.add(uid)
+
+                content_hash = event_content_hash(event)
+                stored_hash, stored_position = existing.get(uid, (None, None))
+                if stored_hash == content_hash:
+                    # An event inserted above shifts everything below it; only the position changes
+                    if stored_position != position:
+                        moved.append((position, uid))
+                    continue
+
+                summary = (get_event_property(event, 'SUMMARY') or '').strip()
+                series, season, episode = parse_summary(summary)
+                show_id = self._show_id(series) if series else None
+                if show_id is not None:
+                    self.db.execute("INSERT OR IGNORE INTO seasons (show_id, season) VALUES (?, ?)", (show_id, season))
+
+                self.db.execute(
+                    "INSERT OR REPLACE INTO episodes "
+                    "(uid, show_id, season, episode, summary, dtstart, dtend, image_url, content_hash, position, raw) "
+                    "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                    (uid, show_id, season, episode, summary,
+                     (get_event_property(event, 'DTSTART') or '').strip(),
+                     (get_event_property(event, 'DTEND') or '').strip(),
+                     _unfolded_image_url(event), content_hash, position, event)
+                )
+                if uid in existing:
+                    updated += 1
+                else:
+                    added += 1
+
+            self.db.executemany("UPDATE episodes SET position = ? WHERE uid = ?", moved)
+            removed = [uid for uid in existing if uid not in seen]
+            self.db.executemany("DELETE FROM episodes WHERE uid = ?", [(uid,) for uid in removed])
+
+        return added, updated, len(removed), duplicates
+
+    def source_path(self):
+        """Return the absolute path of the calendar file last imported, or None."""
+        row = self.db.execute("SELECT value FROM calendar WHERE key = 'source'").fetchone()
+        return row['value'] if row else None
+
+    def query_episodes(self, start=None, end=None, show=None, missing_images=False):
+        """Return episode rows matching the filters, in calendar order."""
+        clauses = []
+        params = []
+        if start:
+            clauses.append("e.dtstart >= ?")
+            params.append(start)
+        if end:
+            clauses.append("e.dtstart <= ?")
+            params.append(end)
+        if show:
+            clauses.append("s.title = ?")
+            params.append(show)
+        if missing_images:
+            clauses.append("e.image_url IS NULL")
+
+        where = f"WHERE {' AND '.join(clauses)}" if clauses else ''
+        return self.db.execute(
+            "SELECT e.*, s.title, s.tmdb_id FROM episodes e LEFT JOIN shows s ON s.id = e.show_id "
+            f"{where} ORDER BY e.position", params
+        ).fetchall()
+
+    def render_calendar(self, start=None, end=None, show=None):
+        """Build calendar text from the store, optionally limited to a date range or show."""
+        settings = dict(self.db.execute("SELECT key, value FROM calendar").fetchall())
+        if 'header' not in settings:
+            raise ValueError("The event store is empty. Import a calendar first.")
+
+        events = [row['raw'] for row in self.query_episodes(start, end, show)]
+        footer = settings.get('footer') or f"{settings['newline']}END:VCALENDAR{settings['newline']}"
+        if not events:
+            return settings['header'] + footer.lstrip('\r\n')
+        return settings['header'] + settings['newline'].join(events) + footer
+
+    def set_episode_image(self, uid, image_url):
+        """Replace an episode's IMAGE property (and its stored URL)."""
+        row = self.db.execute("SELECT raw FROM episodes WHERE uid = ?", (uid,)).fetchone()
+        if row is None:
+            raise KeyError(uid)
+        raw = remove_event_property(row['raw'], 'IMAGE')
+        raw = set_event_property(raw, IMAGE_PROPERTY, image_url)
+        self.db.execute(
+            "UPDATE episodes SET raw = ?, image_url = ?, content_hash = ? WHERE uid = ?",
+            (raw, image_url, event_content_hash(raw), uid)
+        )
+
+    def refresh_images(self, tmdb_api, start=None, end=None, show=None, missing_only=False):
+        """
+        Look up images only for the selected episodes. Returns the number of images set.
+        A failed lookup skips its episode; once TMDB is considered down the
+        run stops, keeping the images set so far.
+        """
+        from tmdb_api import CircuitOpenError
+
+        rows = [row for row in self.query_episodes(start, end, show, missing_only) if row['title']]
+        image_count = 0
+
+        with self.db:
+            for row in rows:
+                episode_image = tmdb_api.get_episode_image(row['title'], row['season'], row['episode'])
+                image_url = episode_image.get('episode_still') if episode_image else None
+
+                if not image_url:
+                    try:
+                        images = tmdb_api.get_anime_images(row['title'], row['season'])
+                    except CircuitOpenError:
+                        break
+                    except Exception as e:
+                        print(f"  Error getting images for {row['title']}: {e}")
+                        continue
+                    self.db.execute("UPDATE shows SET poster_url = ? WHERE id = ?", (images.get('poster'), row['show_id']))
+                    self.db.execute("UPDATE seasons SET poster_url = ? WHERE show_id = ? AND season = ?",
+                                    (images.get('season_poster'), row['show_id'], row['season']))
+                    image_url = images.get('season_poster') or images.get('poster')
+
+                circuit_open = False
+                if row['tmdb_id'] is None:
+                    try:
+                        results = tmdb_api.search_anime(row['title']).get('results')
+                    except CircuitOpenError:
+                        results = None
+                        circuit_open = True
+                    except Exception as e:
+                        print(f"  Error searching for {row['title']}: {e}")
+                        results = None
+                    if results:
+                        self.db.execute("UPDATE shows SET tmdb_id = ? WHERE id = ?", (results[0]['id'], row['show_id']))
+
+                if image_url and image_url != row['image_url']:
+                    self.set_episode_image(row['uid'], image_url)
+                    image_count += 1
+                    print(f"  {row['summary']}: {image_url}")
+                if circuit_open:
+                    break
+
+        return image_count
+
+    def stats(self):
+        return {
+            'shows': self.db.execute("SELECT COUNT(*) FROM shows").fetchone()[0],
+            'seasons': self.db.execute("SELECT COUNT(*) FROM seasons").fetchone()[0],
+            'episodes': self.db.execute("SELECT COUNT(*) FROM episodes").fetchone()[0],
+            'without_images': self.db.execute("SELECT COUNT(*) FROM episodes WHERE image_url IS NULL").fetchone()[0],
+        }
+
+
+def _create_tmdb_api():
+    from tmdb_api import TMDBApi
+    from config import get_tmdb_credentials, get_tmdb_fixture_settings
+
+    access_token, api_key = get_tmdb_credentials()
+    mode, fixture_file = get_tmdb_fixture_settings()
+    if mode != 'replay' and not access_token and not api_key:
+        return None
+    return TMDBApi(access_token=access_token, api_key=api_key, mode=mode, fixture_file=fixture_file)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Manage the SQLite event store behind the calendar feeds.')
+    parser.add_argument('command', choices=['import', 'export', 'refresh-images', 'stats'])
+    parser.add_argument('--db', default=DEFAULT_DB, help='Path to the SQLite database')
+    parser.add_argument('--ics-file', default='main.ics', help='Calendar file to import')
+    parser.add_argument('--output', default=None,
+                        help='Calendar file to export to (default: main.ics; required with --from/--to/--show)')
+    parser.add_argument('--from', dest='start', help='Only episodes airing on or after this date (YYYYMMDD)')
+    parser.add_argument('--to', dest='end', help='Only episodes airing on or before this date (YYYYMMDD)')
+    parser.add_argument('--show', help='Only episodes of this show')
+    parser.add_argument('--missing-only', action='store_true', help='Only refresh episodes without an image')
+
+    args = parser.parse_args()
+    start, end = normalize_date(args.start), normalize_date(args.end, end=True)
+    filtered = bool(args.start or args.end or args.show)
+    if args.command == 'export' and filtered and not args.output:
+        # A partial export written over the full calendar would drop every other
+        # episode from the store on its next import
+        parser.error("export with --from, --to or --show needs an explicit --output")
+    output = args.output or 'main.ics'
+
+    try:
+        with EventStore(args.db) as store:
+            if args.command == 'import':
+                if not os.path.isfile(args.ics_file):
+                    print(f"Error: Calendar file not found: {args.ics_file}")
+                    return 1
+                # Keep the file's line endings, so an export reproduces it byte for byte
+                with open(args.ics_file, 'r', newline='') as f:
+                    added, updated, removed, duplicates = store.import_calendar(f.read(), source=args.ics_file)
+                print(f"Imported {args.ics_file}: {added} added, {updated} updated, {removed} removed")
+                if duplicates:
+                    print(f"Skipped {len(duplicates)} events with duplicate UIDs: {', '.join(duplicates)}")
+
+            elif args.command == 'export':
+                if filtered and os.path.abspath(output) == store.source_path():
+                    print(f"Error: Refusing to overwrite {output}, the calendar the store was imported from, "
+                          f"with a filtered export")
+                    return 1
+                if write_if_changed(output, store.render_calendar(start, end, args.show)):
+                    print(f"Exported calendar to {output}")
+
+            elif args.command == 'refresh-images':
+                tmdb_api = _create_tmdb_api()
+                if tmdb_api is None:
+                    print("Error: Either TMDB API key or access token is required.")
+                    return 1
+                try:
+                    image_count = store.refresh_images(tmdb_api, start, end, args.show, args.missing_only)
+                finally:
+                    tmdb_api.save_catalog()
+                    tmdb_api.save_fixtures()
+                print(f"Updated {image_count} episode images")
+
+            else:
+                for name, count in store.stats().items():
+                    print(f"{name.replace('_', ' ').capitalize()}: {count}")
+        return 0
+    except Exception as e:
+        print(f"Error: {e}")
+        return 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,141 @@
+#!/usr/bin/env python3
+"""
+Export Schedule as JSON
+
+Writes the parsed schedule as JSON Lines (one event per line) plus small
+precomputed index files, so the preview page and other tools can load and
+filter thousands of events without an ICS parser:
+
+  events.jsonl        one JSON object per event, in calendar order
+  index_by_show.json  {"The Apothecary Diaries": [0, 1, ...], ...}
+  index_by_day.json   {"2025-05-24": [0, 7], ...}  (UTC start date)
+  index_by_uid.json   {"<uid>": 0, ...}
+
+Index values are line numbers in events.jsonl (counting from 0).
+
+Usage:
+  python export_json.py [--ics-file main.ics] [--output-dir docs/data]
+"""
+
+import os
+import sys
+import json
+import argparse
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from output_writer import AtomicWriter
+from event_hash import get_event_property, get_sequence
+from calendar_diff import iter_events, event_uid
+from calendar_merge import utc_timestamp
+from series_parser import parse_summary
+from ics_writer import unescape_text
+import memory_profile
+
+# Properties exported as plain text, by JSON field name
+TEXT_FIELDS = {
+    'summary': 'SUMMARY',
+    'description': 'DESCRIPTION',
+    'location': 'LOCATION',
+    'status': 'STATUS',
+    'url': 'URL',
+}
+
+
+def iso_timestamp(value):
+    """Convert 20250524T130000Z to 2025-05-24T13:00:00Z."""
+    if not value:
+        return None
+    return f"{value[0:4]}-{value[4:6]}-{value[6:8]}T{value[9:11]}:{value[11:13]}:{value[13:15]}Z"
+
+
+def event_record(event_text):
+    """Build the JSON record for one event."""
+    record = {'uid': event_uid(event_text)}
+    for field, name in TEXT_FIELDS.items():
+        value = get_event_property(event_text, name)
+        record[field] = unescape_text(value.strip()) if value else None
+
+    series, season, episode = parse_summary(record['summary'] or '')
+    record.update(series=series, season=season, episode=episode)
+
+    record['start'] = iso_timestamp(utc_timestamp(event_text, 'DTSTART'))
+    record['end'] = iso_timestamp(utc_timestamp(event_text, 'DTEND'))
+
+    categories = get_event_property(event_text, 'CATEGORIES') or ''
+    record['categories'] = [unescape_text(c.strip()) for c in categories.split(',') if c.strip()]
+
+    image = get_event_property(event_text, 'IMAGE')
+    record['image'] = image.strip() if image else None
+    record['sequence'] = get_sequence(event_text)
+    return record
+
+
+@memory_profile.profiled('export JSON')
+def export_schedule(ics_file, output_dir):
+    """Write events.jsonl and its indexes. Returns the number of exported events."""
+    print(f"Exporting {ics_file} to {output_dir}...")
+
+    with open(ics_file, 'r') as f:
+        content = f.read()
+
+    os.makedirs(output_dir, exist_ok=True)
+    by_show = {}
+    by_day = {}
+    by_uid = {}
+    count = 0
+
+    writer = AtomicWriter(os.path.join(output_dir, 'events.jsonl'))
+    with writer as f:
+        for line, event in enumerate(iter_events(content)):
+            record = event_record(event)
+            f.write(json.dumps(record, ensure_ascii=False, separators=(',', ':')) + '\n')
+            count += 1
+
+            if record['series']:
+                by_show.setdefault(record['series'], []).append(line)
+            if record['start']:
+                by_day.setdefault(record['start'][:10], []).append(line)
+            if record['uid']:
+                by_uid[record['uid']] = line
+    changed = [writer.changed]
+    memory_profile.set_events(count)
+
+    for name, index in (('index_by_show.json', by_show),
+                        ('index_by_day.json', dict(sorted(by_day.items()))),
+                        ('index_by_uid.json', by_uid)):
+        writer = AtomicWriter(os.path.join(output_dir, name))
+        with writer as f:
+            json.dump(index, f, ensure_ascii=False, separators=(',', ':'))
+        changed.append(writer.changed)
+
+    print(f"Exported {count} events ({sum(changed)} of {len(changed)} files changed)")
+    return count
+
+
+def main():
+    root_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+    parser = argparse.ArgumentParser(description='Export the schedule as JSON Lines with lookup indexes.')
+    parser.add_argument('--ics-file', default='main.ics', help='Path to the ICS calendar file')
+    parser.add_argument('--output-dir', default=os.path.join(root_dir, 'docs', 'data'),
+                        help='Directory for events.jsonl and the index files')
+    memory_profile.add_argument(parser)
+
+    args = parser.parse_args()
+    if args.profile_memory:
+        memory_profile.enable()
+
+    if not os.path.isfile(args.ics_file):
+        print(f"Error: Calendar file not found: {args.ics_file}")
+        return 1
+
+    try:
+        export_schedule(args.ics_file, args.output_dir)
+        return 0
+    except Exception as e:
+        print(f"Error: {e}")
+        return 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
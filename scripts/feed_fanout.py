@@ -0,0 +1,235 @@
+#!/usr/bin/env python3
+"""
+Feed Fanout
+
+Generates per-subscriber calendar feeds from the master calendar in one pass.
+The master calendar is parsed once, each event is routed to every subscriber
+whose shows or categories match, and Outlook subscribers get the same tweaks
+as optimize_for_outlook.py (one BADGE image, SEQUENCE bumped only on change)
+applied against their own previously published feed.
+
+Subscriptions are read from a JSON file:
+
+  {
+    "subscribers": {
+      "alice": {"shows": ["The Apothecary Diaries"], "client": "outlook"},
+      "bob": {"categories": ["Anime"], "output": "feeds/bob-anime.ics"}
+    }
+  }
+
+A subscriber receives events matching any listed show (series title as parsed
+from the SUMMARY) or any listed category; with neither, all events. `client`
+is "standard" (default) or "outlook". Large subscriber lists are split across
+worker processes.
+
+Usage:
+  python feed_fanout.py [--ics-file main.ics] [--subscriptions subscriptions.json] [--output-dir feeds]
+"""
+
+import os
+import re
+import sys
+import argparse
+import json
+from concurrent.futures import ProcessPoolExecutor
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from output_writer import AtomicWriter
+from event_hash import get_event_property
+from series_parser import parse_summary
+from optimize_for_outlook import load_published_events, optimize_event_images, update_event_sequence
+
+CLIENT_TYPES = ('standard', 'outlook')
+
+# Below this many subscribers, spawning worker processes costs more than it saves
+PARALLEL_THRESHOLD = 64
+
+SAFE_NAME = re.compile(r'[^A-Za-z0-9._-]+')
+
+
+class MasterCalendar:
+    """
+    The master calendar split into header, events and footer, plus the
+    routing keys (series and categories) of every event.
+    """
+
+    def __init__(self, content):
+        parts = re.split(r'(BEGIN:VEVENT.*?END:VEVENT)', content, flags=re.DOTALL)
+        self.header = parts[0]
+        self.events = parts[1::2]
+        self.footer = parts[-1] if self.events else ''
+        self.separator = parts[2] if len(self.events) > 1 else '\n'
+
+        self.series = []
+        self.categories = []
+        for event in self.events:
+            series, _, _ = parse_summary(get_event_property(event, 'SUMMARY') or '')
+            self.series.append(series.casefold() if series else None)
+            categories = get_event_property(event, 'CATEGORIES') or ''
+            self.categories.append({c.strip().casefold() for c in categories.split(',') if c.strip()})
+
+        self._outlook_events = {}
+
+    def outlook_event(self, index):
+        """Return an event with Outlook image tweaks, computed once per event."""
+        if index not in self._outlook_events:
+            self._outlook_events[index] = optimize_event_images(self.events[index])[0]
+        return self._outlook_events[index]
+
+    def render(self, events, header=None):
+        """Assemble a calendar from a list of event texts."""
+        header = self.header if header is None else header
+        if not events:
+            return header + self.footer.lstrip('\r\n')
+        return header + self.separator.join(events) + self.footer
+
+
+class Subscriber:
+    """One subscriber's filter, client type and output path."""
+
+    def __init__(self, name, settings, output_dir):
+        self.name = name
+        self.shows = {show.strip().casefold() for show in settings.get('shows', [])}
+        self.categories = {category.strip().casefold() for category in settings.get('categories', [])}
+        self.client = settings.get('client', 'standard').lower()
+        if self.client not in CLIENT_TYPES:
+            raise ValueError(f"Subscriber '{name}' has unknown client type '{self.client}'")
+        self.output = settings.get('output') or os.path.join(output_dir, f"{SAFE_NAME.sub('_', name)}.ics")
+
+    @property
+    def matches_all(self):
+        return not self.shows and not self.categories
+
+
+def load_subscribers(subscriptions_file, output_dir):
+    """
+    Read the subscriptions config into a list of Subscribers.
+    Raises ValueError if two subscribers would write the same feed file.
+    """
+    with open(subscriptions_file) as f:
+        config = json.load(f)
+
+    subscribers = [
+        Subscriber(name, settings, output_dir)
+        for name, settings in config.get('subscribers', {}).items()
+    ]
+
+    # "a b" and "a_b" both map to a_b.ics; their feeds would overwrite each other
+    owners = {}
+    for subscriber in subscribers:
+        path = os.path.normcase(os.path.abspath(subscriber.output))
+        if path in owners:
+            raise ValueError(f"Subscribers '{owners[path]}' and '{subscriber.name}' "
+                             f"both write to {subscriber.output}")
+        owners[path] = subscriber.name
+    return subscribers
+
+
+def route_events(master, subscribers):
+    """
+    Stream every event to the subscribers it matches.
+    Returns a list of event indexes for each subscriber.
+    """
+    selected = [[] for _ in subscribers]
+    everything = [i for i, subscriber in enumerate(subscribers) if subscriber.matches_all]
+    by_show = {}
+    by_category = {}
+    for i, subscriber in enumerate(subscribers):
+        for show in subscriber.shows:
+            by_show.setdefault(show, []).append(i)
+        for category in subscriber.categories:
+            by_category.setdefault(category, []).append(i)
+
+    for index, (series, categories) in enumerate(zip(master.series, master.categories)):
+        targets = set(everything)
+        targets.update(by_show.get(series, ()))
+        for category in categories:
+            targets.update(by_category.get(category, ()))
+        for target in targets:
+            selected[target].append(index)
+
+    return selected
+
+
+def render_feed(master, subscriber, indexes):
+    """Render one subscriber's feed text."""
+    if subscriber.client != 'outlook':
+        return master.render([master.events[i] for i in indexes])
+
+    published = load_published_events(subscriber.output)
+    events = [update_event_sequence(master.outlook_event(i), published)[0] for i in indexes]
+    header = re.sub(r'^(X-WR-CALNAME:.*?)(\r?)$', r'\1 (Outlook)\2', master.header, count=1, flags=re.MULTILINE)
+    return master.render(events, header)
+
+
+def fanout_subscribers(master, subscribers):
+    """Route and write feeds for a group of subscribers. Returns (name, events, written) tuples."""
+    results = []
+    for subscriber, indexes in zip(subscribers, route_events(master, subscribers)):
+        directory = os.path.dirname(os.path.abspath(subscriber.output))
+        os.makedirs(directory, exist_ok=True)
+        writer = AtomicWriter(subscriber.output)
+        with writer as f:
+            f.write(render_feed(master, subscriber, indexes))
+        results.append((subscriber.name, len(indexes), writer.changed))
+    return results
+
+
+_worker_master = None
+
+def _init_worker(content):
+    global _worker_master
+    _worker_master = MasterCalendar(content)
+
+def _fanout_chunk(subscribers):
+    return fanout_subscribers(_worker_master, subscribers)
+
+
+def fanout_calendar(ics_file, subscriptions_file, output_dir='feeds', workers=None):
+    """Generate every subscriber's feed from the master calendar."""
+    print(f"Generating subscriber feeds from {ics_file}...")
+
+    with open(ics_file, 'r') as f:
+        content = f.read()
+
+    subscribers = load_subscribers(subscriptions_file, output_dir)
+    workers = workers or os.cpu_count() or 1
+
+    if len(subscribers) < PARALLEL_THRESHOLD or workers == 1:
+        results = fanout_subscribers(MasterCalendar(content), subscribers)
+    else:
+        # Each worker parses the master once and handles a contiguous chunk of subscribers
+        chunk_size = -(-len(subscribers) // (workers * 4))
+        chunks = [subscribers[i:i + chunk_size] for i in range(0, len(subscribers), chunk_size)]
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(content,)) as pool:
+            results = [result for chunk in pool.map(_fanout_chunk, chunks) for result in chunk]
+
+    written = sum(1 for _, _, was_written in results if was_written)
+    print(f"Generated {len(results)} subscriber feeds ({written} changed)")
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Generate per-subscriber filtered calendar feeds.')
+    parser.add_argument('--ics-file', default='main.ics', help='Path to the master ICS calendar file')
+    parser.add_argument('--subscriptions', default='subscriptions.json', help='Path to the subscriptions JSON file')
+    parser.add_argument('--output-dir', default='feeds', help='Directory for feeds without an explicit output path')
+    parser.add_argument('--workers', type=int, default=None, help='Number of worker processes (default: CPU count)')
+
+    args = parser.parse_args()
+
+    for path in (args.ics_file, args.subscriptions):
+        if not os.path.isfile(path):
+            print(f"Error: File not found: {path}")
+            return 1
+
+    try:
+        fanout_calendar(args.ics_file, args.subscriptions, args.output_dir, args.workers)
+        return 0
+    except Exception as e:
+        print(f"Error: {e}")
+        return 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,281 @@
+#!/usr/bin/env python3
+"""
+Calendar Feed Server
+
+Serves the generated calendar feeds (main.ics, main_outlook.ics) over HTTP so
+that polling clients mostly cost a header exchange instead of a full download:
+- gzip (and brotli, if the `brotli` package is installed) variants are
+  compressed once per feed version and served by Accept-Encoding
+- strong ETags are derived from the content hash, and If-None-Match /
+  If-Modified-Since requests get 304 Not Modified
+- Cache-Control max-age follows the feed's X-PUBLISHED-TTL (or REFRESH-INTERVAL)
+
+Feeds are reloaded automatically when the file on disk changes.
+
+Usage:
+  python feed_server.py [--port 8000] [--bind 127.0.0.1] [main.ics main_outlook.ics ...]
+"""
+
+import os
+import re
+import sys
+import gzip
+import hashlib
+import argparse
+import threading
+from email.utils import formatdate, parsedate_to_datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+try:
+    import brotli
+except ImportError:  # brotli is optional; gzip is always available
+    brotli = None
+
+# Used when a feed declares neither X-PUBLISHED-TTL nor REFRESH-INTERVAL
+DEFAULT_MAX_AGE = 3600
+
+DURATION_PATTERN = re.compile(
+    r'^P(?:(\d+)W)?(?:(\d+)D)?(?:T(?:(\d+)H)?(?:(\d+)M)?(?:(\d+)S)?)?$'
+)
+TTL_PATTERN = re.compile(
+    r'^(X-PUBLISHED-TTL|REFRESH-INTERVAL)[;:](?:.*:)?(P[0-9WDTHMS]+)\s*$',
+    re.MULTILINE | re.IGNORECASE
+)
+
+
+def parse_duration(value):
+    """Convert an iCalendar/ISO 8601 duration like P1D or PT12H to seconds."""
+    match = DURATION_PATTERN.match(value.strip())
+    if not match:
+        return None
+    weeks, days, hours, minutes, seconds = (int(part or 0) for part in match.groups())
+    return (((weeks * 7 + days) * 24 + hours) * 60 + minutes) * 60 + seconds
+
+
+def feed_max_age(content):
+    """Return the refresh interval a feed asks clients to use, in seconds."""
+    # Only the calendar header is relevant, which precedes the first component
+    header = content.split(b'\nBEGIN:', 1)[0].decode('utf-8', 'replace')
+    durations = {name.upper(): value for name, value in TTL_PATTERN.findall(header)}
+    for name in ('X-PUBLISHED-TTL', 'REFRESH-INTERVAL'):
+        seconds = parse_duration(durations.get(name, ''))
+        if seconds:
+            return seconds
+    return DEFAULT_MAX_AGE
+
+
+class FeedVariant:
+    """One encoding of a feed: the body bytes and its strong ETag."""
+
+    def __init__(self, body, etag):
+        self.body = body
+        self.etag = etag
+
+
+class FeedVersion:
+    """
+    An immutable snapshot of one version of a feed with all its encodings,
+    so a request is never served a mix of an old and a new version.
+    """
+
+    def __init__(self, content, mtime):
+        tag = hashlib.sha256(content).hexdigest()[:32]
+        # Each encoding is a different representation and needs its own strong ETag
+        self.variants = {'identity': FeedVariant(content, f'"{tag}"')}
+        self.variants['gzip'] = FeedVariant(gzip.compress(content, compresslevel=9, mtime=0), f'"{tag}-gz"')
+        if brotli is not None:
+            self.variants['br'] = FeedVariant(brotli.compress(content), f'"{tag}-br"')
+
+        self.etags = [variant.etag for variant in self.variants.values()]
+        self.max_age = feed_max_age(content)
+        self.last_modified = int(mtime)
+
+    def negotiate(self, accept_encoding):
+        """Pick the smallest variant the client accepts."""
+        accepted = parse_accept_encoding(accept_encoding)
+        for encoding in ('br', 'gzip'):
+            if encoding in self.variants and accepted.get(encoding, accepted.get('*', 0)) > 0:
+                return encoding, self.variants[encoding]
+        return 'identity', self.variants['identity']
+
+
+class Feed:
+    """
+    A calendar file on disk, recompressed only when the file changes.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._stat = None
+        self._version = None
+        self._lock = threading.Lock()
+
+    def current(self):
+        """Return the current FeedVersion, reloading it first if the file changed."""
+        stat = os.stat(self.path)
+        key = (stat.st_mtime_ns, stat.st_size)
+        if key != self._stat:
+            with self._lock:
+                if key != self._stat:
+                    with open(self.path, 'rb') as f:
+                        self._version = FeedVersion(f.read(), stat.st_mtime)
+                    self._stat = key
+        return self._version
+
+
+def parse_accept_encoding(header):
+    """Parse an Accept-Encoding header into {encoding: quality}."""
+    accepted = {}
+    for item in (header or '').split(','):
+        parts = item.strip().split(';')
+        encoding = parts[0].strip().lower()
+        if not encoding:
+            continue
+        quality = 1.0
+        for param in parts[1:]:
+            name, _, value = param.strip().partition('=')
+            if name == 'q':
+                try:
+                    quality = float(value)
+                except ValueError:
+                    quality = 0.0
+        accepted[encoding] = quality
+    return accepted
+
+
+def etag_matches(if_none_match, etags):
+    """Weak comparison of an If-None-Match header against a feed's ETags (RFC 7232)."""
+    candidates = {tag.strip() for tag in if_none_match.split(',')}
+    if '*' in candidates:
+        return True
+    candidates = {tag[2:] if tag.startswith('W/') else tag for tag in candidates}
+    return any(etag in candidates for etag in etags)
+
+
+class FeedRequestHandler(BaseHTTPRequestHandler):
+    """Serves the feeds registered on the server with conditional GET support."""
+
+    protocol_version = 'HTTP/1.1'
+    server_version = 'AnimeCalendarFeed/1.0'
+
+    def do_HEAD(self):
+        self._serve(send_body=False)
+
+    def do_GET(self):
+        self._serve(send_body=True)
+
+    def _serve(self, send_body):
+        feed = self.server.feeds.get(self.path.split('?', 1)[0])
+        if feed is None:
+            self.send_error(404, 'Feed not found')
+            return
+
+        try:
+            feed = feed.current()
+        except OSError:
+            self.send_error(503, 'Feed temporarily unavailable')
+            return
+
+        encoding, variant = feed.negotiate(self.headers.get('Accept-Encoding'))
+
+        if self._not_modified(feed):
+            self.send_response(304)
+            self._send_cache_headers(feed, variant)
+            self.send_header('Content-Length', '0')
+            self.end_headers()
+            return
+
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/calendar; charset=utf-8')
+        if encoding != 'identity':
+            self.send_header('Content-Encoding', encoding)
+        self.send_header('Content-Length', str(len(variant.body)))
+        self._send_cache_headers(feed, variant)
+        self.end_headers()
+        if send_body:
+            self.wfile.write(variant.body)
+
+    def _not_modified(self, feed):
+        if_none_match = self.headers.get('If-None-Match')
+        if if_none_match is not None:
+            return etag_matches(if_none_match, feed.etags)
+
+        if_modified_since = self.headers.get('If-Modified-Since')
+        if if_modified_since:
+            try:
+                since = parsedate_to_datetime(if_modified_since).timestamp()
+            except (TypeError, ValueError):
+                return False
+            return feed.last_modified <= since
+        return False
+
+    def _send_cache_headers(self, feed, variant):
+        self.send_header('ETag', variant.etag)
+        self.send_header('Last-Modified', formatdate(feed.last_modified, usegmt=True))
+        self.send_header('Cache-Control', f'public, max-age={feed.max_age}')
+        self.send_header('Vary', 'Accept-Encoding')
+
+    def log_message(self, format, *args):
+        if not self.server.quiet:
+            super().log_message(format, *args)
+
+
+class FeedServer(ThreadingHTTPServer):
+    """HTTP server publishing calendar files at /<file name>."""
+
+    daemon_threads = True
+
+    def __init__(self, address, feed_files, quiet=False):
+        super().__init__(address, FeedRequestHandler)
+        self.quiet = quiet
+        self.feeds = {}
+        for path in feed_files:
+            feed = Feed(path)
+            feed.current()  # Fail early on unreadable files
+            self.feeds[f"/{os.path.basename(path)}"] = feed
+
+    @property
+    def url(self):
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}"
+
+
+def main():
+    script_dir = os.path.dirname(os.path.abspath(__file__))
+    root_dir = os.path.dirname(script_dir)
+
+    parser = argparse.ArgumentParser(description='Serve calendar feeds with ETag, gzip and conditional GET support.')
+    parser.add_argument('feeds', nargs='*', help='Calendar files to serve (default: main.ics and main_outlook.ics)')
+    parser.add_argument('--bind', default='127.0.0.1', help='Address to listen on')
+    parser.add_argument('--port', type=int, default=8000, help='Port to listen on')
+    parser.add_argument('--quiet', action='store_true', help='Do not log requests')
+
+    args = parser.parse_args()
+
+    feed_files = args.feeds or [
+        path for path in (os.path.join(root_dir, 'main.ics'), os.path.join(root_dir, 'main_outlook.ics'))
+        if os.path.isfile(path)
+    ]
+    missing = [path for path in feed_files if not os.path.isfile(path)]
+    if missing or not feed_files:
+        print(f"Error: Calendar file not found: {', '.join(missing) or 'main.ics'}")
+        return 1
+
+    server = FeedServer((args.bind, args.port), feed_files, quiet=args.quiet)
+    print(f"Serving {len(server.feeds)} feeds at {server.url}")
+    for route in server.feeds:
+        print(f"  {server.url}{route}")
+    if brotli is None:
+        print("Note: install the 'brotli' package to also serve brotli-compressed feeds")
+
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        print("\nStopping feed server")
+    finally:
+        server.server_close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -5,7 +5,7 @@ Final Cleanup Script
 This script performs a final cleanup of the calendar file:
 1. Removes duplicate IMAGE properties
 2. Corrects any malformed LAST-MODIFIED entries
-3. Updates timestamps to current time
+3. Updates LAST-MODIFIED timestamps of events whose content changed
 4. Validates the final calendar format
 
 Usage:
@@ -19,6 +19,10 @@ import argparse
 import datetime
 from pathlib import Path
 
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from output_writer import write_if_changed
+from event_hash import refresh_content_hash, set_event_property
+
 def cleanup_calendar(ics_file):
     """Perform final cleanup of the calendar file."""
     print(f"Performing final cleanup of {ics_file}...")
@@ -38,6 +42,7 @@ def cleanup_calendar(ics_file):
     fixed_parts = []
     event_count = 0
     fixed_count = 0
+    modified_count = 0
     
     # Current UTC time for updating LAST-MODIFIED
     now = datetime.datetime.utcnow().strftime("%Y%m%dT%H%M%SZ")
@@ -72,27 +77,34 @@ def cleanup_calendar(ics_file):
                 
                 fixed_count += 1
             
-            # Update LAST-MODIFIED timestamp
-            part = re.sub(r'LAST-MODIFIED:.*?(\r?\n)', f'LAST-MODIFIED:{now}\\1', part)
+            # Update LAST-MODIFIED only if the event's content hash changed
+            part, changed = refresh_content_hash(part)
+            if changed:
+                part = set_event_property(part, 'LAST-MODIFIED', now)
+                modified_count += 1
         
         fixed_parts.append(part)
     
-    # Update main calendar LAST-MODIFIED
-    main_last_modified = re.sub(
-        r'(LAST-MODIFIED:)(\d{8}T\d{6}Z)', 
-        f'\\1{now}', 
-        ''.join(fixed_parts)
-    )
+    # Update main calendar LAST-MODIFIED (in the header, before the first event)
+    if modified_count:
+        fixed_parts[0] = re.sub(
+            r'^(LAST-MODIFIED:)(\d{8}T\d{6}Z)', 
+            f'\\g<1>{now}', 
+            fixed_parts[0],
+            flags=re.MULTILINE
+        )
     
     # Join the parts back together
-    fixed_content = main_last_modified
+    fixed_content = ''.join(fixed_parts)
     
     # Write back to the file
-    with open(ics_file, 'w') as f:
-        f.write(fixed_content)
+    write_if_changed(ics_file, fixed_content)
     
     print(f"Cleaned up {fixed_count} events with duplicate images out of {event_count} total events.")
-    print(f"Updated all timestamps to {now}")
+    if modified_count:
+        print(f"Updated timestamps of {modified_count} changed events to {now}")
+    else:
+        print("No event content changed; timestamps left as they were.")
     
     return True
 
@@ -9,6 +9,9 @@ import re
 import sys
 import os
 
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from output_writer import write_if_changed
+
 def fix_duplicate_images(ics_file):
     """Remove duplicate IMAGE properties from calendar events."""
     print(f"Fixing duplicate images in {ics_file}...")
@@ -60,8 +63,7 @@ def fix_duplicate_images(ics_file):
     fixed_content = ''.join(fixed_parts)
     
     # Write back to the file
-    with open(ics_file, 'w') as f:
-        f.write(fixed_content)
+    write_if_changed(ics_file, fixed_content)
     
     print(f"Fixed {fixed_count} events with duplicate images out of {event_count} total events.")
     return True
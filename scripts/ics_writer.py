@@ -0,0 +1,111 @@
+#!/usr/bin/env python3
+"""
+ICS Writer
+
+A streaming iCalendar writer that writes content lines straight to a file
+handle instead of building the whole calendar in memory:
+- lines longer than 75 octets are folded (RFC 5545 section 3.1) without
+  splitting multi-byte UTF-8 characters
+- TEXT values are escaped (backslash, semicolon, comma and newlines)
+- untouched events can be copied through verbatim, so their original bytes
+  (folding, property order, line endings) are preserved
+
+Usage:
+  with AtomicWriter('main.ics') as f:
+      writer = ICSWriter(f)
+      writer.begin('VCALENDAR')
+      writer.write_property('VERSION', '2.0', escape=False)
+      writer.write_component(event)      # an icalendar component
+      writer.write_raw(original_event)   # verbatim text
+      writer.end('VCALENDAR')
+"""
+
+import re
+
+MAX_LINE_OCTETS = 75
+
+TEXT_ESCAPES = str.maketrans({'\\': '\\\\', ';': '\\;', ',': '\\,', '\n': '\\n'})
+TEXT_UNESCAPE = re.compile(r'\\([\\;,nN])')
+
+
+def escape_text(value):
+    """Escape a TEXT property value (RFC 5545 section 3.3.11)."""
+    return str(value).replace('\r\n', '\n').translate(TEXT_ESCAPES)
+
+
+def unescape_text(value):
+    """Reverse escape_text for a TEXT property value."""
+    return TEXT_UNESCAPE.sub(lambda match: '\n' if match.group(1) in 'nN' else match.group(1), value)
+
+
+def _quote_parameter(value):
+    value = str(value)
+    if any(char in value for char in ':;,'):
+        return f'"{value}"'
+    return value
+
+
+def fold_line(line, newline='\r\n'):
+    """Fold one content line into chunks of at most 75 octets, ending with newline."""
+    if line.isascii():
+        if len(line) <= MAX_LINE_OCTETS:
+            return line + newline
+        # Continuation lines start with a space, which counts toward the limit
+        chunks = [line[:MAX_LINE_OCTETS]]
+        chunks += [line[i:i + MAX_LINE_OCTETS - 1] for i in range(MAX_LINE_OCTETS, len(line), MAX_LINE_OCTETS - 1)]
+        return f"{newline} ".join(chunks) + newline
+
+    data = line.encode('utf-8')
+    if len(data) <= MAX_LINE_OCTETS:
+        return line + newline
+
+    chunks = []
+    start = 0
+    width = MAX_LINE_OCTETS
+    while start < len(data):
+        end = min(start + width, len(data))
+        # Never end a chunk inside a UTF-8 sequence (continuation bytes are 10xxxxxx)
+        while end < len(data) and (data[end] & 0xC0) == 0x80:
+            end -= 1
+        chunks.append(data[start:end].decode('utf-8'))
+        start = end
+        width = MAX_LINE_OCTETS - 1
+    return f"{newline} ".join(chunks) + newline
+
+
+class ICSWriter:
+    """Writes folded iCalendar content lines to a text stream."""
+
+    def __init__(self, stream, newline='\r\n'):
+        self.stream = stream
+        self.newline = newline
+
+    def write_line(self, line):
+        """Write one unfolded content line."""
+        self.stream.write(fold_line(line, self.newline))
+
+    def write_raw(self, text):
+        """Write already-serialized text (e.g. an untouched event) unchanged."""
+        self.stream.write(text)
+
+    def write_property(self, name, value, parameters=None, escape=True):
+        """Write a property. TEXT values are escaped unless escape=False."""
+        params = ''.join(f";{key}={_quote_parameter(param)}" for key, param in (parameters or {}).items())
+        self.write_line(f"{name}{params}:{escape_text(value) if escape else value}")
+
+    def begin(self, name):
+        self.write_line(f"BEGIN:{name}")
+
+    def end(self, name):
+        self.write_line(f"END:{name}")
+
+    def write_component(self, component):
+        """Write an icalendar component (and its sub-components) in its current property order."""
+        for line in component.content_lines(sorted=False):
+            if line:
+                self.write_line(str(line))
+
+
+def detect_newline(content):
+    """Return the line ending used by existing calendar content."""
+    return '\r\n' if '\r\n' in content else '\n'
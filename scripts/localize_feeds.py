@@ -0,0 +1,227 @@
+#!/usr/bin/env python3
+"""
+Localized Feeds
+
+Renders the master calendar (all times in UTC) into one feed per time zone,
+with DTSTART/DTEND in local wall time (DTSTART;TZID=Asia/Tokyo:...) and a
+matching VTIMEZONE block, for clients that show floating UTC times poorly.
+
+Each zone's UTC offsets are precomputed once into a transition table for the
+years the calendar spans; converting an event's times is then a binary search
+in that table instead of a time zone computation per value. The same table
+produces the VTIMEZONE block, which lists every transition in the range
+explicitly.
+
+Events with an RRULE (see rrule_compact.py) keep their UTC times: repeating
+them at a local wall time would move them by an hour across DST changes.
+
+Usage:
+  python localize_feeds.py Asia/Tokyo Europe/Berlin America/New_York [--ics-file main.ics] [--output-dir feeds]
+"""
+
+import os
+import re
+import sys
+import bisect
+import argparse
+import calendar
+import time
+from datetime import datetime, timezone
+from functools import lru_cache
+from zoneinfo import ZoneInfo, ZoneInfoNotFoundError
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from output_writer import AtomicWriter
+from feed_fanout import MasterCalendar, SAFE_NAME
+from ics_writer import detect_newline
+
+# UTC date-times of the properties that are converted, e.g. DTSTART:20250524T130000Z
+UTC_TIME_LINE = re.compile(r'^(DTSTART|DTEND|RECURRENCE-ID)(?:;[^:\r\n]*)?:(\d{8}T\d{6})Z(\r?)$', re.MULTILINE)
+UTC_VALUE = re.compile(r'\d{8}T\d{6}Z')
+VTIMEZONE_BLOCK = re.compile(r'BEGIN:VTIMEZONE.*?END:VTIMEZONE\r?\n', re.DOTALL)
+
+# Offsets are sampled this often when searching for transitions; zones never
+# change their offset twice within six hours
+SCAN_STEP = 6 * 60 * 60
+
+
+def parse_utc(value):
+    """Seconds since the epoch for 20250524T130000Z."""
+    return calendar.timegm((int(value[0:4]), int(value[4:6]), int(value[6:8]),
+                            int(value[9:11]), int(value[11:13]), int(value[13:15])))
+
+
+def format_local(seconds):
+    """Format seconds since the epoch (already shifted to local time) as 20250524T220000."""
+    return time.strftime('%Y%m%dT%H%M%S', time.gmtime(seconds))
+
+
+def format_offset(seconds):
+    sign = '-' if seconds < 0 else '+'
+    hours, rest = divmod(abs(seconds), 3600)
+    minutes, secs = divmod(rest, 60)
+    return f"{sign}{hours:02d}{minutes:02d}{f'{secs:02d}' if secs else ''}"
+
+
+class TransitionTable:
+    """
+    The UTC offsets of one zone between two years, as a sorted list of
+    periods: (start in UTC seconds, offset in seconds, abbreviation, is DST).
+    """
+
+    def __init__(self, zone_name, first_year, last_year):
+        self.zone_name = zone_name
+        self.first_year = first_year
+        self.last_year = last_year
+        zone = ZoneInfo(zone_name)
+        self.start = calendar.timegm((first_year, 1, 1, 0, 0, 0))
+        end = calendar.timegm((last_year + 1, 1, 1, 0, 0, 0))
+
+        def period(seconds):
+            local = datetime.fromtimestamp(seconds, zone)
+            return int(local.utcoffset().total_seconds()), local.tzname(), bool(local.dst())
+
+        current = period(self.start)
+        self.starts = [self.start]
+        self.periods = [current]
+        for seconds in range(self.start + SCAN_STEP, end + SCAN_STEP, SCAN_STEP):
+            sample = period(seconds)
+            if sample == current:
+                continue
+            # The change happened within the last step: narrow it down to the second
+            low, high = seconds - SCAN_STEP, seconds
+            while high - low > 1:
+                middle = (low + high) // 2
+                if period(middle) == current:
+                    low = middle
+                else:
+                    high = middle
+            self.starts.append(high)
+            self.periods.append(sample)
+            current = sample
+
+    def offset_at(self, seconds):
+        """UTC offset in seconds at a UTC instant."""
+        index = bisect.bisect_right(self.starts, seconds) - 1
+        return self.periods[max(index, 0)][0]
+
+    def to_local(self, value):
+        """Convert 20250524T130000Z to the zone's wall time, 20250524T220000."""
+        seconds = parse_utc(value)
+        return format_local(seconds + self.offset_at(seconds))
+
+    def vtimezone(self, newline='\r\n'):
+        """Return a VTIMEZONE block listing every period in the table."""
+        lines = ['BEGIN:VTIMEZONE', f'TZID:{self.zone_name}', f'X-LIC-LOCATION:{self.zone_name}']
+        previous_offset = self.periods[0][0]
+        for start, (offset, name, dst) in zip(self.starts, self.periods):
+            component = 'DAYLIGHT' if dst else 'STANDARD'
+            # DTSTART is the wall time the period begins at, in the offset before it
+            lines += [
+                f'BEGIN:{component}',
+                f'DTSTART:{format_local(start + previous_offset)}',
+                f'TZOFFSETFROM:{format_offset(previous_offset)}',
+                f'TZOFFSETTO:{format_offset(offset)}',
+                f'TZNAME:{name}',
+                f'END:{component}',
+            ]
+            previous_offset = offset
+        lines.append('END:VTIMEZONE')
+        return newline.join(lines) + newline
+
+
+@lru_cache(maxsize=None)
+def transition_table(zone_name, first_year, last_year):
+    """Return the (cached) transition table of a zone for a year range."""
+    return TransitionTable(zone_name, first_year, last_year)
+
+
+def year_range(master):
+    """The first and last year of any UTC time in the calendar's events."""
+    years = [int(value[:4]) for event in master.events for value in UTC_VALUE.findall(event)]
+    if not years:
+        year = datetime.now(timezone.utc).year
+        return year, year
+    return min(years), max(years)
+
+
+def localize_event(event, table):
+    """Rewrite an event's UTC DTSTART/DTEND as wall times in the table's zone."""
+    if '\nRRULE' in event:
+        return event
+
+    def convert(match):
+        name, value, cr = match.groups()
+        return f"{name};TZID={table.zone_name}:{table.to_local(value)}{cr}"
+
+    return UTC_TIME_LINE.sub(convert, event)
+
+
+def localize_header(header, table, newline):
+    """Replace the calendar's time zone properties and VTIMEZONE blocks."""
+    header = re.sub(r'^(X-WR-TIMEZONE|TIMEZONE-ID):.*?(\r?)$', rf'\1:{table.zone_name}\2', header, flags=re.MULTILINE)
+    header = re.sub(r'^(X-WR-CALNAME:.*?)(\r?)$', rf'\1 ({table.zone_name})\2', header, count=1, flags=re.MULTILINE)
+    header = VTIMEZONE_BLOCK.sub('', header)
+    return header + table.vtimezone(newline)
+
+
+def feed_path(ics_file, zone_name, output_dir):
+    name = os.path.splitext(os.path.basename(ics_file))[0]
+    return os.path.join(output_dir, f"{name}.{SAFE_NAME.sub('_', zone_name.replace('/', '-'))}.ics")
+
+
+def localize_calendar(ics_file, zone_names, output_dir='feeds'):
+    """Write one localized feed per zone. Returns [(zone, path, written)]."""
+    print(f"Generating localized feeds from {ics_file}...")
+
+    with open(ics_file, 'r') as f:
+        content = f.read()
+    master = MasterCalendar(content)
+    newline = detect_newline(content)
+    first_year, last_year = year_range(master)
+
+    os.makedirs(output_dir, exist_ok=True)
+    results = []
+    for zone_name in zone_names:
+        table = transition_table(zone_name, first_year, last_year)
+        events = [localize_event(event, table) for event in master.events]
+        path = feed_path(ics_file, zone_name, output_dir)
+        writer = AtomicWriter(path)
+        with writer as f:
+            f.write(master.render(events, localize_header(master.header, table, newline)))
+        results.append((zone_name, path, writer.changed))
+        print(f"  {zone_name}: {path}{'' if writer.changed else ' (unchanged)'}")
+
+    print(f"Generated {len(results)} localized feeds ({sum(written for _, _, written in results)} changed)")
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Generate feeds with local times for one or more time zones.')
+    parser.add_argument('zones', nargs='+', metavar='ZONE', help='IANA time zone names, e.g. Asia/Tokyo')
+    parser.add_argument('--ics-file', default='main.ics', help='Path to the master ICS calendar file')
+    parser.add_argument('--output-dir', default='feeds', help='Directory for the localized feeds')
+
+    args = parser.parse_args()
+
+    if not os.path.isfile(args.ics_file):
+        print(f"Error: Calendar file not found: {args.ics_file}")
+        return 1
+
+    try:
+        for zone_name in args.zones:
+            ZoneInfo(zone_name)
+    except (ZoneInfoNotFoundError, ValueError):
+        print(f"Error: Unknown time zone: {zone_name}")
+        return 1
+
+    try:
+        localize_calendar(args.ics_file, args.zones, args.output_dir)
+        return 0
+    except Exception as e:
+        print(f"Error: {e}")
+        return 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
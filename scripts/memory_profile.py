@@ -0,0 +1,201 @@
+#!/usr/bin/env python3
+"""
+Memory Profiling
+
+Per-stage memory accounting for large-calendar runs, enabled with
+--profile-memory on refresh_calendar.py and the individual scripts. While
+enabled, tracemalloc traces every allocation; each stage records its peak
+and its net allocations (what it left behind), and the report adds peak RSS,
+the top allocation sites and the memory cost per event.
+
+Stages are marked in the code with a block or a decorator:
+
+  with memory_profile.stage('parse'):
+      cal = parse(content)
+      memory_profile.set_events(len(events))
+
+  @memory_profile.profiled('validate')
+  def validate_ics_file(...): ...
+
+When profiling is not enabled, both cost next to nothing.
+
+Tracing slows a run down noticeably; use it to investigate, not in
+scheduled refreshes.
+"""
+
+import sys
+import time
+import atexit
+import tracemalloc
+import functools
+import contextlib
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+# Frames kept per traced allocation; one is enough to name the source line
+TRACE_FRAMES = 1
+DEFAULT_TOP = 10
+
+_profiler = None
+
+
+class StageRecord:
+    """What one stage allocated, and over how many events (for per-event costs)."""
+
+    def __init__(self, name):
+        self.name = name
+        self.events = None
+        self.seconds = 0.0
+        self.peak = 0
+        self.net = 0
+        self.child_peak = 0
+
+
+class MemoryProfiler:
+    """
+    Records tracemalloc statistics for each stage of a run.
+    """
+
+    def __init__(self, top=DEFAULT_TOP):
+        self.top = top
+        self.stages = []
+        self._first_snapshot = None
+        self._stack = []
+        # Highest traced memory seen before a stage reset the peak counter
+        self._peak = 0
+
+    def start(self):
+        if not tracemalloc.is_tracing():
+            tracemalloc.start(TRACE_FRAMES)
+        self._first_snapshot = tracemalloc.take_snapshot()
+
+    @contextlib.contextmanager
+    def stage(self, name):
+        parent = self._stack[-1] if self._stack else None
+        record = StageRecord(f"{parent.name}/{name}" if parent else name)
+        self.stages.append(record)
+        before, peak = tracemalloc.get_traced_memory()
+        self._peak = max(self._peak, peak)
+        # tracemalloc has a single peak counter: hand the peak so far to the
+        # enclosing stage before resetting it for this one
+        if parent:
+            parent.child_peak = max(parent.child_peak, peak)
+        tracemalloc.reset_peak()
+        self._stack.append(record)
+        started = time.perf_counter()
+        try:
+            yield record
+        finally:
+            self._stack.pop()
+            current, peak = tracemalloc.get_traced_memory()
+            peak = max(peak, record.child_peak)
+            if parent:
+                parent.child_peak = max(parent.child_peak, peak)
+            record.seconds = time.perf_counter() - started
+            record.peak = max(peak - before, 0)
+            record.net = current - before
+
+    def report(self, stream=None):
+        """Print the per-stage table, peak RSS and top allocation sites."""
+        stream = stream or sys.stdout
+        snapshot = tracemalloc.take_snapshot()
+        _, peak = tracemalloc.get_traced_memory()
+        peak = max(peak, self._peak)
+
+        print("\nMemory profile", file=stream)
+        print(f"  {'stage':<28} {'time':>9} {'peak':>10} {'retained':>10} {'per event':>11}", file=stream)
+        for record in self.stages:
+            per_event = (f"{format_bytes(record.peak / record.events)}"
+                         if record.events else '')
+            print(f"  {record.name:<28} {record.seconds:8.2f}s {format_bytes(record.peak):>10} "
+                  f"{format_bytes(record.net):>10} {per_event:>11}", file=stream)
+        print(f"  traced peak {format_bytes(peak)}, peak RSS {format_bytes(peak_rss())}", file=stream)
+
+        statistics = snapshot.filter_traces([
+            tracemalloc.Filter(False, tracemalloc.__file__),
+            tracemalloc.Filter(False, __file__),
+        ])
+        if self._first_snapshot is not None:
+            statistics = statistics.compare_to(self._first_snapshot, 'lineno')
+            sites = [stat for stat in statistics if stat.size_diff > 0][:self.top]
+            print(f"  top {len(sites)} allocation sites still held:", file=stream)
+            for stat in sites:
+                frame = stat.traceback[0]
+                print(f"    {format_bytes(stat.size_diff):>10}  {frame.filename}:{frame.lineno}", file=stream)
+
+    def stop(self):
+        tracemalloc.stop()
+
+
+def format_bytes(size):
+    size = float(size)
+    for unit in ('B', 'KiB', 'MiB'):
+        if abs(size) < 1024:
+            return f"{size:.0f} {unit}" if unit == 'B' else f"{size:.1f} {unit}"
+        size /= 1024
+    return f"{size:.2f} GiB"
+
+
+def peak_rss():
+    """Peak resident set size of this process in bytes (0 where unsupported)."""
+    if resource is None:
+        return 0
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports kilobytes, macOS bytes
+    return peak if sys.platform == 'darwin' else peak * 1024
+
+
+def enable(top=DEFAULT_TOP):
+    """Start profiling this process; the report is printed when it exits. Returns the active profiler."""
+    global _profiler
+    if _profiler is None:
+        _profiler = MemoryProfiler(top)
+        _profiler.start()
+        atexit.register(finish)
+    return _profiler
+
+
+def active():
+    return _profiler
+
+
+def stage(name):
+    """Context manager marking a stage; a no-op unless profiling is enabled."""
+    if _profiler is None:
+        return contextlib.nullcontext()
+    return _profiler.stage(name)
+
+
+def profiled(name):
+    """Decorator running a function as a stage."""
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with stage(name):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def set_events(count):
+    """Record how many events the current stage handled."""
+    if _profiler is not None and _profiler._stack:
+        _profiler._stack[-1].events = count
+
+
+def finish():
+    """Print the report and stop profiling, if it was enabled."""
+    global _profiler
+    if _profiler is not None:
+        _profiler.report()
+        _profiler.stop()
+        _profiler = None
+
+
+def add_argument(parser):
+    """Add the --profile-memory option to a script's argument parser."""
+    parser.add_argument('--profile-memory', action='store_true',
+                        help='Report per-stage memory use (tracemalloc), peak RSS and top allocation sites')
@@ -4,8 +4,10 @@ Optimize Calendar for Outlook
 
 This script optimizes the calendar file specifically for Microsoft Outlook:
 1. Removes duplicate IMAGE properties
-2. Ensures IMAGE properties use parameters compatible with Outlook
-3. Increments the SEQUENCE counter to force update in subscribed calendars
+2. Ensures IMAGE properties use parameters compatible with Outlook, and
+   links TMDB images in a badge-sized rendition instead of a larger one
+3. Increments the SEQUENCE counter of events whose content changed since the
+   previous optimized output, so subscribed calendars only reprocess those
 
 Usage:
   python optimize_for_outlook.py [--ics-file main.ics] [--output main_outlook.ics]
@@ -17,78 +19,154 @@ import re
 import argparse
 from pathlib import Path
 
-def optimize_calendar_for_outlook(input_file, output_file):
-    """Optimize the calendar file for Microsoft Outlook."""
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from output_writer import write_if_changed
+from event_hash import (CONTENT_HASH_PROPERTY, event_content_hash, get_event_property,
+                        get_sequence, set_event_property, unfold)
+from tmdb_images import resize_image_url
+from ics_writer import fold_line
+import memory_profile
+
+def load_published_events(output_file):
+    """Map UID -> (content hash, SEQUENCE) for events in a previously written output file."""
+    if not os.path.isfile(output_file):
+        return {}
+    
+    with open(output_file, 'r') as f:
+        content = f.read()
+    
+    published = {}
+    for event in re.findall(r'BEGIN:VEVENT.*?END:VEVENT', content, flags=re.DOTALL):
+        uid = get_event_property(event, 'UID')
+        if uid:
+            published[uid.strip()] = (event_content_hash(event), get_sequence(event))
+    return published
+
+# An IMAGE property including any folded continuation lines
+IMAGE_PATTERN = re.compile(r'IMAGE;[^\r\n]*(?:\r?\n[ \t][^\r\n]*)*\r?\n')
+
+def optimize_event_images(event):
+    """
+    Keep only the first IMAGE property of an event, with Outlook-compatible parameters.
+    Returns (event, has_image).
+    """
+    image_matches = [
+        match for match in IMAGE_PATTERN.finditer(event)
+        if 'VALUE=URI:' in unfold(match.group(0))
+    ]
+    if not image_matches:
+        return event, False
+    
+    # Ensure the IMAGE property uses parameters compatible with Outlook
+    first_image = image_matches[0].group(0)
+    optimized_image = unfold(first_image).replace('DISPLAY=THUMBNAIL', 'DISPLAY=BADGE')
+    
+    # A badge is shown small, so link a TMDB size that fits instead of a larger one
+    parameters, url = optimized_image.split('VALUE=URI:', 1)
+    url_value = url.rstrip('\r\n')
+    # The rebuilt line is unfolded; fold it again to stay within 75 octets
+    optimized_image = fold_line(f"{parameters}VALUE=URI:{resize_image_url(url_value, 'badge')}",
+                                url[len(url_value):])
+    
+    # Replace the first image in place and drop the rest (in reverse to keep offsets valid)
+    for match in reversed(image_matches[1:]):
+        event = event[:match.start()] + event[match.end():]
+    first = image_matches[0]
+    event = event[:first.start()] + optimized_image + event[first.end():]
+    return event, True
+
+def update_event_sequence(event, published):
+    """
+    Set an event's SEQUENCE relative to the version clients have already seen.
+    `published` maps UID -> (content hash, SEQUENCE) from the previous output.
+    Returns (event, changed).
+    """
+    content_hash = event_content_hash(event)
+    sequence = get_sequence(event)
+    uid = (get_event_property(event, 'UID') or '').strip()
+    changed = True
+    
+    if uid in published:
+        published_hash, published_sequence = published[uid]
+        if published_hash == content_hash:
+            sequence = max(sequence, published_sequence)
+            changed = False
+        else:
+            sequence = max(sequence, published_sequence + 1)
+    
+    event = set_event_property(event, 'SEQUENCE', sequence)
+    event = set_event_property(event, CONTENT_HASH_PROPERTY, content_hash)
+    return event, changed
+
+@memory_profile.profiled('optimize for Outlook')
+def optimize_calendar_for_outlook(input_file, output_file, calendar_name_suffix=None):
+    """
+    Optimize the calendar file for Microsoft Outlook.
+    If calendar_name_suffix is given (e.g. " (Outlook)"), it is appended to X-WR-CALNAME.
+    """
     print(f"Optimizing calendar for Outlook: {input_file} -> {output_file}")
     
     # Read the input calendar file
     with open(input_file, 'r') as f:
         content = f.read()
     
+    # SEQUENCE numbers and content hashes clients have already seen
+    published = load_published_events(output_file)
+    
     # Remove duplicate IMAGE properties
     event_count = 0
     image_count = 0
+    changed_count = 0
     
     # Split the file by events
     events = re.split(r'(BEGIN:VEVENT.*?END:VEVENT)', content, flags=re.DOTALL)
     updated_events = []
     
-    for i, event in enumerate(events):
+    for event in events:
         if 'BEGIN:VEVENT' in event:
             event_count += 1
             
             # Keep only one IMAGE property per event
-            image_pattern = r'(IMAGE;.*?VALUE=URI:.*?)(\r?\n)'
-            image_matches = re.findall(image_pattern, event, re.DOTALL)
-            
-            if image_matches:
-                # Keep only the first image
-                first_image = image_matches[0][0]
-                
-                # Replace all image properties with the optimized version
-                event = re.sub(image_pattern, '', event, flags=re.DOTALL)
-                
-                # Add the optimized image property
-                # Ensure the IMAGE property uses parameters compatible with Outlook
-                optimized_image = first_image.replace('DISPLAY=THUMBNAIL', 'DISPLAY=BADGE')
-                
-                # Insert optimized image before LAST-MODIFIED
-                event = re.sub(
-                    r'(LAST-MODIFIED:.*?)(\r?\n)',
-                    f'\\1\\2{optimized_image}\\2',
-                    event
-                )
-                
+            event, has_image = optimize_event_images(event)
+            if has_image:
                 image_count += 1
             
-            # Increment the SEQUENCE counter to force update
-            sequence_match = re.search(r'SEQUENCE:(\d+)', event)
-            if sequence_match:
-                current_sequence = int(sequence_match.group(1))
-                event = re.sub(
-                    r'SEQUENCE:\d+',
-                    f'SEQUENCE:{current_sequence + 1}',
-                    event
-                )
+            # Increment the SEQUENCE counter only if the event changed since
+            # it was last published, to force an update of just that event
+            event, changed = update_event_sequence(event, published)
+            if changed:
+                changed_count += 1
         
         updated_events.append(event)
     
+    if calendar_name_suffix:
+        updated_events[0] = re.sub(
+            r'^(X-WR-CALNAME:.*?)(\r?)$',
+            lambda m: m.group(1) + ('' if m.group(1).endswith(calendar_name_suffix) else calendar_name_suffix) + m.group(2),
+            updated_events[0], count=1, flags=re.MULTILINE
+        )
+    
+    memory_profile.set_events(event_count)
+    
     # Join the events back together
     updated_content = ''.join(updated_events)
     
     # Write the updated content to the output file
-    with open(output_file, 'w') as f:
-        f.write(updated_content)
+    write_if_changed(output_file, updated_content)
     
     print(f"Calendar optimized: {image_count}/{event_count} events have optimized images")
+    print(f"{changed_count}/{event_count} events are new or changed since the last optimized output")
     return True
 
 def main():
     parser = argparse.ArgumentParser(description='Optimize calendar for Microsoft Outlook.')
     parser.add_argument('--ics-file', default='main.ics', help='Path to the input ICS calendar file')
     parser.add_argument('--output', default='main_outlook.ics', help='Path to the output optimized calendar file')
+    memory_profile.add_argument(parser)
     
     args = parser.parse_args()
+    if args.profile_memory:
+        memory_profile.enable()
     
     # Ensure the ICS file exists
     input_file = args.ics_file
@@ -0,0 +1,154 @@
+#!/usr/bin/env python3
+"""
+Output Writer
+
+Shared writer used by every stage that produces a calendar (or preview) file.
+
+Output is rendered to a temporary file next to the target, flushed and
+fsync'd, and then compared against the existing file by content hash. If
+nothing meaningful changed the temporary file is discarded and the target is
+left untouched (keeping git, client caches and mtimes quiet); otherwise it is
+atomically renamed into place, so readers never see a half-written file.
+
+Volatile stamps (DTSTAMP and LAST-MODIFIED) can be ignored for the comparison,
+either per call or for all stages with CALENDAR_IGNORE_VOLATILE_STAMPS=1.
+"""
+
+import os
+import sys
+import hashlib
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from config import get_output_settings
+
+# Properties that change on every run without changing what clients display
+VOLATILE_PROPERTIES = ('DTSTAMP', 'LAST-MODIFIED')
+
+
+def _is_volatile(line):
+    for name in VOLATILE_PROPERTIES:
+        if line.startswith(name) and line[len(name):len(name) + 1] in (':', ';'):
+            return True
+    return False
+
+
+def content_digest(data, ignore_volatile=False):
+    """Return a SHA-256 hex digest of file content (str or bytes)."""
+    if isinstance(data, str):
+        data = data.encode('utf-8')
+
+    if not ignore_volatile:
+        return hashlib.sha256(data).hexdigest()
+
+    digest = hashlib.sha256()
+    skipping = False
+    for line in data.splitlines(keepends=True):
+        # Folded continuation lines belong to the previous property
+        if line[:1] in (b' ', b'\t'):
+            if not skipping:
+                digest.update(line)
+            continue
+        skipping = _is_volatile(line.decode('utf-8', 'replace'))
+        if not skipping:
+            digest.update(line)
+    return digest.hexdigest()
+
+
+def file_digest(path, ignore_volatile=False):
+    """Return the content digest of a file, or None if it does not exist."""
+    try:
+        with open(path, 'rb') as f:
+            return content_digest(f.read(), ignore_volatile)
+    except FileNotFoundError:
+        return None
+
+
+def _fsync_directory(directory):
+    try:
+        fd = os.open(directory, os.O_RDONLY)
+    except OSError:
+        return  # Not supported on this platform (e.g. Windows)
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+
+class AtomicWriter:
+    """
+    Context manager yielding a file handle whose content replaces `path` on
+    successful exit, but only if it differs from what is already there.
+
+    After the block, `changed` tells whether the target was rewritten.
+    """
+
+    def __init__(self, path, ignore_volatile=None, binary=False):
+        if ignore_volatile is None:
+            ignore_volatile = get_output_settings()['ignore_volatile']
+        self.path = os.path.abspath(path)
+        self.ignore_volatile = ignore_volatile
+        self.binary = binary
+        self.changed = False
+        self._file = None
+        self._temp_path = None
+
+    def __enter__(self):
+        directory = os.path.dirname(self.path)
+        fd, self._temp_path = tempfile.mkstemp(
+            dir=directory, prefix=f".{os.path.basename(self.path)}.", suffix='.tmp'
+        )
+        if self.binary:
+            self._file = os.fdopen(fd, 'wb')
+        else:
+            self._file = os.fdopen(fd, 'w', encoding='utf-8', newline='')
+        return self._file
+
+    def __exit__(self, exc_type, exc, tb):
+        try:
+            if exc_type is None:
+                self._file.flush()
+                os.fsync(self._file.fileno())
+            self._file.close()
+
+            if exc_type is not None:
+                return False
+
+            new_digest = file_digest(self._temp_path, self.ignore_volatile)
+            if new_digest == file_digest(self.path, self.ignore_volatile):
+                return False
+
+            self._copy_mode()
+            os.replace(self._temp_path, self.path)
+            self._temp_path = None
+            _fsync_directory(os.path.dirname(self.path))
+            self.changed = True
+            return False
+        finally:
+            if self._temp_path and os.path.exists(self._temp_path):
+                os.unlink(self._temp_path)
+
+    def _copy_mode(self):
+        # mkstemp creates files readable only by the owner; keep the target's
+        # permissions, or the usual umask-based default for new files
+        if os.path.exists(self.path):
+            mode = os.stat(self.path).st_mode & 0o7777
+        else:
+            umask = os.umask(0)
+            os.umask(umask)
+            mode = 0o666 & ~umask
+        os.chmod(self._temp_path, mode)
+
+
+def write_if_changed(path, content, ignore_volatile=None):
+    """
+    Atomically write content (str or bytes) to path unless it is unchanged.
+    Returns True if the file was written, False if the write was skipped.
+    """
+    writer = AtomicWriter(path, ignore_volatile, binary=isinstance(content, bytes))
+    with writer as f:
+        f.write(content)
+
+    if not writer.changed:
+        print(f"No changes to write for {path}")
+    return writer.changed
@@ -0,0 +1,127 @@
+#!/usr/bin/env python3
+"""
+Prefetch TMDB Responses
+
+Warms the persistent TMDB response cache (see tmdb_cache.py) for episodes
+airing in the next few days, so the actual refresh runs entirely from cache
+and no longer waits on TMDB. It plans exactly the lookups
+update_calendar_images.py would make for those events, soonest airings first,
+at a request rate below TMDB's limit so a concurrent refresh keeps headroom.
+
+Run it once before a refresh, or leave it running in the background with
+--every to keep the cache warm as entries expire.
+
+Usage:
+  python prefetch_tmdb.py [--ics-file main.ics] [--days 7] [--rate 10] [--every 60]
+"""
+
+import os
+import sys
+import time
+import argparse
+from datetime import datetime, timedelta, timezone
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from tmdb_api import TMDBApi, RateLimiter
+from config import get_tmdb_credentials, get_tmdb_cache_settings
+from calendar_diff import iter_events, event_uid
+from calendar_merge import start_key
+from rrule_compact import expand_if_compacted
+from calendar_snapshot import load_calendar
+from update_calendar_images import DEFAULT_WORKERS, plan_image_lookups, execute_plan
+
+DEFAULT_DAYS = 7
+# Well under TMDB's ~40 requests per second, leaving room for a refresh running alongside
+DEFAULT_RATE = 10
+
+
+def upcoming_uids(content, days, now=None):
+    """Return the UIDs of events starting within the next `days` days."""
+    now = now or datetime.now(timezone.utc)
+    window_start = now.strftime('%Y%m%dT%H%M%SZ')
+    window_end = (now + timedelta(days=days)).strftime('%Y%m%dT%H%M%SZ')
+    return {
+        event_uid(event) for event in iter_events(content)
+        if window_start <= start_key(event) <= window_end
+    }
+
+
+def prefetch(ics_file, tmdb_api, days=DEFAULT_DAYS, workers=DEFAULT_WORKERS):
+    """Warm the cache for upcoming episodes. Returns the number of planned events."""
+    # An unchanged file is loaded from its parsed snapshot
+    content, cal = load_calendar(ics_file, prepare=expand_if_compacted)
+
+    uids = upcoming_uids(content, days)
+    if not uids:
+        print(f"No episodes air in the next {days} days")
+        return 0
+
+    plan = plan_image_lookups(cal, uids)
+    print(f"Prefetching {len(plan.events)} episodes airing in the next {days} days")
+    plan.describe(verbose=False)
+
+    before = dict(tmdb_api.stats)
+    started = time.perf_counter()
+    execute_plan(plan, tmdb_api, workers)
+    tmdb_api.save_catalog()
+    tmdb_api.save_fixtures()
+
+    requests_made = tmdb_api.stats['requests'] - before['requests']
+    cache_hits = tmdb_api.stats['cache_hits'] - before['cache_hits']
+    print(f"Cache warm: {requests_made} requests to TMDB, {cache_hits} already cached "
+          f"({time.perf_counter() - started:.1f}s)")
+    return len(plan.events)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Warm the TMDB response cache for upcoming episodes.')
+    parser.add_argument('--ics-file', default='main.ics', help='Path to the ICS calendar file')
+    parser.add_argument('--days', type=int, default=DEFAULT_DAYS, help='How many days ahead to prefetch')
+    parser.add_argument('--rate', type=float, default=DEFAULT_RATE, help='Maximum TMDB requests per second')
+    parser.add_argument('--workers', type=int, default=DEFAULT_WORKERS, help='Parallel TMDB lookups')
+    parser.add_argument('--every', type=float, default=None, metavar='MINUTES',
+                        help='Keep running and prefetch again every MINUTES')
+
+    args = parser.parse_args()
+
+    if not os.path.isfile(args.ics_file):
+        print(f"Error: Calendar file not found: {args.ics_file}")
+        return 1
+
+    access_token, api_key = get_tmdb_credentials()
+    cache_file, cache_ttl, negative_ttl = get_tmdb_cache_settings()
+    if not access_token and not api_key:
+        print("Error: Either TMDB API key or access token is required.")
+        return 1
+    if not cache_file:
+        print("Error: The TMDB response cache is disabled (TMDB_CACHE_TTL=0); there is nothing to warm.")
+        return 1
+
+    try:
+        tmdb_api = TMDBApi(access_token=access_token, api_key=api_key, cache_file=cache_file,
+                           cache_ttl=cache_ttl, negative_ttl=negative_ttl)
+        tmdb_api.rate_limiter = RateLimiter(args.rate)
+
+        if args.every and hasattr(os, 'nice'):
+            # Background runs should only use otherwise idle CPU time
+            os.nice(10)
+
+        while True:
+            prefetch(args.ics_file, tmdb_api, args.days, args.workers)
+            if not args.every:
+                return 0
+            time.sleep(args.every * 60)
+            # Go back to the persistent cache so expired entries are fetched again
+            tmdb_api.clear_memo()
+            # TMDB may have recovered since the last pass
+            tmdb_api.breaker.reset()
+    except KeyboardInterrupt:
+        print("\nStopping prefetch")
+        return 0
+    except Exception as e:
+        print(f"Error: {e}")
+        return 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
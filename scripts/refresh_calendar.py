@@ -22,38 +22,64 @@ from pathlib import Path
 # Use local imports
 sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
 from tmdb_api import TMDBApi
-from config import get_tmdb_credentials
+from config import get_tmdb_credentials, get_tmdb_fixture_settings
 from update_calendar_images import update_calendar_with_images
+from output_writer import write_if_changed
+from tmdb_images import resize_image_url
+import memory_profile
 
+HEADER_LAST_MODIFIED = re.compile(r'^(LAST-MODIFIED:)(\d{8}T\d{6}Z)', re.MULTILINE)
+EVENT_LAST_MODIFIED = re.compile(r'^LAST-MODIFIED:(\d{8}T\d{6}Z)', re.MULTILINE)
+
+@memory_profile.profiled('timestamp')
 def update_last_modified(ics_file):
-    """Update the calendar's LAST-MODIFIED timestamp to current time."""
+    """
+    Update the calendar's LAST-MODIFIED timestamp to current time, but only if
+    an event was modified after it (events keep their own LAST-MODIFIED).
+    """
     print(f"Updating LAST-MODIFIED timestamp in {ics_file}...")
     
     # Read the calendar file
-    with open(ics_file, 'r') as f:
+    with open(ics_file, 'r', newline='') as f:
         content = f.read()
     
+    # Only the calendar header, before the first event, holds the calendar's timestamp
+    header_end = content.find('BEGIN:VEVENT')
+    if header_end == -1:
+        header_end = len(content)
+    header, events = content[:header_end], content[header_end:]
+    
+    header_match = HEADER_LAST_MODIFIED.search(header)
+    if not header_match:
+        return True
+    event_stamps = EVENT_LAST_MODIFIED.findall(events)
+    if not event_stamps or max(event_stamps) <= header_match.group(2):
+        print("No event changed since the calendar's LAST-MODIFIED; timestamp left as it was.")
+        return True
+    
     # Get current UTC time in iCalendar format
     now = datetime.datetime.utcnow().strftime("%Y%m%dT%H%M%SZ")
     
-    # Replace the LAST-MODIFIED timestamp
-    pattern = r'(LAST-MODIFIED:)(\d{8}T\d{6}Z)'
-    updated_content = re.sub(pattern, f"\\1{now}", content)
+    # Replace the LAST-MODIFIED timestamp (\g<1>: a plain \1 followed by the digits reads as an octal escape)
+    updated_content = HEADER_LAST_MODIFIED.sub(f"\\g<1>{now}", header, count=1) + events
     
     # Write back to file
-    with open(ics_file, 'w') as f:
-        f.write(updated_content)
-    
-    print(f"Calendar timestamp updated to {now}")
+    if write_if_changed(ics_file, updated_content):
+        print(f"Calendar timestamp updated to {now}")
     return True
 
 def validate_calendar(ics_file):
     """Validate the calendar format by calling the validation script."""
     print(f"Validating calendar: {ics_file}...")
-    validator_path = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'validate_calendar.py')
-    
-    # Using os.system for simplicity here
-    exit_code = os.system(f"python {validator_path} --file {ics_file}")
+    if memory_profile.active():
+        # Validate in this process, so its allocations show up in the profile
+        from validate_calendar import validate_ics_file
+        exit_code = 0 if validate_ics_file(ics_file) else 1
+    else:
+        validator_path = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'validate_calendar.py')
+        
+        # Using os.system for simplicity here
+        exit_code = os.system(f"python {validator_path} --file {ics_file}")
     if exit_code != 0:
         print("⚠️ Calendar validation failed!")
         return False
@@ -61,6 +87,7 @@ def validate_calendar(ics_file):
     print("✓ Calendar validation passed")
     return True
 
+@memory_profile.profiled('preview')
 def generate_preview(ics_file, output_html="preview.html"):
     """Generate a simple HTML preview of the calendar.
     
@@ -98,7 +125,7 @@ def generate_preview(ics_file, output_html="preview.html"):
         
         # Extract image if it exists
         image_match = re.search(r'IMAGE;.*?VALUE=URI:(.*?)(?:\r?\n)', event_data)
-        image_url = image_match.group(1) if image_match else None
+        image_url = resize_image_url(image_match.group(1), 'preview') if image_match else None
         
         events.append({
             'summary': summary,
@@ -170,8 +197,7 @@ def generate_preview(ics_file, output_html="preview.html"):
     
     # Write to file
     try:
-        with open(output_html, 'w') as f:
-            f.write(html_content)
+        write_if_changed(output_html, html_content)
         
         print(f"Preview generated: {output_html}")
         return output_html
@@ -191,15 +217,22 @@ def refresh_calendar(ics_file, generate_html_preview=False):
     try:
         # Get TMDB API credentials
         access_token, api_key = get_tmdb_credentials()
-        if not access_token and not api_key:
+        mode, fixture_file = get_tmdb_fixture_settings()
+        if mode != 'replay' and not access_token and not api_key:
             print("⚠️ No TMDB credentials found. Images will not be updated.")
             print("Please create a .env file with your TMDB_ACCESS_TOKEN or TMDB_API_KEY.")
         else:
             # Initialize TMDB API
-            tmdb_api = TMDBApi(access_token=access_token, api_key=api_key)
+            tmdb_api = TMDBApi(access_token=access_token, api_key=api_key,
+                               mode=mode, fixture_file=fixture_file)
             # Update calendar with images
             print("Updating images...")
-            update_calendar_with_images(ics_file, tmdb_api)
+            try:
+                with memory_profile.stage('images'):
+                    update_calendar_with_images(ics_file, tmdb_api)
+            finally:
+                tmdb_api.save_catalog()
+                tmdb_api.save_fixtures()
     except Exception as e:
         print(f"⚠️ Error updating images: {e}")
     
@@ -226,8 +259,11 @@ def main():
     parser = argparse.ArgumentParser(description='Refresh anime calendar with updated timestamps and images.')
     parser.add_argument('--ics-file', default='main.ics', help='Path to the ICS calendar file')
     parser.add_argument('--preview', action='store_true', help='Generate HTML preview of the calendar')
+    memory_profile.add_argument(parser)
     
     args = parser.parse_args()
+    if args.profile_memory:
+        memory_profile.enable()
     
     # Ensure the ICS file exists
     ics_file = args.ics_file
@@ -0,0 +1,372 @@
+#!/usr/bin/env python3
+"""
+RRULE Compaction
+
+Exports the calendar with weekly episode runs compacted into recurring events,
+and expands such an export back into one VEVENT per episode.
+
+A run is a series/season (as parsed from the SUMMARY) whose episodes are
+numbered consecutively, air at the same time of day on a weekly cadence (with
+at most a few skipped weeks) and have the same duration. Each run becomes one
+VEVENT with RRULE:FREQ=WEEKLY, EXDATEs for skipped weeks, and RECURRENCE-ID
+overrides for episodes that differ from the rest in more than their episode
+number. Episode-specific text is kept in X-ANIME-TEMPLATE lines and the
+original UIDs in X-ANIME-ORIGINAL-UID and either X-ANIME-INSTANCE-UID-TEMPLATE
+(when they only differ by the episode number) or X-ANIME-INSTANCE-UIDS, so
+expanding restores the per-episode events that the image-enrichment path
+works on. All output lines are folded to 75 octets.
+
+Usage:
+  python rrule_compact.py compact [--ics-file main.ics] [--output main_compact.ics]
+  python rrule_compact.py expand --ics-file main_compact.ics [--output main_expanded.ics]
+"""
+
+import os
+import re
+import sys
+import argparse
+from collections import Counter
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from output_writer import write_if_changed
+from event_hash import (get_event_property, property_name, remove_event_property,
+                        set_event_property, unfold)
+from series_parser import parse_summary
+from ics_writer import fold_line
+
+# Runs shorter than this are left as individual events
+DEFAULT_MIN_RUN = 3
+
+# A longer break than this starts a new run instead of adding EXDATEs
+MAX_SKIPPED_WEEKS = 4
+
+UTC_FORMAT = "%Y%m%dT%H%M%SZ"
+WEEK = timedelta(days=7)
+
+# Properties whose text may contain the episode number
+TEMPLATED_PROPERTIES = {'SUMMARY', 'DESCRIPTION'}
+
+# Per-episode properties that are derived from the recurrence when expanding
+PLACEHOLDER_PROPERTIES = ('UID', 'DTSTART', 'DTEND')
+
+# Bookkeeping properties added to compacted events
+EPISODE_START = 'X-ANIME-EPISODE-START'
+INSTANCE_UIDS = 'X-ANIME-INSTANCE-UIDS'
+INSTANCE_UID_TEMPLATE = 'X-ANIME-INSTANCE-UID-TEMPLATE'
+TEMPLATE = 'X-ANIME-TEMPLATE'
+ORIGINAL_UID = 'X-ANIME-ORIGINAL-UID'
+COMPACTION_PROPERTIES = {'RRULE', 'EXDATE', EPISODE_START, INSTANCE_UIDS, INSTANCE_UID_TEMPLATE}
+
+EVENT_PATTERN = re.compile(r'(BEGIN:VEVENT.*?END:VEVENT)', re.DOTALL)
+
+
+class EpisodeEvent:
+    """A VEVENT with the fields needed to detect weekly runs."""
+
+    def __init__(self, text):
+        self.text = text
+        self.uid = (get_event_property(text, 'UID') or '').strip()
+        self.series, self.season, self.episode = parse_summary(get_event_property(text, 'SUMMARY') or '')
+        self.start = _parse_utc(get_event_property(text, 'DTSTART'))
+        end = _parse_utc(get_event_property(text, 'DTEND'))
+        self.duration = end - self.start if self.start and end else None
+
+    @property
+    def compactable(self):
+        return bool(self.series and self.uid and self.start and self.duration is not None)
+
+    def episode_pattern(self):
+        return re.compile(rf'(?<!\d){self.episode}(?!\d)')
+
+    def signature(self):
+        """The event's lines with UID/DTSTART/DTEND and the episode number turned into placeholders."""
+        episode = self.episode_pattern()
+        lines = []
+        for line, name, top_level in _walk_lines(self.text):
+            line = line.replace('{', '{{').replace('}', '}}')
+            if top_level and name in PLACEHOLDER_PROPERTIES:
+                line = f"{name}:{{{name.lower()}}}"
+            elif name in TEMPLATED_PROPERTIES:
+                line = episode.sub('{episode}', line)
+            lines.append(line)
+        return tuple(lines), self.duration
+
+
+def _walk_lines(event_text):
+    """Yield (line, property name, is top-level event property) for each unfolded line."""
+    depth = 0
+    for line in unfold(event_text).splitlines():
+        name = property_name(line)
+        if name == 'END':
+            depth -= 1
+        yield line, name, depth == 1 and name not in ('BEGIN', 'END')
+        if name == 'BEGIN':
+            depth += 1
+
+
+def _parse_utc(value):
+    try:
+        return datetime.strptime(value.strip(), UTC_FORMAT)
+    except (AttributeError, ValueError):
+        return None
+
+
+def _format_utc(value):
+    return value.strftime(UTC_FORMAT)
+
+
+def _newline(content):
+    return '\r\n' if '\r\n' in content else '\n'
+
+
+def _fold_lines(lines, newline):
+    """Join unfolded content lines into folded event text (without a final newline)."""
+    return ''.join(fold_line(line, newline) for line in lines)[:-len(newline)]
+
+
+def _uid_template(events):
+    """
+    Return a UID template with an {episode} placeholder that reproduces every
+    event's UID, or None if their UIDs differ by more than the episode number.
+    """
+    templates = {
+        event.episode_pattern().sub('{episode}', event.uid.replace('{', '{{').replace('}', '}}'))
+        for event in events
+    }
+    template = templates.pop() if len(templates) == 1 else None
+    return template if template and '{episode}' in template else None
+
+
+def find_weekly_runs(events, min_run=DEFAULT_MIN_RUN):
+    """Group compactable events into weekly runs of consecutive episodes."""
+    by_series = {}
+    for event in events:
+        if event.compactable:
+            by_series.setdefault((event.series.casefold(), event.season), []).append(event)
+
+    runs = []
+    for series_events in by_series.values():
+        series_events.sort(key=lambda event: (event.start, event.episode))
+        run = [series_events[0]]
+        for event in series_events[1:]:
+            previous = run[-1]
+            gap = event.start - previous.start
+            weekly = gap > timedelta(0) and gap % WEEK == timedelta(0) and gap <= WEEK * (MAX_SKIPPED_WEEKS + 1)
+            if weekly and event.episode == previous.episode + 1:
+                run.append(event)
+            else:
+                runs.append(run)
+                run = [event]
+        runs.append(run)
+
+    return [run for run in runs if len(run) >= min_run]
+
+
+def compact_run(run, newline):
+    """
+    Render a weekly run as a recurring master VEVENT plus RECURRENCE-ID overrides.
+    Returns None if too few episodes share a common template to be worth it.
+    """
+    signatures = [event.signature() for event in run]
+    (template, duration), count = Counter(signatures).most_common(1)[0]
+    if count < 2:
+        return None
+
+    first = run[0]
+    regular = [event for event, signature in zip(run, signatures) if signature == (template, duration)]
+    overrides = [event for event, signature in zip(run, signatures) if signature != (template, duration)]
+
+    master_uid = f"series-{regular[0].uid}"
+    weeks = (run[-1].start - first.start) // WEEK + 1
+    aired = {event.start for event in run}
+    skipped = [first.start + WEEK * week for week in range(weeks) if first.start + WEEK * week not in aired]
+
+    lines = []
+    for line in template:
+        if line == 'DTEND:{dtend}':
+            lines.append(f"DTEND:{_format_utc(first.start + duration)}")
+            lines.append(f"RRULE:FREQ=WEEKLY;COUNT={weeks}")
+            if skipped:
+                lines.append(f"EXDATE:{','.join(_format_utc(start) for start in skipped)}")
+            lines.append(f"{EPISODE_START}:{first.episode}")
+            uid_template = _uid_template(regular)
+            if uid_template:
+                lines.append(f"{INSTANCE_UID_TEMPLATE}:{uid_template}")
+            else:
+                lines.append(f"{INSTANCE_UIDS}:{','.join(event.uid for event in regular)}")
+        elif line == 'UID:{uid}':
+            lines.append(f"UID:{master_uid}")
+        elif line == 'DTSTART:{dtstart}':
+            lines.append(f"DTSTART:{_format_utc(first.start)}")
+        elif '{episode}' in line:
+            # Clients show the first episode number; the exact text is kept for expansion
+            lines.append(line.format(episode=f"{first.episode}+"))
+            lines.append(f"{TEMPLATE}:{line}")
+        else:
+            lines.append(line.format())
+
+    compacted = [_fold_lines(lines, newline)]
+    for event in overrides:
+        override = set_event_property(event.text, 'UID', master_uid)
+        override = set_event_property(override, 'RECURRENCE-ID', _format_utc(event.start))
+        override = set_event_property(override, ORIGINAL_UID, event.uid)
+        compacted.append(override)
+    return compacted
+
+
+def _split_calendar(content):
+    """Split a calendar into (header, events, footer)."""
+    parts = EVENT_PATTERN.split(content)
+    events = parts[1::2]
+    return parts[0], events, parts[-1] if events else ''
+
+
+def _join_calendar(header, events, footer, newline):
+    if not events:
+        return header + footer.lstrip('\r\n')
+    return header + newline.join(events) + footer
+
+
+def compact_calendar(content, min_run=DEFAULT_MIN_RUN):
+    """Return (compacted content, number of runs compacted, number of events replaced)."""
+    newline = _newline(content)
+    header, texts, footer = _split_calendar(content)
+    events = [EpisodeEvent(text) for text in texts]
+    position = {id(event): index for index, event in enumerate(events)}
+
+    # Each compacted run is emitted where its first episode was
+    replacements = {}
+    removed = set()
+    for run in find_weekly_runs(events, min_run):
+        compacted = compact_run(run, newline)
+        if compacted is None:
+            continue
+        indexes = [position[id(event)] for event in run]
+        replacements[min(indexes)] = compacted
+        removed.update(indexes)
+
+    output = []
+    for index, text in enumerate(texts):
+        if index in replacements:
+            output.extend(replacements[index])
+        elif index not in removed:
+            output.append(text)
+    return _join_calendar(header, output, footer, newline), len(replacements), len(removed)
+
+
+def expand_master(master, overrides, newline):
+    """Expand a compacted master VEVENT (and its overrides) into per-episode events."""
+    start = _parse_utc(get_event_property(master, 'DTSTART'))
+    end = _parse_utc(get_event_property(master, 'DTEND'))
+    count = int(re.search(r'COUNT=(\d+)', get_event_property(master, 'RRULE')).group(1))
+    excluded = {_parse_utc(value) for value in (get_event_property(master, 'EXDATE') or '').split(',') if value.strip()}
+    first_episode = int(get_event_property(master, EPISODE_START))
+    instance_uids = (get_event_property(master, INSTANCE_UIDS) or '').split(',')
+    uid_template = get_event_property(master, INSTANCE_UID_TEMPLATE)
+
+    template = []
+    for line, name, top_level in _walk_lines(master):
+        if top_level and name in COMPACTION_PROPERTIES:
+            continue
+        if name == TEMPLATE:
+            template[-1] = line.split(':', 1)[1]
+        elif top_level and name in PLACEHOLDER_PROPERTIES:
+            template.append(f"{name}:{{{name.lower()}}}")
+        else:
+            template.append(line.replace('{', '{{').replace('}', '}}'))
+    template = '\n'.join(template)
+
+    events = []
+    airings = [start + WEEK * week for week in range(count) if start + WEEK * week not in excluded]
+    regular_uids = iter(instance_uids)
+    for offset, airing in enumerate(airings):
+        override = overrides.get(_format_utc(airing))
+        if override is not None:
+            restored = set_event_property(override, 'UID', get_event_property(override, ORIGINAL_UID).strip())
+            restored = remove_event_property(restored, 'RECURRENCE-ID')
+            events.append(remove_event_property(restored, ORIGINAL_UID))
+            continue
+        episode = first_episode + offset
+        uid = uid_template.format(episode=episode) if uid_template else next(regular_uids)
+        event = template.format(
+            uid=uid,
+            dtstart=_format_utc(airing),
+            dtend=_format_utc(airing + (end - start)),
+            episode=episode,
+        )
+        events.append(_fold_lines(event.split('\n'), newline))
+    return events
+
+
+def expand_calendar(content):
+    """Return (expanded content, number of masters expanded) for a compacted calendar."""
+    newline = _newline(content)
+    header, texts, footer = _split_calendar(content)
+
+    overrides = {}
+    for text in texts:
+        if get_event_property(text, ORIGINAL_UID) is not None:
+            uid = get_event_property(text, 'UID').strip()
+            overrides.setdefault(uid, {})[get_event_property(text, 'RECURRENCE-ID').strip()] = text
+
+    output = []
+    expanded = 0
+    for text in texts:
+        if get_event_property(text, EPISODE_START) is not None:
+            uid = get_event_property(text, 'UID').strip()
+            output.extend(expand_master(text, overrides.get(uid, {}), newline))
+            expanded += 1
+        elif get_event_property(text, ORIGINAL_UID) is None:
+            # Overrides are emitted together with their master
+            output.append(text)
+    return _join_calendar(header, output, footer, newline), expanded
+
+
+def is_compacted(content):
+    """Return True if a calendar contains compacted episode runs."""
+    return f"\n{EPISODE_START}:" in content
+
+
+def expand_if_compacted(content):
+    """Expand a compacted calendar; other calendars are returned unchanged."""
+    if not is_compacted(content):
+        return content
+    content, runs = expand_calendar(content)
+    print(f"Expanded {runs} compacted weekly runs into per-episode events")
+    return content
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Compact weekly episode runs into RRULE events, or expand them again.')
+    parser.add_argument('mode', choices=['compact', 'expand'], help='Compact per-episode events, or expand a compacted calendar')
+    parser.add_argument('--ics-file', default='main.ics', help='Path to the input ICS calendar file')
+    parser.add_argument('--output', help='Path to the output file (default: <input>_compact.ics / <input>_expanded.ics)')
+    parser.add_argument('--min-run', type=int, default=DEFAULT_MIN_RUN, help='Minimum episodes in a run to compact it')
+
+    args = parser.parse_args()
+
+    if not os.path.isfile(args.ics_file):
+        print(f"Error: Calendar file not found: {args.ics_file}")
+        return 1
+
+    base, extension = os.path.splitext(args.ics_file)
+    output_file = args.output or f"{base}_{'compact' if args.mode == 'compact' else 'expanded'}{extension}"
+
+    with open(args.ics_file, 'r') as f:
+        content = f.read()
+
+    if args.mode == 'compact':
+        updated_content, runs, events = compact_calendar(content, args.min_run)
+        print(f"Compacted {events} events into {runs} weekly runs")
+    else:
+        updated_content, runs = expand_calendar(content)
+        print(f"Expanded {runs} weekly runs into per-episode events")
+
+    write_if_changed(output_file, updated_content)
+    print(f"File saved to: {output_file}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,150 @@
+#!/usr/bin/env python3
+"""
+Series Summary Parser
+
+Extracts (series, season, episode) from event summaries such as
+"The Apothecary Diaries S2 - Episode 31" or "The Shiunji Family Children - Episode 7".
+
+Patterns are compiled once, the common "Title Sn - Episode N" form is handled
+with two small anchored searches instead of the full pattern, and results are
+memoized per summary string.
+Users can register their own title aliases and patterns in a JSON config file
+(see config.get_summary_parser_config):
+
+  {
+    "aliases": {"Kusuriya no Hitorigoto": "The Apothecary Diaries"},
+    "patterns": ["^(?P<series>.+?) #(?P<episode>\\\\d+)$"]
+  }
+
+Custom patterns must define the named groups `series` and `episode` and may
+define `season`; they are tried before the built-in patterns.
+"""
+
+import os
+import re
+import sys
+from functools import lru_cache
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from config import get_summary_parser_config
+
+# Matches "Title S2 - Episode 31", "Title Season 2 - Episode 31" and "Title - Episode 31".
+# The parser splits it into the two searches below, which give the same results.
+SERIES_PATTERN = re.compile(
+    r"(.*?)(?:S(\d+)|Season (\d+))?\s*-\s*Episode\s*(\d+)",
+    re.IGNORECASE
+)
+
+# The "- Episode N" part on its own; it starts with a literal so it is cheap to search for
+EPISODE_MARKER = re.compile(r"-\s*Episode\s*(\d+)", re.IGNORECASE)
+# A season marker ending the title in front of it
+SEASON_SUFFIX = re.compile(r"(?:S(\d+)|Season (\d+))$", re.IGNORECASE)
+
+# Number of distinct summaries remembered by each parser
+DEFAULT_CACHE_SIZE = 65536
+
+NO_MATCH = (None, None, None)
+
+
+class SummaryParser:
+    """
+    Parses event summaries into (series, season, episode) tuples.
+    """
+
+    def __init__(self, aliases=None, patterns=None, cache_size=DEFAULT_CACHE_SIZE):
+        self.aliases = {}
+        self.patterns = []
+        self.cache_size = cache_size
+        self.parse = lru_cache(maxsize=cache_size)(self._parse)
+
+        for title, canonical in (aliases or {}).items():
+            self.register_alias(title, canonical)
+        for pattern in patterns or []:
+            self.register_pattern(pattern)
+
+    @classmethod
+    def from_config(cls):
+        """Create a parser with the aliases and patterns from the user's config."""
+        settings = get_summary_parser_config()
+        return cls(aliases=settings.get('aliases'), patterns=settings.get('patterns'))
+
+    def register_alias(self, title, canonical):
+        """Map a parsed series title (case-insensitive) to a canonical title."""
+        self.aliases[title.strip().casefold()] = canonical.strip()
+        self.parse.cache_clear()
+
+    def register_pattern(self, pattern, flags=re.IGNORECASE):
+        """Register a custom summary pattern with `series` and `episode` groups."""
+        compiled = re.compile(pattern, flags) if isinstance(pattern, str) else pattern
+        missing = {'series', 'episode'} - set(compiled.groupindex)
+        if missing:
+            raise ValueError(f"Summary pattern {compiled.pattern!r} is missing groups: {', '.join(sorted(missing))}")
+        self.patterns.append(compiled)
+        self.parse.cache_clear()
+
+    def _canonical(self, series):
+        return self.aliases.get(series.casefold(), series)
+
+    def _parse(self, summary):
+        for pattern in self.patterns:
+            match = pattern.search(summary)
+            if match:
+                season = match.groupdict().get('season') or 1
+                return (self._canonical(match.group('series').strip()),
+                        int(season), int(match.group('episode')))
+
+        result = self._parse_fast(summary)
+        if result is NO_MATCH:
+            return result
+
+        series, season, episode = result
+        return self._canonical(series), season, episode
+
+    @staticmethod
+    def _parse_fast(summary):
+        """Handle the "Title [Sn] - Episode N" form by finding the episode marker first."""
+        match = EPISODE_MARKER.search(summary)
+        if not match:
+            return NO_MATCH
+
+        # The earliest "- Episode N" always ends the full pattern's match, so
+        # only the title in front of it needs checking for a season marker
+        head = summary[:match.start()].rstrip()
+        episode = int(match.group(1))
+
+        season = 1
+        marker = SEASON_SUFFIX.search(head)
+        if marker:
+            # Like the full pattern, "FooS2" is "Foo" season 2
+            season = int(marker.group(1) or marker.group(2))
+            head = head[:marker.start()]
+
+        return head.strip(), season, episode
+
+
+_default_parser = None
+
+def get_default_parser():
+    """Return the shared parser configured from the user's config file."""
+    global _default_parser
+    if _default_parser is None:
+        _default_parser = SummaryParser.from_config()
+    return _default_parser
+
+def reset_default_parser():
+    """Drop the shared parser so the next call re-reads the user's config file."""
+    global _default_parser
+    _default_parser = None
+
+def parse_summary(summary):
+    """Parse a summary with the shared parser. Returns (series, season, episode) or (None, None, None)."""
+    return get_default_parser().parse(summary)
+
+
+if __name__ == "__main__":
+    if len(sys.argv) < 2:
+        print("Usage: python series_parser.py \"Title S2 - Episode 31\" [...]")
+        sys.exit(1)
+
+    for summary in sys.argv[1:]:
+        print(f"{summary!r} -> {parse_summary(summary)}")
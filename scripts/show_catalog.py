@@ -0,0 +1,337 @@
+#!/usr/bin/env python3
+"""
+Show Catalog
+
+A local catalog of TMDB shows with a trigram index for fuzzy title -> show id
+resolution, so most title lookups need no network search at all. The catalog
+is seeded from past search results (the response cache and fixture files) or
+from a TMDB daily ID export (tv_series_ids_MM_DD_YYYY.json.gz), and learns
+from every network search: the chosen show is stored together with the
+searched title as an alias, so romanized or alternative titles resolve
+directly next time.
+
+Candidates are ranked by title similarity, then animation genre, popularity
+and recency. Network search results are re-ranked the same way instead of
+trusting the first result.
+
+Usage:
+  python show_catalog.py seed                       # from the response cache and fixtures
+  python show_catalog.py import tv_series_ids_05_19_2025.json.gz
+  python show_catalog.py lookup "Kusuriya no Hitorigoto"
+  python show_catalog.py stats
+"""
+
+import os
+import re
+import sys
+import json
+import gzip
+import sqlite3
+import argparse
+import threading
+import unicodedata
+from pathlib import Path
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from output_writer import write_if_changed
+
+ANIMATION_GENRE = 16
+
+# Titles scoring below this are not considered a match
+MIN_SCORE = 0.55
+# Matches at least this close are trusted without a network search
+TRUSTED_SCORE = 0.8
+# Scores this close count as a tie, which the other ranking criteria break
+SCORE_TOLERANCE = 0.05
+# Trigrams shared by more titles than this (e.g. " th") are too common to select candidates
+MAX_POSTING = 5000
+# Memoized lookups kept per catalog before the memo is started over
+LOOKUP_CACHE_SIZE = 65536
+
+NON_WORD = re.compile(r'[\W_]+')
+
+
+def normalize_title(title):
+    """Casefold, strip accents and punctuation: "Re:Zero - Starting Life" -> "re zero starting life"."""
+    title = unicodedata.normalize('NFKD', title or '')
+    title = ''.join(char for char in title if not unicodedata.combining(char))
+    return NON_WORD.sub(' ', title.casefold()).strip()
+
+
+def trigrams(normalized):
+    padded = f"  {normalized} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+def similarity(query_grams, title_grams):
+    """Dice coefficient of two trigram sets."""
+    if not query_grams or not title_grams:
+        return 0.0
+    return 2 * len(query_grams & title_grams) / (len(query_grams) + len(title_grams))
+
+
+class ShowCatalog:
+    """
+    TMDB shows indexed by normalized title and by title trigrams.
+    """
+
+    def __init__(self, path=None):
+        self.path = path
+        self.shows = {}       # id -> show record
+        self.titles = {}      # normalized title -> set of show ids
+        self.grams = {}       # normalized title -> trigram set
+        self.postings = {}    # trigram -> set of normalized titles
+        self.dirty = False
+        self._lookup_cache = {}  # (title, min_score) -> show or None
+        self._lock = threading.RLock()
+
+        if path and os.path.isfile(path):
+            opener = gzip.open if path.endswith('.gz') else open
+            with opener(path, 'rt', encoding='utf-8') as f:
+                for show in json.load(f).get('shows', []):
+                    self._index(show)
+
+    def __len__(self):
+        return len(self.shows)
+
+    def _index_title(self, title, show_id):
+        normalized = normalize_title(title)
+        if not normalized:
+            return
+        self.titles.setdefault(normalized, set()).add(show_id)
+        if normalized not in self.grams:
+            grams = trigrams(normalized)
+            self.grams[normalized] = grams
+            for gram in grams:
+                self.postings.setdefault(gram, set()).add(normalized)
+
+    def _unindex_title(self, title, show_id):
+        normalized = normalize_title(title)
+        show_ids = self.titles.get(normalized)
+        if not show_ids:
+            return
+        show_ids.discard(show_id)
+        if not show_ids:
+            del self.titles[normalized]
+            for gram in self.grams.pop(normalized):
+                posting = self.postings[gram]
+                posting.discard(normalized)
+                if not posting:
+                    del self.postings[gram]
+
+    def _index(self, show):
+        self.shows[show['id']] = show
+        for title in [show.get('name'), show.get('original_name')] + show.get('aliases', []):
+            if title:
+                self._index_title(title, show['id'])
+
+    def _unindex(self, show):
+        for title in [show.get('name'), show.get('original_name')] + show.get('aliases', []):
+            if title:
+                self._unindex_title(title, show['id'])
+
+    def add(self, result, alias=None):
+        """Add or update a show from a TMDB search result (or export line)."""
+        with self._lock:
+            show_id = result.get('id')
+            if show_id is None:
+                return
+            show = dict(self.shows.get(show_id, {'id': show_id, 'aliases': []}))
+            for field in ('name', 'original_name', 'popularity', 'genre_ids'):
+                if result.get(field) is not None:
+                    show[field] = result[field]
+            if result.get('first_air_date'):
+                show['year'] = int(result['first_air_date'][:4])
+            if alias and normalize_title(alias) not in {normalize_title(t) for t in
+                                                        [show.get('name'), show.get('original_name')] + show['aliases']}:
+                show['aliases'] = show['aliases'] + [alias]
+            if show != self.shows.get(show_id):
+                if show_id in self.shows:
+                    # A renamed show must no longer resolve by its old title
+                    self._unindex(self.shows[show_id])
+                self._index(show)
+                self.dirty = True
+                self._lookup_cache.clear()
+
+    def _rank_key(self, show, score):
+        # Shows without genres (e.g. from an ID export) are not known to be animation
+        animation = ANIMATION_GENRE in (show.get('genre_ids') or [])
+        return (round(score / SCORE_TOLERANCE), animation, show.get('popularity') or 0, show.get('year') or 0)
+
+    def candidates(self, title, limit=5):
+        """Return [(show, score)] for the best matching shows, best first."""
+        normalized = normalize_title(title)
+        if not normalized:
+            return []
+        with self._lock:
+            scores = {}
+            for show_id in self.titles.get(normalized, ()):
+                scores[show_id] = 1.0
+
+            query_grams = trigrams(normalized)
+            postings = sorted((self.postings.get(gram, ()) for gram in query_grams), key=len)
+            selective = [posting for posting in postings if len(posting) <= MAX_POSTING] or postings[:1]
+            matched_titles = set().union(*selective) if selective else set()
+            for candidate in matched_titles:
+                score = similarity(query_grams, self.grams[candidate])
+                if score >= MIN_SCORE:
+                    for show_id in self.titles[candidate]:
+                        scores[show_id] = max(scores.get(show_id, 0), score)
+
+            ranked = sorted(((self.shows[show_id], score) for show_id, score in scores.items()),
+                            key=lambda item: self._rank_key(*item), reverse=True)
+        return ranked[:limit]
+
+    def lookup(self, title, min_score=MIN_SCORE):
+        """Return the best matching show for a title, or None (memoized until the catalog changes)."""
+        key = (title, min_score)
+        with self._lock:
+            if key in self._lookup_cache:
+                return self._lookup_cache[key]
+            candidates = self.candidates(title, limit=1)
+            show = candidates[0][0] if candidates and candidates[0][1] >= min_score else None
+            if len(self._lookup_cache) >= LOOKUP_CACHE_SIZE:
+                self._lookup_cache.clear()
+            self._lookup_cache[key] = show
+        return show
+
+    def rank_results(self, title, results):
+        """Re-rank TMDB search results for a title by the catalog's criteria."""
+        query_grams = trigrams(normalize_title(title))
+
+        def key(result):
+            names = [name for name in (result.get('name'), result.get('original_name')) if name]
+            score = max((similarity(query_grams, trigrams(normalize_title(name))) for name in names), default=0.0)
+            show = {'genre_ids': result.get('genre_ids', []), 'popularity': result.get('popularity'),
+                    'year': int(result['first_air_date'][:4]) if result.get('first_air_date') else None}
+            return self._rank_key(show, score)
+
+        # Keep TMDB's own order among equally ranked results
+        return sorted(results, key=key, reverse=True)
+
+    def as_search_results(self, show):
+        """Shape a catalog record like a TMDB /search/tv response."""
+        result = {key: value for key, value in show.items() if key not in ('aliases', 'year')}
+        if show.get('year'):
+            result['first_air_date'] = f"{show['year']}-01-01"
+        return {'page': 1, 'results': [result], 'total_results': 1, 'total_pages': 1}
+
+    def save(self):
+        """Write the catalog to disk if it changed."""
+        with self._lock:
+            if not self.dirty or not self.path:
+                return False
+            os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+            payload = {'version': 1, 'shows': [self.shows[show_id] for show_id in sorted(self.shows)]}
+            data = json.dumps(payload, separators=(',', ':'), ensure_ascii=False).encode('utf-8')
+            if self.path.endswith('.gz'):
+                data = gzip.compress(data, mtime=0)
+            write_if_changed(self.path, data, ignore_volatile=False)
+            self.dirty = False
+        return True
+
+
+def default_catalog_path():
+    from config import load_dotenv
+    load_dotenv()
+    root_dir = Path(os.path.dirname(os.path.abspath(__file__))).parent
+    return os.environ.get('TMDB_CATALOG_FILE') or str(root_dir / '.cache' / 'show_catalog.json.gz')
+
+
+def _search_responses(key_body_pairs):
+    """Yield (query, results) from (request key, body) pairs of /search/tv requests."""
+    from urllib.parse import parse_qs, urlsplit
+    for key, body in key_body_pairs:
+        if not key.startswith('/search/tv?') or not isinstance(body, dict):
+            continue
+        query = parse_qs(urlsplit(key).query).get('query', [None])[0]
+        yield query, body.get('results') or []
+
+
+def seed_catalog(catalog, cache_file=None, fixture_files=()):
+    """Add every show from cached and recorded search results. Returns the number of shows added."""
+    before = len(catalog)
+    pairs = []
+    if cache_file and os.path.isfile(cache_file):
+        db = sqlite3.connect(cache_file)
+        try:
+            pairs += [(key, json.loads(body)) for key, body in
+                      db.execute("SELECT key, body FROM responses WHERE key LIKE '/search/tv?%'")]
+        finally:
+            db.close()
+    for fixture_file in fixture_files:
+        from tmdb_fixtures import FixtureStore
+        pairs += [(key, entry['body']) for key, entry in FixtureStore(fixture_file).entries.items()]
+
+    for query, results in _search_responses(pairs):
+        for rank, result in enumerate(catalog.rank_results(query, results)):
+            catalog.add(result, alias=query if rank == 0 else None)
+    return len(catalog) - before
+
+
+def import_export_file(catalog, export_file, min_popularity=0.0):
+    """Import a TMDB daily ID export (one JSON object per line). Returns the number of shows read."""
+    opener = gzip.open if export_file.endswith('.gz') else open
+    count = 0
+    with opener(export_file, 'rt', encoding='utf-8') as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            entry = json.loads(line)
+            if entry.get('adult') or (entry.get('popularity') or 0) < min_popularity:
+                continue
+            catalog.add({'id': entry['id'], 'original_name': entry.get('original_name'),
+                         'popularity': entry.get('popularity')})
+            count += 1
+    return count
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Manage the local TMDB show catalog.')
+    parser.add_argument('command', choices=['seed', 'import', 'lookup', 'stats'])
+    parser.add_argument('arguments', nargs='*', help='Export file for import, title(s) for lookup')
+    parser.add_argument('--catalog', default=None, help='Catalog file (default: TMDB_CATALOG_FILE or .cache/show_catalog.json.gz)')
+    parser.add_argument('--fixtures', nargs='*', default=[], help='Fixture files to seed from')
+    parser.add_argument('--min-popularity', type=float, default=0.0, help='Skip exported shows below this popularity')
+
+    args = parser.parse_args()
+    catalog = ShowCatalog(args.catalog or default_catalog_path())
+
+    try:
+        if args.command == 'seed':
+            from config import get_tmdb_cache_settings
+            cache_file = get_tmdb_cache_settings()[0]
+            added = seed_catalog(catalog, cache_file, args.fixtures)
+            catalog.save()
+            print(f"Seeded catalog: {added} new shows ({len(catalog)} total)")
+
+        elif args.command == 'import':
+            if not args.arguments:
+                parser.error("import needs a TMDB export file")
+            for export_file in args.arguments:
+                count = import_export_file(catalog, export_file, args.min_popularity)
+                print(f"Imported {count} shows from {export_file}")
+            catalog.save()
+
+        elif args.command == 'lookup':
+            for title in args.arguments:
+                candidates = catalog.candidates(title)
+                print(f"{title}:")
+                if not candidates:
+                    print("  (no match)")
+                for show, score in candidates:
+                    print(f"  {score:.2f}  {show['id']:>8}  {show.get('name') or show.get('original_name')}"
+                          f"{' (' + str(show['year']) + ')' if show.get('year') else ''}")
+
+        else:
+            print(f"Shows: {len(catalog)}")
+            print(f"Indexed titles: {len(catalog.titles)}")
+        return 0
+    except Exception as e:
+        print(f"Error: {e}")
+        return 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -5,10 +5,90 @@ Handles fetching anime artwork, posters, and banners from The Movie Database API
 """
 
 import os
+import sys
 import json
+import time
+import threading
 import requests
 from urllib.parse import quote
 
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from tmdb_fixtures import FixtureStore, request_key
+from tmdb_cache import DEFAULT_NEGATIVE_TTL, DEFAULT_TTL, ResponseCache
+from config import get_tmdb_cache_settings
+from show_catalog import TRUSTED_SCORE, ShowCatalog, default_catalog_path
+from tmdb_images import CONFIGURATION_TTL, ImageSizes
+
+# Supported fixture modes: 'live' talks to TMDB, 'record' talks to TMDB and
+# stores every response, 'replay' serves responses from the store only
+FIXTURE_MODES = ('live', 'record', 'replay')
+
+class RateLimiter:
+    """
+    Thread-safe limiter that spaces calls to at most `rate` per second.
+    """
+    
+    def __init__(self, rate):
+        self.interval = 1.0 / rate if rate else 0
+        self.next_slot = 0.0
+        self._lock = threading.Lock()
+    
+    def wait(self):
+        """Block until the caller may issue its next request."""
+        if not self.interval:
+            return
+        with self._lock:
+            now = time.monotonic()
+            slot = max(now, self.next_slot)
+            self.next_slot = slot + self.interval
+        if slot > now:
+            time.sleep(slot - now)
+
+
+class CircuitOpenError(requests.RequestException):
+    """Raised instead of making a request while TMDB is considered down."""
+
+
+class CircuitBreaker:
+    """
+    Counts consecutive failed requests. Once `threshold` is reached the
+    circuit opens and stays open for the rest of the run, so remaining
+    lookups fail immediately instead of each waiting out a timeout.
+    Long-running callers reset() it before each new run.
+    """
+    
+    def __init__(self, threshold):
+        self.threshold = threshold
+        self.failures = 0
+        self._lock = threading.Lock()
+    
+    @property
+    def is_open(self):
+        return self.failures >= self.threshold
+    
+    def check(self):
+        """Raise CircuitOpenError if requests should not be attempted."""
+        if self.is_open:
+            raise CircuitOpenError(f"TMDB unavailable after {self.failures} consecutive failures; skipping request")
+    
+    def record_success(self):
+        with self._lock:
+            if not self.is_open:
+                self.failures = 0
+    
+    def reset(self):
+        """Close the circuit, so the next run tries TMDB again."""
+        with self._lock:
+            self.failures = 0
+    
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            opened = self.failures == self.threshold
+        if opened:
+            print(f"⚠️ {self.threshold} TMDB requests failed in a row; skipping remaining lookups this run")
+
+
 class TMDBApi:
     """
     Handles interactions with The Movie Database API to fetch anime-related imagery.
@@ -16,14 +96,77 @@ class TMDBApi:
     
     BASE_URL = "https://api.themoviedb.org/3"
     IMAGE_BASE_URL = "https://image.tmdb.org/t/p/"
+    # TMDB allows roughly 40 requests per second per client
+    REQUESTS_PER_SECOND = 40
+    # Seconds to wait for TMDB before a request counts as failed
+    REQUEST_TIMEOUT = 10
+    # Consecutive failed requests before the remaining lookups are skipped
+    FAILURE_THRESHOLD = 5
+    # Image sizes are picked for how calendar clients show event images
+    IMAGE_USAGE = 'thumbnail'
     
-    def __init__(self, api_key=None, access_token=None):
-        """Initialize with the TMDB API key or access token."""
+    def __init__(self, api_key=None, access_token=None, mode='live', fixture_file=None,
+                 cache_file=None, cache_ttl=None, negative_ttl=None, catalog_file=None):
+        """
+        Initialize with the TMDB API key or access token.
+        
+        Pass mode='record' or mode='replay' together with a fixture_file to
+        record responses to, or replay them from, an on-disk fixture store.
+        Credentials are not needed in replay mode.
+        
+        Outside replay mode, responses are also kept in a persistent cache
+        shared between runs (TMDB_CACHE_FILE/TMDB_CACHE_TTL by default), with
+        "not found" answers kept for negative_ttl. Pass cache_file=False to
+        disable it.
+        
+        Title searches are answered from the local show catalog (see
+        show_catalog.py) when it holds a close match, and teach it otherwise.
+        This only happens in live mode; pass catalog_file=False to always
+        search TMDB.
+        """
         self.api_key = api_key or os.environ.get('TMDB_API_KEY')
         self.access_token = access_token or os.environ.get('TMDB_ACCESS_TOKEN')
         
-        if not self.api_key and not self.access_token:
+        if mode not in FIXTURE_MODES:
+            raise ValueError(f"Unknown TMDB mode '{mode}'. Expected one of: {', '.join(FIXTURE_MODES)}")
+        self.mode = mode
+        
+        self.fixture_store = None
+        if mode != 'live':
+            if not fixture_file:
+                raise ValueError(f"A fixture file is required in {mode} mode.")
+            if mode == 'replay' and not os.path.isfile(fixture_file):
+                raise ValueError(f"Fixture file not found: {fixture_file}")
+            self.fixture_store = FixtureStore(fixture_file)
+        
+        if mode != 'replay' and not self.api_key and not self.access_token:
             raise ValueError("Either TMDB API key or access token is required.")
+        
+        self.cache = None
+        if mode != 'replay' and cache_file is not False:
+            if cache_file is None:
+                cache_file, default_ttl, default_negative_ttl = get_tmdb_cache_settings()
+                cache_ttl = cache_ttl or default_ttl
+                negative_ttl = negative_ttl or default_negative_ttl
+            if cache_file:
+                self.cache = ResponseCache(cache_file, cache_ttl or DEFAULT_TTL,
+                                           negative_ttl or DEFAULT_NEGATIVE_TTL)
+        
+        # Recorded fixtures must contain every search, so only live runs skip them
+        self.catalog = None
+        if mode == 'live' and catalog_file is not False:
+            self.catalog = ShowCatalog(catalog_file or default_catalog_path())
+        
+        # Where responses came from during this run
+        self.stats = {'cache_hits': 0, 'catalog_hits': 0, 'requests': 0}
+        
+        # Responses already fetched during this run, keyed like fixtures so
+        # repeated lookups (e.g. the same show for every episode) are free
+        self._memo = {}
+        self._memo_lock = threading.Lock()
+        self.rate_limiter = RateLimiter(self.REQUESTS_PER_SECOND)
+        self.breaker = CircuitBreaker(self.FAILURE_THRESHOLD)
+        self._image_sizes = None
             
         # Set up headers for Bearer token authentication if using access token
         self.headers = None
@@ -33,97 +176,175 @@ class TMDBApi:
                 'Content-Type': 'application/json;charset=utf-8'
             }
     
+    def _get(self, path, params):
+        """
+        Perform a GET request against the TMDB API and return the decoded JSON.
+        
+        Responses are memoized for the lifetime of this instance, so repeated
+        lookups cost nothing. In record mode every response is also written to
+        the fixture store; in replay mode responses come only from the store
+        and no network request is ever made.
+        """
+        key = request_key(path, params)
+        
+        with self._memo_lock:
+            memoized = self._memo.get(key)
+        if memoized is None:
+            memoized = self._fetch(key, path, params)
+            with self._memo_lock:
+                self._memo[key] = memoized
+        
+        status, body = memoized
+        if status >= 400:
+            raise requests.HTTPError(f"{status} Error for {key}")
+        return body
+    
+    def clear_memo(self):
+        """Forget responses memoized during this run (the persistent cache is kept)."""
+        with self._memo_lock:
+            self._memo.clear()
+    
+    def _fetch(self, key, path, params):
+        """Fetch a single response as a (status, body) tuple."""
+        if self.mode == 'replay':
+            return self.fixture_store.get(key)
+        
+        # The configuration rarely changes, so it is kept longer than other responses
+        max_age = CONFIGURATION_TTL if path == '/configuration' else None
+        cached = self.cache.get(key, max_age) if self.cache is not None else None
+        if cached is not None:
+            with self._memo_lock:
+                self.stats['cache_hits'] += 1
+            if self.mode == 'record':
+                self.fixture_store.put(key, *cached)
+            return cached
+        
+        self.breaker.check()
+        self.rate_limiter.wait()
+        with self._memo_lock:
+            self.stats['requests'] += 1
+        endpoint = f"{self.BASE_URL}{path}"
+        try:
+            if self.headers:  # Using access token
+                response = requests.get(endpoint, params=params, headers=self.headers,
+                                        timeout=self.REQUEST_TIMEOUT)
+            else:  # Using API key
+                response = requests.get(endpoint, params={**params, 'api_key': self.api_key},
+                                        timeout=self.REQUEST_TIMEOUT)
+        except requests.RequestException:
+            self.breaker.record_failure()
+            raise
+        
+        try:
+            body = response.json()
+        except ValueError:
+            body = None
+        
+        # Server errors and throttling are transient, so surface them without memoizing
+        if response.status_code >= 500 or response.status_code == 429:
+            self.breaker.record_failure()
+            response.raise_for_status()
+        self.breaker.record_success()
+        
+        if self.mode == 'record':
+            self.fixture_store.put(key, response.status_code, body)
+        if self.cache is not None:
+            self.cache.put(key, response.status_code, body)
+        return response.status_code, body
+    
+    def save_fixtures(self):
+        """Flush recorded responses to disk (in record mode). Returns True if any were written."""
+        if self.mode == 'record':
+            return self.fixture_store.save()
+        return False
+    
+    def save_catalog(self):
+        """Write the show catalog to disk if searches taught it new shows or aliases."""
+        if self.catalog is not None:
+            return self.catalog.save()
+        return False
+    
     def search_anime(self, title):
-        """Search for an anime by title."""
-        endpoint = f"{self.BASE_URL}/search/tv"
-        
-        if self.headers:  # Using access token
-            params = {
-                'query': title,
-                'language': 'en-US',
-                # Filter for animation genre (16 is animation in TMDB)
-                'with_genres': '16'
-            }
-            response = requests.get(endpoint, params=params, headers=self.headers)
-        else:  # Using API key
-            params = {
-                'api_key': self.api_key,
-                'query': title,
-                'language': 'en-US',
-                'with_genres': '16'
-            }
-            response = requests.get(endpoint, params=params)
-            
-        response.raise_for_status()
-        return response.json()
+        """
+        Search for an anime by title.
+        
+        A close match in the show catalog is returned without asking TMDB.
+        Otherwise TMDB's results are re-ranked by the catalog's criteria and
+        the best one is remembered under this title.
+        """
+        if self.catalog is not None:
+            show = self.catalog.lookup(title, TRUSTED_SCORE)
+            if show is not None:
+                with self._memo_lock:
+                    self.stats['catalog_hits'] += 1
+                return self.catalog.as_search_results(show)
+        
+        params = {
+            'query': title,
+            'language': 'en-US',
+            # Filter for animation genre (16 is animation in TMDB)
+            'with_genres': '16'
+        }
+        results = self._get("/search/tv", params)
+        
+        if self.catalog is not None and results.get('results'):
+            ranked = self.catalog.rank_results(title, results['results'])
+            for rank, result in enumerate(ranked):
+                self.catalog.add(result, alias=title if rank == 0 else None)
+            results = {**results, 'results': ranked}
+        return results
     
     def get_tv_details(self, tv_id):
         """Get detailed information about a TV show."""
-        endpoint = f"{self.BASE_URL}/tv/{tv_id}"
-        
-        if self.headers:  # Using access token
-            params = {
-                'language': 'en-US',
-                'append_to_response': 'images'
-            }
-            response = requests.get(endpoint, params=params, headers=self.headers)
-        else:  # Using API key
-            params = {
-                'api_key': self.api_key,
-                'language': 'en-US',
-                'append_to_response': 'images'
-            }
-            response = requests.get(endpoint, params=params)
-            
-        response.raise_for_status()
-        return response.json()
+        params = {
+            'language': 'en-US',
+            'append_to_response': 'images'
+        }
+        return self._get(f"/tv/{tv_id}", params)
     
     def get_season_details(self, tv_id, season_number):
         """Get detailed information about a specific season."""
-        endpoint = f"{self.BASE_URL}/tv/{tv_id}/season/{season_number}"
-        
-        if self.headers:  # Using access token
-            params = {
-                'language': 'en-US',
-                'append_to_response': 'images'
-            }
-            response = requests.get(endpoint, params=params, headers=self.headers)
-        else:  # Using API key
-            params = {
-                'api_key': self.api_key,
-                'language': 'en-US',
-                'append_to_response': 'images'
-            }
-            response = requests.get(endpoint, params=params)
-            
-        response.raise_for_status()
-        return response.json()
+        params = {
+            'language': 'en-US',
+            'append_to_response': 'images'
+        }
+        return self._get(f"/tv/{tv_id}/season/{season_number}", params)
     
     def get_episode_details(self, tv_id, season_number, episode_number):
         """Get detailed information about a specific episode."""
-        endpoint = f"{self.BASE_URL}/tv/{tv_id}/season/{season_number}/episode/{episode_number}"
-        
-        if self.headers:  # Using access token
-            params = {
-                'language': 'en-US',
-                'append_to_response': 'images'
-            }
-            response = requests.get(endpoint, params=params, headers=self.headers)
-        else:  # Using API key
-            params = {
-                'api_key': self.api_key,
-                'language': 'en-US',
-                'append_to_response': 'images'
-            }
-            response = requests.get(endpoint, params=params)
-            
-        response.raise_for_status()
-        return response.json()
+        params = {
+            'language': 'en-US',
+            'append_to_response': 'images'
+        }
+        return self._get(f"/tv/{tv_id}/season/{season_number}/episode/{episode_number}", params)
+    
+    def get_configuration(self):
+        """Get TMDB's API configuration (image base URL and sizes)."""
+        return self._get("/configuration", {})
     
-    def get_image_url(self, path, size='original'):
-        """Convert image path to full URL with specified size."""
+    @property
+    def image_sizes(self):
+        """Image sizes from TMDB's configuration, or TMDB's published defaults if it is unavailable."""
+        if self._image_sizes is None:
+            try:
+                configuration = self.get_configuration()
+            except Exception:
+                configuration = None
+            self._image_sizes = ImageSizes(configuration)
+        return self._image_sizes
+    
+    def get_image_url(self, path, size='original', image_type=None, usage=None):
+        """
+        Convert image path to full URL with specified size.
+        
+        With an image_type ('poster', 'still', 'backdrop') and a usage
+        ('thumbnail', 'badge', 'preview'; see tmdb_images.py), the smallest
+        configured size that is large enough for the usage is used instead.
+        """
         if not path:
             return None
+        if usage is not None:
+            return self.image_sizes.url(path, image_type, usage)
         return f"{self.IMAGE_BASE_URL}{size}/{path.lstrip('/')}"
     
     def get_anime_images(self, anime_title, season_number=None):
@@ -140,15 +361,16 @@ class TMDBApi:
         
         images = {
             'title': show_details.get('name'),
-            'poster': self.get_image_url(show_details.get('poster_path')),
-            'backdrop': self.get_image_url(show_details.get('backdrop_path')),
+            'poster': self.get_image_url(show_details.get('poster_path'), image_type='poster', usage=self.IMAGE_USAGE),
+            'backdrop': self.get_image_url(show_details.get('backdrop_path'), image_type='backdrop', usage=self.IMAGE_USAGE),
         }
         
         # If season number provided, get season-specific images
         if season_number is not None:
             try:
                 season_details = self.get_season_details(show_id, season_number)
-                images['season_poster'] = self.get_image_url(season_details.get('poster_path'))
+                images['season_poster'] = self.get_image_url(season_details.get('poster_path'), image_type='poster',
+                                                              usage=self.IMAGE_USAGE)
                 images['season_name'] = season_details.get('name')
             except Exception as e:
                 print(f"Error fetching season {season_number} details: {e}")
@@ -166,9 +388,12 @@ class TMDBApi:
             episode_details = self.get_episode_details(show_id, season_number, episode_number)
             
             return {
-                'episode_still': self.get_image_url(episode_details.get('still_path')),
+                'episode_still': self.get_image_url(episode_details.get('still_path'), image_type='still',
+                                                    usage=self.IMAGE_USAGE),
                 'episode_name': episode_details.get('name')
             }
+        except CircuitOpenError:
+            return None
         except Exception as e:
             print(f"Error fetching episode image: {e}")
             return None
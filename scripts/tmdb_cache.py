@@ -0,0 +1,105 @@
+#!/usr/bin/env python3
+"""
+TMDB Response Cache
+
+A persistent, expiring cache of TMDB responses shared between runs (and
+between processes, e.g. prefetch_tmdb.py warming it while a refresh reads
+it). Entries are keyed like fixtures (see tmdb_fixtures.request_key), so
+credentials never end up on disk.
+
+The cache is a small SQLite database; each entry expires `ttl` seconds after
+it was fetched. Negative answers (404/410s and searches without results) use
+their own, shorter `negative_ttl`, so a title with no TMDB match is not
+searched again on every run, but is retried once it may have been added.
+"""
+
+import os
+import json
+import time
+import sqlite3
+import threading
+
+# TMDB artwork rarely changes within a day
+DEFAULT_TTL = 24 * 60 * 60
+DEFAULT_NEGATIVE_TTL = 6 * 60 * 60
+
+
+def is_negative(status, body):
+    """True for responses that mean "nothing found"."""
+    if status in (404, 410):
+        return True
+    return isinstance(body, dict) and 'results' in body and not body['results']
+
+
+class ResponseCache:
+    """
+    A thread-safe key/response cache backed by SQLite.
+    """
+
+    def __init__(self, path, ttl=DEFAULT_TTL, negative_ttl=DEFAULT_NEGATIVE_TTL):
+        self.path = path
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+        self._lock = threading.Lock()
+
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        self.db = sqlite3.connect(path, timeout=30, check_same_thread=False)
+        # WAL lets a refresh read while a prefetch run is writing
+        self.db.execute("PRAGMA journal_mode=WAL")
+        self.db.execute(
+            "CREATE TABLE IF NOT EXISTS responses ("
+            "key TEXT PRIMARY KEY, status INTEGER NOT NULL, body TEXT, fetched REAL NOT NULL, "
+            "negative INTEGER NOT NULL DEFAULT 0)"
+        )
+        columns = {row[1] for row in self.db.execute("PRAGMA table_info(responses)")}
+        if 'negative' not in columns:
+            # Caches created before negative caching
+            self.db.execute("ALTER TABLE responses ADD COLUMN negative INTEGER NOT NULL DEFAULT 0")
+        self.db.commit()
+
+    def get(self, key, max_age=None):
+        """
+        Return the cached (status, body) for a key, or None if missing or expired.
+        max_age overrides the TTL for responses that change rarely.
+        """
+        with self._lock:
+            row = self.db.execute(
+                "SELECT status, body, fetched, negative FROM responses WHERE key = ?", (key,)
+            ).fetchone()
+        if row is None:
+            return None
+        status, body, fetched, negative = row
+        if max_age is None:
+            max_age = self.negative_ttl if negative else self.ttl
+        if time.time() - fetched > max_age:
+            return None
+        return status, json.loads(body)
+
+    def put(self, key, status, body):
+        """Store a response for a key."""
+        with self._lock:
+            self.db.execute(
+                "INSERT OR REPLACE INTO responses (key, status, body, fetched, negative) VALUES (?, ?, ?, ?, ?)",
+                (key, status, json.dumps(body, separators=(',', ':')), time.time(), int(is_negative(status, body)))
+            )
+            self.db.commit()
+
+    def purge_expired(self):
+        """Delete expired entries. Returns the number removed."""
+        with self._lock:
+            now = time.time()
+            cursor = self.db.execute(
+                "DELETE FROM responses WHERE fetched < ? OR (negative AND fetched < ?)",
+                (now - self.ttl, now - self.negative_ttl)
+            )
+            self.db.commit()
+        return cursor.rowcount
+
+    def __len__(self):
+        with self._lock:
+            return self.db.execute("SELECT COUNT(*) FROM responses").fetchone()[0]
+
+    def close(self):
+        with self._lock:
+            self.db.close()
@@ -0,0 +1,99 @@
+#!/usr/bin/env python3
+"""
+TMDB Fixture Store
+
+Records TMDB API requests and responses to a compact on-disk file so that
+calendar refreshes can later be replayed without any network access.
+
+The store is a single JSON document (gzip-compressed when the file name ends
+in .gz) mapping a normalized request key to the recorded status code and body.
+Credentials are never part of the key, so fixtures recorded with an access
+token replay fine with an API key and vice versa.
+"""
+
+import os
+import json
+import gzip
+import sys
+import threading
+from urllib.parse import urlencode
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from output_writer import write_if_changed
+
+# Query parameters that carry credentials and must never be written to disk
+SECRET_PARAMS = {'api_key'}
+
+
+class FixtureMissError(LookupError):
+    """Raised in replay mode when a request was never recorded."""
+
+
+def request_key(path, params=None):
+    """Build a stable key for a request from its path and non-secret params."""
+    params = {k: v for k, v in (params or {}).items() if k not in SECRET_PARAMS}
+    query = urlencode(sorted(params.items()))
+    return f"{path}?{query}" if query else path
+
+
+class FixtureStore:
+    """
+    A thread-safe key/response store backed by a single JSON file.
+    """
+
+    def __init__(self, path):
+        """Open (or prepare to create) the fixture file at the given path."""
+        self.path = path
+        self.entries = {}
+        self.dirty = False
+        self._lock = threading.Lock()
+
+        if os.path.isfile(path):
+            self.entries = self._read()
+
+    def _read(self):
+        if self.path.endswith('.gz'):
+            with gzip.open(self.path, 'rt', encoding='utf-8') as f:
+                data = json.load(f)
+        else:
+            with open(self.path, encoding='utf-8') as f:
+                data = json.load(f)
+        return data.get('responses', {})
+
+    def get(self, key):
+        """Return the recorded (status, body) for a key, or raise FixtureMissError."""
+        with self._lock:
+            entry = self.entries.get(key)
+        if entry is None:
+            raise FixtureMissError(f"No recorded TMDB response for {key}")
+        return entry['status'], entry['body']
+
+    def put(self, key, status, body):
+        """Record a response for a key."""
+        with self._lock:
+            self.entries[key] = {'status': status, 'body': body}
+            self.dirty = True
+
+    def __contains__(self, key):
+        with self._lock:
+            return key in self.entries
+
+    def __len__(self):
+        with self._lock:
+            return len(self.entries)
+
+    def save(self):
+        """Write the store to disk if anything was recorded."""
+        with self._lock:
+            if not self.dirty:
+                return False
+            directory = os.path.dirname(os.path.abspath(self.path))
+            os.makedirs(directory, exist_ok=True)
+            payload = {'version': 1, 'responses': dict(sorted(self.entries.items()))}
+            data = json.dumps(payload, separators=(',', ':'), ensure_ascii=False).encode('utf-8')
+            if self.path.endswith('.gz'):
+                # A fixed mtime keeps the compressed bytes reproducible
+                data = gzip.compress(data, mtime=0)
+            write_if_changed(self.path, data, ignore_volatile=False)
+            self.dirty = False
+        return True
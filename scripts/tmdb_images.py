@@ -0,0 +1,122 @@
+#!/usr/bin/env python3
+"""
+TMDB Image Sizes
+
+Picks TMDB image sizes by how an image is shown instead of always linking
+the original upload (often several megabytes). The valid sizes per image
+type come from TMDB's /configuration endpoint; TMDBApi caches that response
+for a week, and the sizes TMDB has published for years are used whenever it
+is not available.
+
+Usages and the width (in pixels) they need:
+  badge      small icon next to an event (Outlook, DISPLAY=BADGE)
+  preview    images on the HTML preview and schedule site pages
+  thumbnail  the event image shown by calendar clients (DISPLAY=THUMBNAIL)
+
+The smallest configured size at least that wide is used, or the original if
+none is.
+"""
+
+import os
+import re
+from functools import lru_cache
+
+# TMDB suggests re-reading /configuration every few days
+CONFIGURATION_TTL = 7 * 24 * 60 * 60
+
+USAGE_WIDTHS = {
+    'badge': 92,
+    'preview': 185,
+    'thumbnail': 300,
+}
+
+# TMDB's /configuration "images" section, as used when it cannot be fetched
+DEFAULT_IMAGE_CONFIGURATION = {
+    'secure_base_url': 'https://image.tmdb.org/t/p/',
+    'backdrop_sizes': ['w300', 'w780', 'w1280', 'original'],
+    'logo_sizes': ['w45', 'w92', 'w154', 'w185', 'w300', 'w500', 'original'],
+    'poster_sizes': ['w92', 'w154', 'w185', 'w342', 'w500', 'w780', 'original'],
+    'profile_sizes': ['w45', 'w185', 'h632', 'original'],
+    'still_sizes': ['w92', 'w185', 'w300', 'original'],
+}
+
+# A TMDB image URL: base, size and file path
+TMDB_IMAGE_URL = re.compile(r'^(https?://image\.tmdb\.org/t/p/)([^/]+)(/.+)$')
+
+
+def pick_size(sizes, width):
+    """Return the smallest width-based size ("w300") of at least `width` pixels, else the largest available."""
+    widths = sorted(
+        (int(size[1:]), size) for size in sizes
+        if size.startswith('w') and size[1:].isdigit()
+    )
+    for size_width, size in widths:
+        if size_width >= width:
+            return size
+    return 'original' if 'original' in sizes or not widths else widths[-1][1]
+
+
+class ImageSizes:
+    """
+    Image sizes from a TMDB configuration, chosen by image type and usage.
+    """
+
+    def __init__(self, configuration=None):
+        images = dict(DEFAULT_IMAGE_CONFIGURATION)
+        images.update((configuration or {}).get('images') or {})
+        self.base_url = images.get('secure_base_url') or DEFAULT_IMAGE_CONFIGURATION['secure_base_url']
+        self.sizes = {
+            key[:-len('_sizes')]: value for key, value in images.items()
+            if key.endswith('_sizes') and isinstance(value, list)
+        }
+        # Calendar images are episode stills or posters; when rewriting an
+        # existing URL its type is unknown, so only sizes valid for both qualify
+        self.common_sizes = [size for size in self.sizes.get('poster', []) if size in self.sizes.get('still', [])]
+
+    def size_for(self, image_type, usage):
+        """Return the size to request for an image type ('poster', 'still', ...) shown as `usage`."""
+        if usage is None:
+            return 'original'
+        sizes = self.sizes.get(image_type) or self.common_sizes
+        return pick_size(sizes, USAGE_WIDTHS[usage])
+
+    def url(self, path, image_type, usage):
+        """Build the full URL for an image path."""
+        return f"{self.base_url}{self.size_for(image_type, usage)}/{path.lstrip('/')}"
+
+    def resize_url(self, url, usage):
+        """Point an existing TMDB image URL at the size for `usage`; other URLs are returned unchanged."""
+        match = TMDB_IMAGE_URL.match(url or '')
+        if not match:
+            return url
+        return f"{match.group(1)}{pick_size(self.common_sizes, USAGE_WIDTHS[usage])}{match.group(3)}"
+
+
+@lru_cache(maxsize=1)
+def cached_image_sizes():
+    """
+    Image sizes from the TMDB configuration in the response cache, without
+    any network access; the published defaults if it is not cached.
+    """
+    try:
+        from config import get_tmdb_cache_settings
+        from tmdb_cache import ResponseCache
+        from tmdb_fixtures import request_key
+        cache_file = get_tmdb_cache_settings()[0]
+        configuration = None
+        if cache_file and os.path.isfile(cache_file):
+            cache = ResponseCache(cache_file)
+            try:
+                cached = cache.get(request_key('/configuration'), CONFIGURATION_TTL)
+            finally:
+                cache.close()
+            if cached is not None and cached[0] == 200:
+                configuration = cached[1]
+        return ImageSizes(configuration)
+    except Exception:
+        return ImageSizes()
+
+
+def resize_image_url(url, usage):
+    """Point a TMDB image URL at the size for `usage` (see cached_image_sizes)."""
+    return cached_image_sizes().resize_url(url, usage)
@@ -9,153 +9,369 @@ Usage:
   python update_calendar_images.py --access-token YOUR_ACCESS_TOKEN [--ics-file main.ics]
   or
   python update_calendar_images.py --api-key YOUR_API_KEY [--ics-file main.ics]
+  or, without network access, from previously recorded TMDB responses
+  python update_calendar_images.py --replay fixtures/tmdb.json.gz [--ics-file main.ics]
+  or, to only print the planned TMDB requests
+  python update_calendar_images.py --dry-run [--ics-file main.ics]
 """
 
 import os
 import sys
-import re
 import argparse
-import icalendar
 from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor
 
 # Use local import - make sure we're using the updated version
 sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
-from tmdb_api import TMDBApi
-from config import get_tmdb_credentials
+from tmdb_api import TMDBApi, CircuitOpenError
+from config import get_tmdb_credentials, get_tmdb_fixture_settings
+from series_parser import parse_summary
+from output_writer import AtomicWriter
+from ics_writer import ICSWriter, detect_newline
+from calendar_diff import iter_event_spans
+from rrule_compact import expand_if_compacted
+from calendar_snapshot import load_calendar
+import memory_profile
 
 def extract_series_info(summary):
-    """Extract anime series name and episode number from event summary."""
-    # Match patterns like "The Apothecary Diaries S2 - Episode 31"
-    pattern = r"(.*?)(?:S(\d+)|Season (\d+))?\s*-\s*Episode\s*(\d+)"
-    match = re.search(pattern, summary, re.IGNORECASE)
-    
-    if match:
-        series = match.group(1).strip()
-        season = match.group(2) or match.group(3) or "1"  # Default to season 1 if not specified
-        episode = match.group(4)
-        return series, int(season), int(episode)
-    
-    # Try simpler pattern without season specification
-    pattern = r"(.*?)\s*-\s*Episode\s*(\d+)"
-    match = re.search(pattern, summary, re.IGNORECASE)
-    
-    if match:
-        series = match.group(1).strip()
-        episode = match.group(2)
-        return series, 1, int(episode)  # Assume season 1
-    
-    return None, None, None
-
-def update_calendar_with_images(ics_file, tmdb_api):
-    """Update calendar events with images from TMDB."""
-    print(f"Processing calendar file: {ics_file}")
+    """
+    Extract anime series name, season and episode number from event summary.
+    Matches patterns like "The Apothecary Diaries S2 - Episode 31", defaulting to season 1.
+    """
+    return parse_summary(summary)
+
+# Number of TMDB lookups run concurrently while executing a lookup plan
+DEFAULT_WORKERS = 8
+
+class ImageLookupPlan:
+    """
+    The minimal set of unique TMDB lookups needed to add images to a calendar.
     
-    # Read the iCalendar file
-    with open(ics_file, 'r') as file:
-        content = file.read()
+    Each lookup remembers the earliest DTSTART of the events that need it so
+    lookups can be run soonest-airing first.
+    """
     
-    # Parse the iCalendar content
-    cal = icalendar.Calendar.from_ical(content)
+    def __init__(self):
+        self.events = []      # (component, series, season, episode)
+        self.skipped = []     # summaries without recognizable series info
+        self.shows = {}       # series -> earliest DTSTART
+        self.seasons = {}     # (series, season) -> earliest DTSTART
+        self.episodes = {}    # (series, season, episode) -> earliest DTSTART
     
-    # Process each event
-    event_count = 0
-    image_count = 0
+    def add_event(self, component, series, season, episode, start):
+        """Register an event and the lookups it depends on."""
+        self.events.append((component, series, season, episode))
+        for lookups, key in ((self.shows, series),
+                             (self.seasons, (series, season)),
+                             (self.episodes, (series, season, episode))):
+            if key not in lookups or start < lookups[key]:
+                lookups[key] = start
+    
+    @staticmethod
+    def _by_priority(lookups):
+        return sorted(lookups, key=lambda key: (lookups[key], key))
+    
+    def ordered_shows(self):
+        return self._by_priority(self.shows)
+    
+    def ordered_seasons(self):
+        return self._by_priority(self.seasons)
+    
+    def ordered_episodes(self):
+        return self._by_priority(self.episodes)
+    
+    def required_requests(self):
+        """Requests always sent: one search per show plus one per episode."""
+        return len(self.shows) + len(self.episodes)
+    
+    def fallback_requests(self):
+        """Upper bound on extra requests for shows/seasons without episode stills."""
+        return len(self.shows) + len(self.seasons)
+    
+    def describe(self, verbose=True):
+        """Print the plan without sending any requests."""
+        print(f"Lookup plan: {len(self.events)} events "
+              f"({len(self.skipped)} without series info)")
+        print(f"  {len(self.shows)} shows, {len(self.seasons)} seasons, {len(self.episodes)} episodes")
+        print(f"  Requests: {self.required_requests()} required "
+              f"({len(self.shows)} searches + {len(self.episodes)} episodes), "
+              f"up to {self.fallback_requests()} fallback "
+              f"({len(self.shows)} show details + {len(self.seasons)} seasons)")
+        
+        if verbose:
+            for series in self.ordered_shows():
+                print(f"  show     {series}")
+            for series, season, episode in self.ordered_episodes():
+                print(f"  episode  {series} S{season}E{episode}")
+            for series, season in self.ordered_seasons():
+                print(f"  season   {series} S{season} (fallback)")
+            for summary in self.skipped:
+                print(f"  skipped  {summary}")
+
+def plan_image_lookups(cal, uids=None):
+    """
+    Scan VEVENT summaries and build the lookup plan for a calendar.
+    If uids is given, only events with those UIDs are planned.
+    """
+    plan = ImageLookupPlan()
     
     for component in cal.walk():
         if component.name == "VEVENT":
-            event_count += 1
+            if uids is not None and str(component.get('uid', '')) not in uids:
+                continue
             summary = str(component.get('summary', ''))
             
             series, season, episode = extract_series_info(summary)
             if not series:
-                print(f"Could not extract series info from: {summary}")
+                plan.skipped.append(summary)
                 continue
-                
-            print(f"Found event: {summary} (Series: {series}, Season: {season}, Episode: {episode})")
             
-            # Get images for this anime series/episode
-            try:
-                # First try to get episode-specific image
-                episode_image = tmdb_api.get_episode_image(series, season, episode)
-                
-                # Remove any existing IMAGE properties to avoid duplicates
-                for existing_image in list(component.items()):
-                    if existing_image[0] == 'IMAGE':
-                        del component[existing_image[0]]
-                
-                if episode_image and episode_image.get('episode_still'):
-                    # Add episode still as IMAGE property
-                    image_url = episode_image.get('episode_still')
-                    component.add('IMAGE', image_url, parameters={
-                        'VALUE': 'URI',
-                        'DISPLAY': 'THUMBNAIL',
-                        'FMTTYPE': 'image/jpeg'
-                    })
-                    image_count += 1
-                    print(f"  Added episode image: {image_url}")
+            # UTC iCalendar timestamps sort correctly as strings
+            dtstart = component.get('dtstart')
+            start = dtstart.to_ical().decode('utf-8') if dtstart else '99999999T999999Z'
+            plan.add_event(component, series, season, episode, start)
+    
+    return plan
+
+def _lookup_show_images(tmdb_api, series, season):
+    try:
+        return tmdb_api.get_anime_images(series, season)
+    except CircuitOpenError:
+        return {}
+    except Exception as e:
+        print(f"  Error getting images for {series}: {e}")
+        return {}
+
+def _search_show(tmdb_api, series):
+    try:
+        tmdb_api.search_anime(series)
+    except CircuitOpenError:
+        pass
+    except Exception as e:
+        print(f"  Error searching for {series}: {e}")
+
+def execute_plan(plan, tmdb_api, workers=DEFAULT_WORKERS):
+    """
+    Run all planned lookups in bulk, soonest airings first.
+    
+    Returns a tuple of (episode_images, show_images) keyed like the plan.
+    """
+    episode_images = {}
+    show_images = {}
+    
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        # 1. Every other lookup needs the show id, so resolve shows first
+        list(pool.map(lambda series: _search_show(tmdb_api, series), plan.ordered_shows()))
+        
+        # 2. Episode stills
+        episodes = plan.ordered_episodes()
+        for key, image in zip(episodes, pool.map(lambda key: tmdb_api.get_episode_image(*key), episodes)):
+            episode_images[key] = image
+        
+        # 3. Season/series posters, only for seasons with an episode lacking a still
+        missing_stills = {
+            (series, season) for (series, season, _), image in episode_images.items()
+            if not (image and image.get('episode_still'))
+        }
+        fallback = [key for key in plan.ordered_seasons() if key in missing_stills]
+        for key, images in zip(fallback, pool.map(lambda key: _lookup_show_images(tmdb_api, *key), fallback)):
+            show_images[key] = images
+    
+    return episode_images, show_images
+
+IMAGE_PARAMETERS = {
+    'VALUE': 'URI',
+    'DISPLAY': 'THUMBNAIL',
+    'FMTTYPE': 'image/jpeg'
+}
+
+def _add_image(component, image_url):
+    component.add('IMAGE', image_url, parameters=dict(IMAGE_PARAMETERS))
+
+def _image_signature(component):
+    images = component.get('IMAGE')
+    if images is None:
+        return []
+    if not isinstance(images, list):
+        images = [images]
+    return [(str(image), sorted((key.upper(), str(value)) for key, value in image.params.items())) for image in images]
+
+def apply_images(plan, episode_images, show_images, keep_existing=False):
+    """
+    Apply resolved images to the planned events in one pass. With
+    keep_existing=True, events without a resolved image keep their current
+    IMAGE properties instead of losing them.
+    
+    Returns a tuple of (image count, ids of the components whose images changed).
+    """
+    image_count = 0
+    changed = set()
+    
+    for component, series, season, episode in plan.events:
+        previous = _image_signature(component)
+        
+        episode_image = episode_images.get((series, season, episode))
+        images = show_images.get((series, season)) or {}
+        
+        if episode_image and episode_image.get('episode_still'):
+            image_url = episode_image.get('episode_still')
+            kind = 'episode image'
+        elif images.get('season_poster'):
+            image_url = images.get('season_poster')
+            kind = 'season poster'
+        elif images.get('poster'):
+            image_url = images.get('poster')
+            kind = 'series poster'
+        else:
+            image_url = None
+        
+        if not image_url and keep_existing:
+            if previous:
+                image_count += 1
+            continue
+        
+        # Remove any existing IMAGE properties to avoid duplicates
+        for existing_image in list(component.items()):
+            if existing_image[0] == 'IMAGE':
+                del component[existing_image[0]]
+        
+        if image_url:
+            _add_image(component, image_url)
+            image_count += 1
+            print(f"  {series} S{season}E{episode}: added {kind}: {image_url}")
+        
+        if _image_signature(component) != previous:
+            changed.add(id(component))
+    
+    return image_count, changed
+
+def write_calendar(ics_file, content, cal, changed):
+    """
+    Stream the calendar to disk. Events whose images changed are re-serialized;
+    everything else is copied from the original content byte for byte.
+    Returns True if the file was written.
+    """
+    components = list(cal.walk('VEVENT'))
+    spans = list(iter_event_spans(content))
+    newline = detect_newline(content)
+    
+    writer = AtomicWriter(ics_file)
+    with writer as f:
+        ics = ICSWriter(f, newline)
+        if len(spans) != len(components):
+            # The text and the parsed calendar disagree; serialize everything
+            ics.write_component(cal)
+        else:
+            position = 0
+            for (start, end), component in zip(spans, components):
+                if content.startswith(newline, end):
+                    end += len(newline)
+                ics.write_raw(content[position:start])
+                if id(component) in changed:
+                    ics.write_component(component)
                 else:
-                    # Fall back to series/season poster
-                    images = tmdb_api.get_anime_images(series, season)
-                    
-                    if images.get('season_poster'):
-                        image_url = images.get('season_poster')
-                        component.add('IMAGE', image_url, parameters={
-                            'VALUE': 'URI',
-                            'DISPLAY': 'THUMBNAIL', 
-                            'FMTTYPE': 'image/jpeg'
-                        })
-                        image_count += 1
-                        print(f"  Added season poster: {image_url}")
-                    elif images.get('poster'):
-                        image_url = images.get('poster')
-                        component.add('IMAGE', image_url, parameters={
-                            'VALUE': 'URI',
-                            'DISPLAY': 'THUMBNAIL',
-                            'FMTTYPE': 'image/jpeg'
-                        })
-                        image_count += 1
-                        print(f"  Added series poster: {image_url}")
-            except Exception as e:
-                print(f"  Error getting images for {series}: {e}")
-    
-    # Convert back to iCalendar format
-    updated_content = cal.to_ical().decode('utf-8')
-    
-    # Write the updated calendar back to the file
-    with open(ics_file, 'w') as file:
-        file.write(updated_content)
-    
-    print(f"Calendar updated: {image_count}/{event_count} events have images")
+                    ics.write_raw(content[start:end])
+                position = end
+            ics.write_raw(content[position:])
+    
+    if not writer.changed:
+        print(f"No changes to write for {ics_file}")
+    return writer.changed
+
+def update_calendar_with_images(ics_file, tmdb_api, workers=DEFAULT_WORKERS, dry_run=False, uids=None):
+    """
+    Update calendar events with images from TMDB.
+    
+    All lookups are planned and resolved up front, then applied to the events
+    in a single pass. With dry_run=True only the plan is printed. If uids is
+    given, only those events are re-enriched.
+    """
+    print(f"Processing calendar file: {ics_file}")
+    
+    # Read and parse the iCalendar file, or load the snapshot of an unchanged file.
+    # Images are per episode, so compacted weekly runs are expanded first.
+    with memory_profile.stage('load'):
+        content, cal = load_calendar(ics_file, prepare=expand_if_compacted)
+    
+    with memory_profile.stage('plan'):
+        plan = plan_image_lookups(cal, uids)
+        memory_profile.set_events(len(plan.events) + len(plan.skipped))
+    plan.describe(verbose=dry_run)
+    if dry_run:
+        return plan
+    
+    for summary in plan.skipped:
+        print(f"Could not extract series info from: {summary}")
+    
+    with memory_profile.stage('lookups'):
+        episode_images, show_images = execute_plan(plan, tmdb_api, workers)
+        memory_profile.set_events(len(plan.events))
+    print(f"TMDB lookups: {tmdb_api.stats['requests']} requests, {tmdb_api.stats['cache_hits']} served from cache, "
+          f"{tmdb_api.stats['catalog_hits']} titles resolved from the show catalog")
+    # If TMDB went down mid-run, unresolved events keep the images they had
+    keep_existing = tmdb_api.breaker.is_open
+    if keep_existing:
+        print("⚠️ TMDB lookups were skipped; events without a new image keep their existing IMAGE")
+    with memory_profile.stage('apply'):
+        image_count, changed = apply_images(plan, episode_images, show_images, keep_existing)
+        memory_profile.set_events(len(plan.events))
+    
+    # Write the updated calendar back to the file, re-serializing only changed events
+    with memory_profile.stage('write'):
+        write_calendar(ics_file, content, cal, changed)
+        memory_profile.set_events(len(plan.events) + len(plan.skipped))
+    
+    print(f"Calendar updated: {image_count}/{len(plan.events) + len(plan.skipped)} events have images")
+    return plan
 
 def main():
     parser = argparse.ArgumentParser(description='Update calendar events with anime images.')
     parser.add_argument('--api-key', help='TMDB API key')
     parser.add_argument('--access-token', help='TMDB access token')
     parser.add_argument('--ics-file', default='main.ics', help='Path to the ICS calendar file')
+    fixtures = parser.add_mutually_exclusive_group()
+    fixtures.add_argument('--record', metavar='FIXTURE_FILE', help='Record TMDB responses to a fixture file')
+    fixtures.add_argument('--replay', metavar='FIXTURE_FILE', help='Serve TMDB responses from a fixture file (no network)')
+    parser.add_argument('--dry-run', action='store_true', help='Print the TMDB lookup plan without sending any requests')
+    parser.add_argument('--workers', type=int, default=DEFAULT_WORKERS, help='Number of concurrent TMDB lookups')
+    memory_profile.add_argument(parser)
     
     args = parser.parse_args()
+    if args.profile_memory:
+        memory_profile.enable()
+    
+    # Ensure the ICS file exists
+    ics_file = args.ics_file
+    if not os.path.isfile(ics_file):
+        print(f"Error: Calendar file not found: {ics_file}")
+        return 1
+    
+    if args.dry_run:
+        update_calendar_with_images(ics_file, None, dry_run=True)
+        return 0
     
     # Get credentials from .env file or environment variables
     env_access_token, env_api_key = get_tmdb_credentials()
+    mode, fixture_file = get_tmdb_fixture_settings(args.record, args.replay)
     
     # Command line arguments take precedence over environment variables
     access_token = args.access_token or env_access_token
     api_key = args.api_key or env_api_key
     
-    if not access_token and not api_key:
+    if mode != 'replay' and not access_token and not api_key:
         print("Error: Either TMDB API key or access token is required.")
         print("Please create a .env file based on .env.example or provide credentials via command line.")
         return 1
     
-    # Ensure the ICS file exists
-    ics_file = args.ics_file
-    if not os.path.isfile(ics_file):
-        print(f"Error: Calendar file not found: {ics_file}")
-        return 1
-    
     try:
-        tmdb_api = TMDBApi(access_token=access_token, api_key=api_key)
-        update_calendar_with_images(ics_file, tmdb_api)
+        tmdb_api = TMDBApi(access_token=access_token, api_key=api_key,
+                           mode=mode, fixture_file=fixture_file)
+        try:
+            update_calendar_with_images(ics_file, tmdb_api, args.workers)
+        finally:
+            tmdb_api.save_catalog()
+            if tmdb_api.save_fixtures():
+                print(f"Recorded TMDB responses to {fixture_file}")
         return 0
     except Exception as e:
         print(f"Error: {e}")
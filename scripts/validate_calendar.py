@@ -6,11 +6,93 @@ Run this script before committing changes to ensure the calendar is valid.
 
 import re
 import sys
+import json
+import hashlib
 import os.path
 from datetime import datetime
 
-def validate_ics_file(file_path):
-    """Validate an ICS file for common issues and RFC 7986 compliance."""
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from output_writer import AtomicWriter
+import memory_profile
+
+# Bump when the event checks change, so cached findings are not reused
+VALIDATOR_VERSION = 1
+
+EVENT_PATTERN = re.compile(r"BEGIN:VEVENT(.*?)END:VEVENT", re.DOTALL)
+DATE_PATTERN = re.compile(r"DT\w+:(\d{8}T\d{6}Z)")
+
+def default_cache_file(file_path):
+    """Return the sidecar cache path for a calendar file (under .cache/, one per calendar path)."""
+    root_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    path_hash = hashlib.sha256(os.path.abspath(file_path).encode('utf-8')).hexdigest()[:8]
+    name = os.path.splitext(os.path.basename(file_path))[0]
+    return os.path.join(root_dir, '.cache', 'validation', f"{name}-{path_hash}.json")
+
+def event_hash(event):
+    """Hash of an event's exact text; any byte change means it is checked again."""
+    return hashlib.sha256(event.encode('utf-8')).hexdigest()[:16]
+
+def load_findings_cache(cache_file):
+    """Return {event hash: findings} from a sidecar cache, or {} if missing or outdated."""
+    try:
+        with open(cache_file, 'r') as f:
+            cache = json.load(f)
+    except (OSError, ValueError):
+        return {}
+    if cache.get('version') != VALIDATOR_VERSION:
+        return {}
+    return {key: [tuple(finding) for finding in findings] for key, findings in cache.get('events', {}).items()}
+
+def save_findings_cache(cache_file, findings_by_hash):
+    os.makedirs(os.path.dirname(os.path.abspath(cache_file)), exist_ok=True)
+    payload = {'version': VALIDATOR_VERSION, 'events': findings_by_hash}
+    with AtomicWriter(cache_file, ignore_volatile=False) as f:
+        json.dump(payload, f, separators=(',', ':'), sort_keys=True)
+
+def check_event(event):
+    """
+    Check one event (the text between BEGIN:VEVENT and END:VEVENT).
+    Returns a list of (level, message) findings, level being 'error' or 'warning'.
+    """
+    findings = []
+    
+    # Check for required event properties (RFC 5545)
+    for prop in ["UID", "DTSTAMP", "DTSTART"]:
+        if f"{prop}:" not in event:
+            findings.append(('error', f"is missing required property '{prop}'."))
+    
+    # Check for recommended properties (RFC 5545)
+    for prop in ["SUMMARY", "DESCRIPTION"]:
+        if f"{prop}:" not in event:
+            findings.append(('warning', f"is missing recommended property '{prop}'."))
+            
+    # Check for RFC 7986/Outlook enhanced properties
+    enhanced_props = ["CATEGORIES", "CREATED", "LAST-MODIFIED", "SEQUENCE", "TRANSP"]
+    missing_enhanced = []
+    for prop in enhanced_props:
+        if f"{prop}:" not in event and f"{prop};" not in event:
+            missing_enhanced.append(prop)
+            
+    if missing_enhanced:
+        findings.append(('warning', f"missing enhanced properties: {', '.join(missing_enhanced)}"))
+    
+    # Check date format (simple check)
+    for date_str in DATE_PATTERN.findall(event):
+        try:
+            datetime.strptime(date_str, "%Y%m%dT%H%M%SZ")
+        except ValueError:
+            findings.append(('error', f"has invalid date format '{date_str}'."))
+    return findings
+
+@memory_profile.profiled('validate')
+def validate_ics_file(file_path, full=False, cache_file=None):
+    """
+    Validate an ICS file for common issues and RFC 7986 compliance.
+    
+    Findings for each event are kept in a sidecar cache keyed by the event's
+    content hash, so only new or changed events are checked again; the
+    calendar-level checks always run. Pass full=True to check every event.
+    """
     if not os.path.exists(file_path):
         print(f"Error: File '{file_path}' does not exist.")
         return False
@@ -41,52 +123,44 @@ def validate_ics_file(file_path):
         print("These properties improve compatibility with modern calendar clients like Outlook.")
     
     # Check for events
-    event_pattern = r"BEGIN:VEVENT(.*?)END:VEVENT"
-    events = re.findall(event_pattern, content, re.DOTALL)
+    events = EVENT_PATTERN.findall(content)
     
     if not events:
         print("Warning: Calendar contains no events.")
         return False
     
+    memory_profile.set_events(len(events))
+    cache_file = cache_file or default_cache_file(file_path)
+    cached = {} if full else load_findings_cache(cache_file)
+    findings_by_hash = {}
+    reused = 0
     errors = 0
     warnings = 0
     
     # Validate each event
     for i, event in enumerate(events):
-        print(f"Checking event {i+1}...")
+        key = event_hash(event)
+        findings = findings_by_hash.get(key)
+        if findings is None:
+            findings = cached.get(key)
+        if findings is None:
+            print(f"Checking event {i+1}...")
+            findings = check_event(event)
+        else:
+            reused += 1
+        findings_by_hash[key] = findings
         
-        # Check for required event properties (RFC 5545)
-        for prop in ["UID", "DTSTAMP", "DTSTART"]:
-            if f"{prop}:" not in event:
-                print(f"Error: Event {i+1} is missing required property '{prop}'.")
+        for level, message in findings:
+            if level == 'error':
+                print(f"Error: Event {i+1} {message}")
                 errors += 1
-        
-        # Check for recommended properties (RFC 5545)
-        for prop in ["SUMMARY", "DESCRIPTION"]:
-            if f"{prop}:" not in event:
-                print(f"Warning: Event {i+1} is missing recommended property '{prop}'.")
+            else:
+                print(f"Warning: Event {i+1} {message}")
                 warnings += 1
-                
-        # Check for RFC 7986/Outlook enhanced properties
-        enhanced_props = ["CATEGORIES", "CREATED", "LAST-MODIFIED", "SEQUENCE", "TRANSP"]
-        missing_enhanced = []
-        for prop in enhanced_props:
-            if f"{prop}:" not in event and f"{prop};" not in event:
-                missing_enhanced.append(prop)
-                
-        if missing_enhanced:
-            print(f"Warning: Event {i+1} missing enhanced properties: {', '.join(missing_enhanced)}")
-            warnings += 1
-        
-        # Check date format (simple check)
-        date_pattern = r"DT\w+:(\d{8}T\d{6}Z)"
-        dates = re.findall(date_pattern, event)
-        for date_str in dates:
-            try:
-                datetime.strptime(date_str, "%Y%m%dT%H%M%SZ")
-            except ValueError:
-                print(f"Error: Event {i+1} has invalid date format '{date_str}'.")
-                errors += 1
+    
+    if reused:
+        print(f"Reused cached results for {reused} unchanged events (use --full to check every event).")
+    save_findings_cache(cache_file, findings_by_hash)
     
     if errors > 0:
         print(f"\nValidation failed with {errors} errors and {warnings} warnings.")
@@ -109,9 +183,17 @@ if __name__ == "__main__":
     parser = argparse.ArgumentParser(description='Validate an ICS calendar file.')
     parser.add_argument('--file', '-f', default=default_ics_path, 
                         help=f'Path to the ICS file (default: {default_ics_path})')
+    parser.add_argument('--full', action='store_true',
+                        help='Check every event instead of only new or changed ones')
+    parser.add_argument('--cache-file', default=None,
+                        help='Sidecar file for cached per-event results (default: under .cache/validation/)')
+    
+    memory_profile.add_argument(parser)
     
     args = parser.parse_args()
+    if args.profile_memory:
+        memory_profile.enable()
     
     print(f"Validating calendar file: {args.file}")
-    success = validate_ics_file(args.file)
+    success = validate_ics_file(args.file, full=args.full, cache_file=args.cache_file)
     sys.exit(0 if success else 1)
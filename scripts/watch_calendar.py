@@ -0,0 +1,263 @@
+#!/usr/bin/env python3
+"""
+Watch Calendar
+
+Long-running watch mode for editing the calendar. Monitors main.ics, the .env
+file and the summary parser config (with inotify if the `inotify_simple`
+package is installed, polling otherwise) and rebuilds the outputs as soon as
+a file is saved:
+- only events that were added or changed (by UID, see calendar_diff.py) are
+  re-enriched with TMDB images
+- the calendar is revalidated
+- the Outlook variant and the HTML preview are regenerated
+
+The TMDB client and its response cache live for the whole session, so
+re-enriching an edited event usually needs no network requests at all.
+Changes to .env or the parser config trigger a full rebuild.
+
+Usage:
+  python watch_calendar.py [--ics-file main.ics] [--outlook-file main_outlook.ics] [--no-preview] [--poll]
+"""
+
+import io
+import os
+import sys
+import time
+import argparse
+import contextlib
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from config import get_tmdb_credentials, get_tmdb_fixture_settings, load_dotenv, reload_dotenv
+from series_parser import reset_default_parser
+from calendar_diff import diff_calendars
+from update_calendar_images import update_calendar_with_images
+from validate_calendar import validate_ics_file
+from optimize_for_outlook import optimize_calendar_for_outlook
+from refresh_calendar import generate_preview
+
+try:
+    from inotify_simple import INotify, flags
+except ImportError:  # inotify_simple is optional; polling works everywhere
+    INotify = None
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Editors often write a file in several steps; wait for them to settle
+DEBOUNCE_SECONDS = 0.05
+POLL_INTERVAL = 0.5
+
+
+class PollingWatcher:
+    """Detects file changes by comparing stat results."""
+
+    def __init__(self, paths, interval=POLL_INTERVAL):
+        self.paths = paths
+        self.interval = interval
+        self._stats = {path: self._stat(path) for path in paths}
+
+    @staticmethod
+    def _stat(path):
+        try:
+            stat = os.stat(path)
+        except OSError:
+            return None
+        return stat.st_mtime_ns, stat.st_size, stat.st_ino
+
+    def wait(self):
+        """Block until at least one path changes. Returns the changed paths."""
+        while True:
+            changed = set()
+            for path in self.paths:
+                stat = self._stat(path)
+                if stat != self._stats[path]:
+                    self._stats[path] = stat
+                    changed.add(path)
+            if changed:
+                return changed
+            time.sleep(self.interval)
+
+
+class InotifyWatcher:
+    """
+    Detects file changes with inotify. The parent directories are watched so
+    files replaced atomically (as output_writer.py and most editors do) are seen.
+    """
+
+    MASK = None if INotify is None else (flags.CLOSE_WRITE | flags.MOVED_TO | flags.CREATE | flags.DELETE)
+
+    def __init__(self, paths):
+        self.inotify = INotify()
+        self.paths = {}
+        self.watches = {}
+        for path in paths:
+            directory, name = os.path.split(os.path.abspath(path))
+            if directory not in self.watches.values():
+                self.watches[self.inotify.add_watch(directory, self.MASK)] = directory
+            self.paths[(directory, name)] = path
+
+    def wait(self):
+        """Block until at least one path changes. Returns the changed paths."""
+        while True:
+            changed = set()
+            for event in self.inotify.read(read_delay=int(DEBOUNCE_SECONDS * 1000)):
+                path = self.paths.get((self.watches.get(event.wd), event.name))
+                if path:
+                    changed.add(path)
+            if changed:
+                return changed
+
+
+def create_watcher(paths, poll=False):
+    if INotify is None or poll:
+        return PollingWatcher(paths)
+    return InotifyWatcher(paths)
+
+
+class IncrementalBuilder:
+    """
+    Rebuilds the calendar outputs, touching only the events that changed
+    since the previous build.
+    """
+
+    def __init__(self, ics_file, outlook_file, preview_file=None, workers=None):
+        self.ics_file = ics_file
+        self.outlook_file = outlook_file
+        self.preview_file = preview_file
+        self.workers = workers
+        self.snapshot = None
+        self.tmdb_api = None
+
+    def connect(self):
+        """(Re)create the TMDB client from the current credentials."""
+        if self.tmdb_api is not None:
+            self.tmdb_api.save_catalog()
+            self.tmdb_api.save_fixtures()
+            self.tmdb_api = None
+
+        from tmdb_api import TMDBApi
+        access_token, api_key = get_tmdb_credentials()
+        mode, fixture_file = get_tmdb_fixture_settings()
+        if mode != 'replay' and not access_token and not api_key:
+            print("⚠️ No TMDB credentials found. Images will not be updated.")
+            return
+        self.tmdb_api = TMDBApi(access_token=access_token, api_key=api_key,
+                                mode=mode, fixture_file=fixture_file)
+
+    def close(self):
+        if self.tmdb_api is not None:
+            self.tmdb_api.save_catalog()
+            self.tmdb_api.save_fixtures()
+
+    def _read(self):
+        with open(self.ics_file, 'r') as f:
+            return f.read()
+
+    def build(self, full=False):
+        """Run the pipeline. Returns False if the calendar failed validation."""
+        started = time.perf_counter()
+        content = self._read()
+
+        if full or self.snapshot is None:
+            uids = None
+            print(f"Full rebuild of {self.ics_file}")
+        else:
+            diff = diff_calendars(self.snapshot, content)
+            if not diff:
+                # Also true for the change notification caused by our own write
+                self.snapshot = content
+                return True
+            uids = diff.changed_uids
+            print(f"{len(diff.added)} added, {len(diff.removed)} removed, {len(diff.modified)} modified")
+
+        if self.tmdb_api is not None and (uids is None or uids):
+            try:
+                kwargs = {'workers': self.workers} if self.workers else {}
+                # Go back to the persistent cache, so its TTLs apply to answers
+                # (404s, missing stills) memoized during earlier builds
+                self.tmdb_api.clear_memo()
+                # A TMDB outage during an earlier build should not skip lookups for good
+                self.tmdb_api.breaker.reset()
+                update_calendar_with_images(self.ics_file, self.tmdb_api, uids=uids, **kwargs)
+                content = self._read()
+            except Exception as e:
+                print(f"⚠️ Error updating images: {e}")
+        self.snapshot = content
+
+        # The validator reports every event; only show its output on failure
+        output = io.StringIO()
+        with contextlib.redirect_stdout(output):
+            valid = validate_ics_file(self.ics_file)
+        if not valid:
+            print(output.getvalue().rstrip())
+            print("⚠️ Calendar validation failed; outputs not regenerated")
+            return False
+
+        if self.outlook_file:
+            optimize_calendar_for_outlook(self.ics_file, self.outlook_file, calendar_name_suffix=' (Outlook)')
+        if self.preview_file:
+            generate_preview(self.ics_file, self.preview_file)
+
+        print(f"✓ Rebuilt in {(time.perf_counter() - started) * 1000:.0f} ms")
+        return True
+
+
+def watch(builder, config_files, poll=False):
+    """Build once, then rebuild on every change until interrupted."""
+    builder.connect()
+    builder.build(full=True)
+
+    watcher = create_watcher([builder.ics_file] + config_files, poll)
+    print(f"Watching {builder.ics_file} for changes "
+          f"({'inotify' if isinstance(watcher, InotifyWatcher) else 'polling'}). Press Ctrl+C to stop.")
+
+    while True:
+        changed = watcher.wait()
+        config_changed = [path for path in changed if path in config_files]
+        if config_changed:
+            print(f"Configuration changed: {', '.join(os.path.basename(path) for path in config_changed)}")
+            reload_dotenv()
+            reset_default_parser()
+            builder.connect()
+
+        if not os.path.isfile(builder.ics_file):
+            continue
+        try:
+            builder.build(full=bool(config_changed))
+        except Exception as e:
+            print(f"⚠️ Rebuild failed: {e}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Watch the calendar and rebuild its outputs on every change.')
+    parser.add_argument('--ics-file', default=os.path.join(ROOT_DIR, 'main.ics'), help='Path to the ICS calendar file')
+    parser.add_argument('--outlook-file', default=os.path.join(ROOT_DIR, 'main_outlook.ics'),
+                        help='Path to the Outlook-optimized output')
+    parser.add_argument('--preview-file', default=os.path.join(ROOT_DIR, 'preview.html'), help='Path to the HTML preview')
+    parser.add_argument('--no-preview', action='store_true', help='Do not regenerate the HTML preview')
+    parser.add_argument('--poll', action='store_true', help='Poll for changes even if inotify is available')
+    parser.add_argument('--workers', type=int, default=None, help='Parallel TMDB lookups')
+
+    args = parser.parse_args()
+
+    if not os.path.isfile(args.ics_file):
+        print(f"Error: Calendar file not found: {args.ics_file}")
+        return 1
+
+    load_dotenv()
+    config_files = [
+        os.path.join(ROOT_DIR, '.env'),
+        os.environ.get('SUMMARY_PARSER_CONFIG', os.path.join(ROOT_DIR, 'summary_parser.json')),
+    ]
+    builder = IncrementalBuilder(args.ics_file, args.outlook_file,
+                                 None if args.no_preview else args.preview_file, args.workers)
+    try:
+        watch(builder, config_files, args.poll)
+    except KeyboardInterrupt:
+        print("\nStopping watch mode")
+    finally:
+        builder.close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,65 @@
+import json
+
+import pytest
+
+from calendar_image_demo import create_demo_calendar, load_manifest, parse_episodes
+
+
+@pytest.mark.parametrize('spec, expected', [
+    (12, [12]),
+    ("1-4", [1, 2, 3, 4]),
+    ("1-3,5", [1, 2, 3, 5]),
+    ([1, "3-5"], [1, 3, 4, 5]),
+])
+def test_parse_episodes(spec, expected):
+    assert parse_episodes(spec) == expected
+
+
+@pytest.mark.parametrize('spec', ["1-x", "a", "-3"])
+def test_parse_episodes_rejects_invalid_ranges(spec):
+    with pytest.raises(ValueError):
+        parse_episodes(spec)
+
+
+def _manifest(tmp_path, shows):
+    path = tmp_path / 'manifest.json'
+    path.write_text(json.dumps({'name': 'Test', 'shows': shows}))
+    return str(path)
+
+
+@pytest.mark.parametrize('shows', [
+    [{"title": "Frieren", "episodes": "1-12"}, {"title": "Frieren", "episodes": "10-20"}],
+    [{"title": "Re:Zero", "season": 2, "episodes": "1-3"}, {"title": "Re Zero", "season": 2, "episodes": 2}],
+    [{"title": "Frieren", "episodes": "1-3,2"}],
+])
+def test_load_manifest_rejects_duplicate_uids(tmp_path, shows):
+    with pytest.raises(ValueError):
+        load_manifest(_manifest(tmp_path, shows))
+
+
+def test_same_title_in_separate_ranges_and_seasons_is_allowed(tmp_path):
+    name, seasons = load_manifest(_manifest(tmp_path, [
+        {"title": "Frieren", "episodes": "1-12"},
+        {"title": "Frieren", "episodes": "13-28", "start": "2024-01-12T15:00:00Z"},
+        {"title": "Frieren", "season": 2, "episodes": "1-12"},
+    ]))
+    assert name == 'Test'
+    assert [len(season.episodes) for season in seasons] == [12, 16, 12]
+
+
+def test_create_demo_calendar_without_images(tmp_path):
+    manifest = _manifest(tmp_path, [
+        {"title": "One Piece", "episodes": "1-500", "start": "2005-01-09T01:30:00Z"},
+        {"title": "Frieren", "episodes": [1, "3-4"], "start": "2023-09-29T15:00:00+09:00",
+         "interval_days": 7, "duration_minutes": 24},
+    ])
+    output = tmp_path / 'demo.ics'
+    assert create_demo_calendar(None, str(output), manifest) == (503, 0)
+
+    content = output.read_bytes().decode('utf-8')
+    uids = [line for line in content.splitlines() if line.startswith('UID:')]
+    assert len(uids) == len(set(uids)) == 503
+    assert 'UID:Frieren-S1E3@anime-calendar-demo' in content
+    # Episode 3 airs two weeks after episode 1, in UTC
+    assert 'DTSTART:20231013T060000Z\r\nDTEND:20231013T062400Z' in content
+    assert max(len(line.encode('utf-8')) for line in content.splitlines()) <= 75
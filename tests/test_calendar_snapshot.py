@@ -0,0 +1,78 @@
+import os
+
+import icalendar
+import pytest
+
+import calendar_snapshot
+from calendar_snapshot import load_calendar
+
+CALENDAR = (
+    "BEGIN:VCALENDAR\nVERSION:2.0\nPRODID:-//Test//EN\n"
+    "BEGIN:VEVENT\nUID:a\nSUMMARY:Show - Episode 1\nDTSTART:20250524T130000Z\nEND:VEVENT\n"
+    "END:VCALENDAR\n"
+)
+
+
+@pytest.fixture
+def ics_file(tmp_path, monkeypatch):
+    monkeypatch.setattr(calendar_snapshot, 'snapshot_path', lambda source: str(tmp_path / 'snapshot.pickle'))
+    path = tmp_path / 'calendar.ics'
+    path.write_text(CALENDAR)
+    return str(path)
+
+
+@pytest.fixture
+def parses(monkeypatch):
+    """Count icalendar parses."""
+    calls = []
+    original = icalendar.Calendar.from_ical
+
+    def from_ical(content, *args, **kwargs):
+        calls.append(content)
+        return original(content, *args, **kwargs)
+
+    monkeypatch.setattr(icalendar.Calendar, 'from_ical', from_ical)
+    return calls
+
+
+def _summaries(cal):
+    return [str(event['SUMMARY']) for event in cal.walk('VEVENT')]
+
+
+def test_unchanged_file_is_loaded_from_snapshot(ics_file, parses):
+    _, first = load_calendar(ics_file)
+    content, second = load_calendar(ics_file)
+    assert len(parses) == 1
+    assert content == CALENDAR
+    assert _summaries(second) == _summaries(first) == ['Show - Episode 1']
+
+
+def test_edited_file_is_parsed_again(ics_file, parses):
+    load_calendar(ics_file)
+    with open(ics_file, 'w') as f:
+        f.write(CALENDAR.replace('Episode 1', 'Episode 2'))
+    _, cal = load_calendar(ics_file)
+    assert len(parses) == 2
+    assert _summaries(cal) == ['Show - Episode 2']
+
+
+def test_touched_file_reuses_snapshot_by_hash(ics_file, parses):
+    load_calendar(ics_file)
+    os.utime(ics_file, ns=(0, 0))
+    load_calendar(ics_file)
+    assert len(parses) == 1
+
+
+def shout(content):
+    return content.replace('Show', 'SHOW')
+
+
+def test_prepared_content_has_its_own_snapshot(ics_file, parses):
+    load_calendar(ics_file)
+    content, cal = load_calendar(ics_file, prepare=shout)
+    assert len(parses) == 2
+    assert 'SHOW - Episode 1' in content
+    assert _summaries(cal) == ['SHOW - Episode 1']
+    _, cal = load_calendar(ics_file, prepare=shout)
+    assert len(parses) == 2
+    assert _summaries(cal) == ['SHOW - Episode 1']
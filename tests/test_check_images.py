@@ -0,0 +1,88 @@
+import http.server
+import threading
+
+import pytest
+
+from check_images import ALIVE, DEAD, UNKNOWN, ImageChecker, collect_image_urls, open_liveness_cache
+
+STATUSES = {'/alive.jpg': 200, '/gone.jpg': 404, '/removed.jpg': 410, '/forbidden.jpg': 403, '/error.jpg': 503}
+
+
+class StubHandler(http.server.BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def do_HEAD(self):
+        self.send_response(STATUSES.get(self.path, 404))
+        self.send_header('Content-Length', '0')
+        self.end_headers()
+
+    def log_message(self, format, *args):
+        pass
+
+
+@pytest.fixture
+def base_url():
+    server = http.server.ThreadingHTTPServer(('127.0.0.1', 0), StubHandler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    host, port = server.server_address[:2]
+    yield f"http://{host}:{port}"
+    server.shutdown()
+    server.server_close()
+
+
+@pytest.fixture
+def cache(tmp_path):
+    cache = open_liveness_cache(str(tmp_path / 'liveness.db'))
+    yield cache
+    cache.close()
+
+
+def test_collect_image_urls_maps_urls_to_uids():
+    content = (
+        "BEGIN:VCALENDAR\n"
+        "BEGIN:VEVENT\nUID:a\nIMAGE;VALUE=URI:https://example.com/1.jpg\nEND:VEVENT\n"
+        "BEGIN:VEVENT\nUID:b\nIMAGE;DISPLAY=\"A:B\";VALUE=URI:https://example.com/1.jpg\nEND:VEVENT\n"
+        "END:VCALENDAR\n"
+    )
+    assert collect_image_urls(content) == {'https://example.com/1.jpg': ['a', 'b']}
+
+
+def test_check_all_against_stub_server(base_url, cache):
+    checker = ImageChecker(cache, rate=0, workers=4)
+    try:
+        results = checker.check_all(base_url + path for path in STATUSES)
+    finally:
+        checker.close()
+    assert results == {
+        base_url + '/alive.jpg': ALIVE,
+        base_url + '/gone.jpg': DEAD,
+        base_url + '/removed.jpg': DEAD,
+        base_url + '/forbidden.jpg': UNKNOWN,
+        base_url + '/error.jpg': UNKNOWN,
+    }
+
+
+def test_only_definite_answers_are_cached(base_url, cache):
+    checker = ImageChecker(cache, rate=0, workers=4)
+    try:
+        checker.check_all(base_url + path for path in STATUSES)
+    finally:
+        checker.close()
+    assert cache.get(base_url + '/alive.jpg') == (200, None)
+    assert cache.get(base_url + '/gone.jpg') == (404, None)
+    assert cache.get(base_url + '/removed.jpg') == (410, None)
+    assert cache.get(base_url + '/forbidden.jpg') is None
+    assert cache.get(base_url + '/error.jpg') is None
+
+
+def test_dead_images_use_the_dead_ttl(base_url, cache):
+    checker = ImageChecker(cache, rate=0, workers=1)
+    try:
+        checker.check(base_url + '/removed.jpg')
+        checker.check(base_url + '/alive.jpg')
+    finally:
+        checker.close()
+    cache.negative_ttl = -1
+    assert cache.get(base_url + '/removed.jpg') is None
+    assert cache.get(base_url + '/alive.jpg') == (200, None)
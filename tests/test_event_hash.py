@@ -0,0 +1,41 @@
+from event_hash import get_event_property, set_event_property, unfold
+from ics_writer import fold_line
+from optimize_for_outlook import optimize_event_images
+
+LONG_URL = 'https://image.tmdb.org/t/p/original/' + 'a' * 80 + '.jpg'
+
+EVENT = (
+    "BEGIN:VEVENT\r\n"
+    "UID:show-s1e1\r\n"
+    "SUMMARY:Show S1 - Episode 1\r\n"
+    + fold_line("IMAGE;DISPLAY=THUMBNAIL;FMTTYPE=image/jpeg;VALUE=URI:"
+                "https://image.tmdb.org/t/p/original/still.jpg")
+    + fold_line("IMAGE;DISPLAY=FULLSIZE;VALUE=URI:https://image.tmdb.org/t/p/original/poster.jpg")
+    + "END:VEVENT\r\n"
+)
+
+
+def _max_octets(text):
+    return max(len(line.encode('utf-8')) for line in text.splitlines())
+
+
+def test_set_event_property_folds_long_values():
+    event = set_event_property(EVENT, 'IMAGE', LONG_URL)
+    assert _max_octets(event) <= 75
+    assert get_event_property(event, 'IMAGE') == LONG_URL
+
+
+def test_set_event_property_appends_missing_property():
+    event = set_event_property(EVENT, 'SEQUENCE', '2')
+    assert get_event_property(event, 'SEQUENCE') == '2'
+    assert event.endswith("SEQUENCE:2\r\nEND:VEVENT\r\n")
+
+
+def test_optimize_event_images_keeps_one_folded_badge():
+    event, has_image = optimize_event_images(EVENT)
+    assert has_image
+    assert _max_octets(event) <= 75
+    images = [line for line in unfold(event).splitlines() if line.startswith('IMAGE')]
+    assert len(images) == 1
+    assert 'DISPLAY=BADGE' in images[0]
+    assert images[0].endswith('/w92/still.jpg')
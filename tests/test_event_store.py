@@ -0,0 +1,94 @@
+import sys
+
+import pytest
+
+import event_store
+from event_store import EventStore
+
+
+def _event(uid, summary, dtstart):
+    return (f"BEGIN:VEVENT\r\nUID:{uid}\r\nSUMMARY:{summary}\r\n"
+            f"DTSTART:{dtstart}\r\nDTEND:{dtstart}\r\nEND:VEVENT")
+
+
+EVENTS = [
+    _event('apothecary-s2e1', 'The Apothecary Diaries S2 - Episode 1', '20250110T150000Z'),
+    _event('apothecary-s2e2', 'The Apothecary Diaries S2 - Episode 2', '20250117T150000Z'),
+    _event('shiunji-s1e1', 'The Shiunji Family Children S1 - Episode 1', '20250408T140000Z'),
+]
+
+
+def _calendar(events):
+    return "BEGIN:VCALENDAR\r\nVERSION:2.0\r\n" + "\r\n".join(events) + "\r\nEND:VCALENDAR\r\n"
+
+
+@pytest.fixture
+def store(tmp_path):
+    with EventStore(str(tmp_path / 'store.db')) as store:
+        yield store
+
+
+def test_import_then_export_round_trips(store):
+    content = _calendar(EVENTS)
+    assert store.import_calendar(content) == (3, 0, 0, [])
+    assert store.render_calendar() == content
+
+
+def test_sync_only_writes_changes(store):
+    store.import_calendar(_calendar(EVENTS))
+    changed = EVENTS[1].replace('Episode 2', 'Episode 2 (delayed)')
+    content = _calendar([EVENTS[2], changed])
+
+    assert store.import_calendar(content) == (0, 1, 1, [])
+    assert store.render_calendar() == content
+    assert store.import_calendar(content) == (0, 0, 0, [])
+
+
+def test_import_reports_duplicate_uids(store):
+    duplicate = EVENTS[0].replace('Episode 1', 'Episode 1 (repeat)')
+    added, updated, removed, duplicates = store.import_calendar(_calendar(EVENTS + [duplicate]))
+
+    assert (added, updated, removed) == (3, 0, 0)
+    assert duplicates == ['apothecary-s2e1']
+    assert store.render_calendar() == _calendar(EVENTS)
+
+
+def test_filtered_export(store):
+    store.import_calendar(_calendar(EVENTS))
+    assert store.render_calendar(show='The Apothecary Diaries') == _calendar(EVENTS[:2])
+    assert store.render_calendar(start='20250401T000000Z') == _calendar(EVENTS[2:])
+
+
+def _run(monkeypatch, *args):
+    monkeypatch.setattr(sys, 'argv', ['event_store.py', *args])
+    return event_store.main()
+
+
+def test_filtered_export_requires_output(tmp_path, monkeypatch):
+    with pytest.raises(SystemExit):
+        _run(monkeypatch, 'export', '--db', str(tmp_path / 'store.db'), '--show', 'The Apothecary Diaries')
+
+
+def test_filtered_export_never_overwrites_the_imported_calendar(tmp_path, monkeypatch):
+    ics_file = tmp_path / 'main.ics'
+    ics_file.write_bytes(_calendar(EVENTS).encode('utf-8'))
+    db = str(tmp_path / 'store.db')
+    assert _run(monkeypatch, 'import', '--db', db, '--ics-file', str(ics_file)) == 0
+
+    assert _run(monkeypatch, 'export', '--db', db, '--output', str(ics_file), '--from', '20250401') == 1
+    assert ics_file.read_bytes() == _calendar(EVENTS).encode('utf-8')
+
+    partial = tmp_path / 'spring.ics'
+    assert _run(monkeypatch, 'export', '--db', db, '--output', str(partial), '--from', '20250401') == 0
+    assert partial.read_bytes() == _calendar(EVENTS[2:]).encode('utf-8')
+
+
+def test_set_episode_image_writes_outlook_compatible_property(store):
+    from optimize_for_outlook import optimize_event_images
+
+    store.import_calendar(_calendar(EVENTS))
+    store.set_episode_image('shiunji-s1e1', 'https://image.tmdb.org/t/p/original/still.jpg')
+
+    row = store.query_episodes(show='The Shiunji Family Children')[0]
+    assert row['image_url'] == 'https://image.tmdb.org/t/p/original/still.jpg'
+    assert optimize_event_images(row['raw'])[1]
@@ -0,0 +1,80 @@
+import json
+
+import pytest
+
+from event_hash import get_event_property
+from feed_fanout import MasterCalendar, fanout_calendar, load_subscribers, route_events
+
+
+def _event(uid, summary, categories='Anime'):
+    return (f"BEGIN:VEVENT\nUID:{uid}\nSUMMARY:{summary}\nCATEGORIES:{categories}\n"
+            f"IMAGE;DISPLAY=THUMBNAIL;FMTTYPE=image/jpeg;VALUE=URI:https://image.tmdb.org/t/p/original/{uid}.jpg\n"
+            f"END:VEVENT")
+
+
+EVENTS = [
+    _event('apothecary-s2e1', 'The Apothecary Diaries S2 - Episode 1'),
+    _event('shiunji-s1e1', 'The Shiunji Family Children S1 - Episode 1', 'Anime,Romance'),
+    _event('news-1', 'Weekly News', 'News'),
+]
+
+
+def _calendar(events):
+    return "BEGIN:VCALENDAR\nVERSION:2.0\nX-WR-CALNAME:My Anime Schedule\n" + "\n".join(events) + "\nEND:VCALENDAR\n"
+
+
+def _write_subscriptions(tmp_path, subscribers):
+    path = tmp_path / 'subscriptions.json'
+    path.write_text(json.dumps({'subscribers': subscribers}))
+    return str(path)
+
+
+def _feed_events(path):
+    return MasterCalendar(path.read_text()).events
+
+
+def test_route_events(tmp_path):
+    subscriptions = _write_subscriptions(tmp_path, {
+        'alice': {'shows': ['the apothecary diaries']},
+        'bob': {'categories': ['romance'], 'shows': ['The Shiunji Family Children']},
+        'carol': {},
+    })
+    subscribers = load_subscribers(subscriptions, str(tmp_path))
+
+    assert route_events(MasterCalendar(_calendar(EVENTS)), subscribers) == [[0], [1], [0, 1, 2]]
+
+
+@pytest.mark.parametrize('subscribers', [
+    {'a b': {}, 'a_b': {}},
+    {'alice': {'output': 'shared.ics'}, 'bob': {'output': 'shared.ics'}},
+])
+def test_duplicate_outputs_are_rejected(tmp_path, subscribers):
+    with pytest.raises(ValueError):
+        load_subscribers(_write_subscriptions(tmp_path, subscribers), str(tmp_path))
+
+
+def test_outlook_sequence_only_bumps_changed_events(tmp_path):
+    ics_file = tmp_path / 'main.ics'
+    ics_file.write_text(_calendar(EVENTS))
+    subscriptions = _write_subscriptions(tmp_path, {
+        'alice': {'categories': ['anime'], 'client': 'outlook'},
+        'bob': {'categories': ['anime']},
+    })
+    output_dir = tmp_path / 'feeds'
+
+    results = fanout_calendar(str(ics_file), subscriptions, str(output_dir), workers=1)
+    assert results == [('alice', 2, True), ('bob', 2, True)]
+    outlook = (output_dir / 'alice.ics').read_text()
+    assert 'X-WR-CALNAME:My Anime Schedule (Outlook)' in outlook
+    assert 'DISPLAY=BADGE' in outlook and '/w92/' in outlook
+    assert 'SEQUENCE' not in (output_dir / 'bob.ics').read_text()
+
+    # Unchanged master: nothing is rewritten
+    assert fanout_calendar(str(ics_file), subscriptions, str(output_dir), workers=1) == [
+        ('alice', 2, False), ('bob', 2, False)]
+
+    ics_file.write_text(_calendar([EVENTS[0].replace('Episode 1', 'Episode 1 (delayed)')] + EVENTS[1:]))
+    fanout_calendar(str(ics_file), subscriptions, str(output_dir), workers=1)
+    sequences = {get_event_property(event, 'UID'): get_event_property(event, 'SEQUENCE')
+                 for event in _feed_events(output_dir / 'alice.ics')}
+    assert sequences == {'apothecary-s2e1': '1', 'shiunji-s1e1': '0'}
@@ -0,0 +1,119 @@
+import gzip
+import http.client
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from email.utils import formatdate
+
+import pytest
+
+from feed_server import FeedServer, feed_max_age
+
+CALENDAR = (
+    "BEGIN:VCALENDAR\r\n"
+    "VERSION:2.0\r\n"
+    "X-PUBLISHED-TTL:PT12H\r\n"
+    + "".join(f"BEGIN:VEVENT\r\nUID:show-s1e{n}\r\nSUMMARY:Show S1 - Episode {n}\r\nEND:VEVENT\r\n"
+              for n in range(1, 50))
+    + "END:VCALENDAR\r\n"
+).encode('utf-8')
+
+
+@pytest.fixture
+def feed_file(tmp_path):
+    path = tmp_path / 'main.ics'
+    path.write_bytes(CALENDAR)
+    os.utime(path, (1_700_000_000, 1_700_000_000))
+    return path
+
+
+@pytest.fixture
+def server(feed_file):
+    server = FeedServer(('127.0.0.1', 0), [str(feed_file)], quiet=True)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+def _get(server, path='/main.ics', **headers):
+    host, port = server.server_address[:2]
+    connection = http.client.HTTPConnection(host, port, timeout=10)
+    try:
+        connection.request('GET', path, headers={name.replace('_', '-'): value for name, value in headers.items()})
+        response = connection.getresponse()
+        return response.status, dict(response.getheaders()), response.read()
+    finally:
+        connection.close()
+
+
+def test_get_then_not_modified(server):
+    status, headers, body = _get(server)
+    assert status == 200
+    assert body == CALENDAR
+    assert headers['Cache-Control'] == 'public, max-age=43200'
+
+    status, revalidated, body = _get(server, If_None_Match=headers['ETag'])
+    assert status == 304
+    assert body == b''
+    assert revalidated['ETag'] == headers['ETag']
+
+
+def test_if_modified_since(server):
+    assert _get(server, If_Modified_Since=formatdate(1_700_000_000, usegmt=True))[0] == 304
+    assert _get(server, If_Modified_Since=formatdate(1_600_000_000, usegmt=True))[0] == 200
+
+
+def test_encoding_negotiation(server):
+    status, identity_headers, body = _get(server, Accept_Encoding='identity')
+    assert status == 200
+    assert 'Content-Encoding' not in identity_headers
+    assert body == CALENDAR
+
+    status, gzip_headers, body = _get(server, Accept_Encoding='gzip;q=1.0, br;q=0')
+    assert status == 200
+    assert gzip_headers['Content-Encoding'] == 'gzip'
+    assert gzip.decompress(body) == CALENDAR
+    assert gzip_headers['Vary'] == 'Accept-Encoding'
+
+    # Each representation has its own strong ETag
+    assert gzip_headers['ETag'] != identity_headers['ETag']
+
+
+def test_changed_feed_gets_new_etag(server, feed_file):
+    etag = _get(server)[1]['ETag']
+
+    feed_file.write_bytes(CALENDAR.replace(b'Episode 1\r\n', b'Episode 1 (delayed)\r\n'))
+    os.utime(feed_file, (1_700_000_100, 1_700_000_100))
+
+    status, headers, body = _get(server, If_None_Match=etag)
+    assert status == 200
+    assert headers['ETag'] != etag
+    assert b'Episode 1 (delayed)' in body
+
+
+def test_unknown_feed_is_not_found(server):
+    assert _get(server, '/other.ics')[0] == 404
+
+
+def test_concurrent_clients(server):
+    etag = _get(server)[1]['ETag']
+
+    def poll(n):
+        if n % 2:
+            return _get(server, If_None_Match=etag)[0], None
+        status, _, body = _get(server, Accept_Encoding='gzip')
+        return status, gzip.decompress(body)
+
+    with ThreadPoolExecutor(max_workers=16) as executor:
+        results = list(executor.map(poll, range(64)))
+
+    for n, (status, body) in enumerate(results):
+        assert status == (304 if n % 2 else 200)
+        if body is not None:
+            assert body == CALENDAR
+
+
+def test_feed_max_age_falls_back_to_refresh_interval():
+    assert feed_max_age(b"BEGIN:VCALENDAR\r\nREFRESH-INTERVAL;VALUE=DURATION:P1D\r\nEND:VCALENDAR\r\n") == 86400
@@ -0,0 +1,41 @@
+import pytest
+
+from ics_writer import MAX_LINE_OCTETS, detect_newline, fold_line
+
+
+def _unfold(folded, newline='\r\n'):
+    return folded[:-len(newline)].replace(f"{newline} ", '')
+
+
+@pytest.mark.parametrize('line', [
+    'SUMMARY:Short',
+    'X:' + 'a' * (MAX_LINE_OCTETS - 2),
+    'DESCRIPTION:' + 'a' * 300,
+    'SUMMARY:' + '進撃の巨人 ' * 40,
+    'SUMMARY:' + 'é' * 100,
+    'SUMMARY:' + '🎬' * 60,
+])
+def test_fold_line_limits_octets_and_round_trips(line):
+    folded = fold_line(line)
+    assert folded.endswith('\r\n')
+    for chunk in folded[:-2].split('\r\n'):
+        # encode() would fail on a chunk split inside a UTF-8 sequence
+        assert len(chunk.encode('utf-8')) <= MAX_LINE_OCTETS
+    assert _unfold(folded) == line
+
+
+def test_fold_line_keeps_short_lines_intact():
+    line = 'X:' + 'a' * (MAX_LINE_OCTETS - 2)
+    assert fold_line(line) == line + '\r\n'
+    assert fold_line(line + 'b').count('\r\n ') == 1
+
+
+def test_fold_line_uses_given_newline():
+    folded = fold_line('DESCRIPTION:' + 'a' * 200, '\n')
+    assert '\r' not in folded
+    assert _unfold(folded, '\n') == 'DESCRIPTION:' + 'a' * 200
+
+
+def test_detect_newline():
+    assert detect_newline('BEGIN:VCALENDAR\r\nEND:VCALENDAR\r\n') == '\r\n'
+    assert detect_newline('BEGIN:VCALENDAR\nEND:VCALENDAR\n') == '\n'
@@ -0,0 +1,81 @@
+import re
+
+from final_cleanup import cleanup_calendar
+from refresh_calendar import update_last_modified
+
+OLD_STAMP = '20240101T000000Z'
+
+CALENDAR = (
+    "BEGIN:VCALENDAR\n"
+    "VERSION:2.0\n"
+    "LAST-MODIFIED:20250519T170000Z\n"
+    "BEGIN:VEVENT\n"
+    "UID:show-s1e1\n"
+    "SUMMARY:Show S1 - Episode 1\n"
+    "END:VEVENT\n"
+    "BEGIN:VEVENT\n"
+    "UID:show-s1e2\n"
+    "SUMMARY:Show S1 - Episode 2\n"
+    "END:VEVENT\n"
+    "END:VCALENDAR\n"
+)
+
+
+def _pipeline(path):
+    # The order update_calendar.sh runs them in
+    cleanup_calendar(str(path))
+    update_last_modified(str(path))
+
+
+def _stamps(content):
+    return re.findall(r'^LAST-MODIFIED:(\d{8}T\d{6}Z)$', content, re.MULTILINE)
+
+
+def test_unchanged_events_keep_their_last_modified(tmp_path):
+    path = tmp_path / 'main.ics'
+    path.write_text(CALENDAR)
+    _pipeline(path)
+
+    # Pretend the events were last changed long ago
+    content = path.read_text()
+    header, events = content.split('BEGIN:VEVENT', 1)
+    events = re.sub(r'^LAST-MODIFIED:\d{8}T\d{6}Z$', f'LAST-MODIFIED:{OLD_STAMP}', events, flags=re.MULTILINE)
+    path.write_text(header + 'BEGIN:VEVENT' + events)
+    before = path.read_text()
+
+    _pipeline(path)
+    _pipeline(path)
+
+    assert path.read_text() == before
+    assert _stamps(before)[1:] == [OLD_STAMP, OLD_STAMP]
+
+
+def test_changed_event_bumps_only_itself_and_the_header(tmp_path):
+    path = tmp_path / 'main.ics'
+    path.write_text(CALENDAR)
+    _pipeline(path)
+    content = path.read_text()
+    header, events = content.split('BEGIN:VEVENT', 1)
+    events = re.sub(r'^LAST-MODIFIED:\d{8}T\d{6}Z$', f'LAST-MODIFIED:{OLD_STAMP}', events, flags=re.MULTILINE)
+    header = re.sub(r'^LAST-MODIFIED:\d{8}T\d{6}Z$', f'LAST-MODIFIED:{OLD_STAMP}', header, flags=re.MULTILINE)
+    path.write_text((header + 'BEGIN:VEVENT' + events).replace('Episode 2', 'Episode 2 (delayed)'))
+
+    _pipeline(path)
+
+    header_stamp, first, second = _stamps(path.read_text())
+    assert first == OLD_STAMP
+    assert second > OLD_STAMP
+    assert header_stamp >= second
+
+
+def test_header_timestamp_keeps_its_property_name(tmp_path):
+    path = tmp_path / 'main.ics'
+    path.write_text(CALENDAR.replace('UID:show-s1e1\n', 'UID:show-s1e1\nLAST-MODIFIED:20260101T000000Z\n'))
+
+    update_last_modified(str(path))
+
+    content = path.read_text()
+    assert not re.search(r'^P\d+T\d+Z$', content, re.MULTILINE)
+    header_stamp, event_stamp = _stamps(content)
+    assert header_stamp > '20260101T000000Z'
+    assert event_stamp == '20260101T000000Z'
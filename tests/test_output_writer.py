@@ -0,0 +1,71 @@
+import os
+
+from output_writer import AtomicWriter, content_digest, write_if_changed
+
+CALENDAR = (
+    "BEGIN:VCALENDAR\r\n"
+    "BEGIN:VEVENT\r\n"
+    "UID:show-s1e1\r\n"
+    "DTSTAMP:20250101T000000Z\r\n"
+    "SUMMARY:Show S1 - Episode 1\r\n"
+    "END:VEVENT\r\n"
+    "END:VCALENDAR\r\n"
+)
+
+
+def _leftover_temp_files(directory):
+    return [name for name in os.listdir(directory) if name.endswith('.tmp')]
+
+
+def test_unchanged_content_is_not_rewritten(tmp_path):
+    path = tmp_path / 'main.ics'
+    assert write_if_changed(path, CALENDAR, ignore_volatile=False)
+    os.utime(path, (0, 0))
+
+    writer = AtomicWriter(path, ignore_volatile=False)
+    with writer as f:
+        f.write(CALENDAR)
+
+    assert not writer.changed
+    assert os.stat(path).st_mtime == 0
+    assert not _leftover_temp_files(tmp_path)
+
+
+def test_changed_content_replaces_file(tmp_path):
+    path = tmp_path / 'main.ics'
+    write_if_changed(path, CALENDAR, ignore_volatile=False)
+    updated = CALENDAR.replace('Episode 1', 'Episode 2')
+
+    assert write_if_changed(path, updated, ignore_volatile=False)
+    assert path.read_bytes() == updated.encode('utf-8')
+    assert not _leftover_temp_files(tmp_path)
+
+
+def test_volatile_stamps_can_be_ignored(tmp_path):
+    path = tmp_path / 'main.ics'
+    write_if_changed(path, CALENDAR, ignore_volatile=True)
+    restamped = CALENDAR.replace('20250101T000000Z', '20250202T000000Z')
+
+    assert not write_if_changed(path, restamped, ignore_volatile=True)
+    assert write_if_changed(path, restamped, ignore_volatile=False)
+
+
+def test_content_digest_skips_folded_volatile_lines():
+    folded = CALENDAR.replace('DTSTAMP:20250101T000000Z\r\n', 'DTSTAMP:2025\r\n 0101T000000Z\r\n')
+    assert content_digest(folded, ignore_volatile=True) == content_digest(CALENDAR, ignore_volatile=True)
+    assert content_digest(folded) != content_digest(CALENDAR)
+
+
+def test_failed_write_leaves_target_alone(tmp_path):
+    path = tmp_path / 'main.ics'
+    write_if_changed(path, CALENDAR, ignore_volatile=False)
+
+    try:
+        with AtomicWriter(path, ignore_volatile=False) as f:
+            f.write('BEGIN:VCALENDAR\r\n')
+            raise RuntimeError('render failed')
+    except RuntimeError:
+        pass
+
+    assert path.read_bytes() == CALENDAR.encode('utf-8')
+    assert not _leftover_temp_files(tmp_path)
@@ -0,0 +1,73 @@
+from datetime import datetime, timedelta
+
+from event_hash import unfold
+from ics_writer import fold_line
+from rrule_compact import INSTANCE_UID_TEMPLATE, INSTANCE_UIDS, compact_calendar, expand_calendar, is_compacted
+
+START = datetime(2025, 4, 5, 15, 30)
+
+
+def _event(uid, episode, start, description=None):
+    return "".join(fold_line(line) for line in [
+        "BEGIN:VEVENT",
+        f"UID:{uid}",
+        f"DTSTART:{start:%Y%m%dT%H%M%SZ}",
+        f"DTEND:{start + timedelta(minutes=24):%Y%m%dT%H%M%SZ}",
+        f"SUMMARY:The Apothecary Diaries S2 - Episode {episode}",
+        f"DESCRIPTION:{description or f'Episode {episode} of a long-running series. ' * 3}",
+        "END:VEVENT",
+    ])[:-2]
+
+
+def _calendar(events):
+    return "BEGIN:VCALENDAR\r\nVERSION:2.0\r\n" + "\r\n".join(events) + "\r\nEND:VCALENDAR\r\n"
+
+
+def _events(content):
+    return sorted(block for block in unfold(content).split("BEGIN:VEVENT")[1:])
+
+
+def _weekly(uid, skip=()):
+    return [
+        _event(uid(episode), episode, START + timedelta(weeks=week))
+        for week, episode in enumerate(range(1, 13)) if week not in skip
+    ]
+
+
+def test_round_trip_with_derived_uids():
+    content = _calendar(_weekly(lambda episode: f"apothecary-s2e{episode}@example.com"))
+    compacted, runs, replaced = compact_calendar(content)
+    assert (runs, replaced) == (1, 12)
+    assert is_compacted(compacted)
+    assert f"\r\n{INSTANCE_UID_TEMPLATE}:apothecary-s2e{{episode}}@example.com\r\n" in compacted
+    assert INSTANCE_UIDS not in compacted
+
+    expanded, masters = expand_calendar(compacted)
+    assert masters == 1
+    assert _events(expanded) == _events(content)
+
+
+def test_round_trip_with_unrelated_uids_and_skipped_week():
+    uids = {episode: f"20250519T1315{episode:02d}Z-{100 - episode}@example.com" for episode in range(1, 13)}
+    events = _weekly(uids.get)
+    # A one-week break moves the later episodes back by a week
+    events = events[:5] + [event.replace(f"{START + timedelta(weeks=week):%Y%m%d}",
+                                         f"{START + timedelta(weeks=week + 1):%Y%m%d}")
+                           for week, event in enumerate(events[5:], 5)]
+    content = _calendar(events)
+    compacted, runs, _ = compact_calendar(content)
+    assert runs == 1
+    assert f"\r\n{INSTANCE_UIDS}:" in compacted
+    assert "EXDATE:" in compacted
+
+    expanded, _ = expand_calendar(compacted)
+    assert _events(expanded) == _events(content)
+
+
+def test_output_lines_are_folded():
+    content = _calendar(_weekly(lambda episode: f"{'long-uid-' * 10}{episode * 7919}@example.com"))
+    compacted, runs, _ = compact_calendar(content)
+    assert runs == 1
+    expanded, _ = expand_calendar(compacted)
+    for text in (compacted, expanded):
+        assert max(len(line.encode('utf-8')) for line in text.splitlines()) <= 75
@@ -0,0 +1,44 @@
+import random
+
+import pytest
+
+from series_parser import NO_MATCH, SERIES_PATTERN, SummaryParser
+
+
+def reference_parse(summary):
+    """The full-pattern search the parser's fast path must agree with."""
+    match = SERIES_PATTERN.search(summary)
+    if not match:
+        return NO_MATCH
+    return match.group(1).strip(), int(match.group(2) or match.group(3) or 1), int(match.group(4))
+
+
+@pytest.mark.parametrize('summary, expected', [
+    ("The Apothecary Diaries S2 - Episode 31", ("The Apothecary Diaries", 2, 31)),
+    ("Demon Slayer Season 3 - Episode 1", ("Demon Slayer", 3, 1)),
+    ("The Shiunji Family Children - Episode 7", ("The Shiunji Family Children", 1, 7)),
+    ("FooS2 - Episode 3", ("Foo", 2, 3)),
+    ("Title.S2 - Episode 4", ("Title.", 2, 4)),
+    ("Kaiju No. 8 s1 -Episode 12", ("Kaiju No. 8", 1, 12)),
+    ("Special Broadcast", NO_MATCH),
+])
+def test_parse_examples(summary, expected):
+    assert SummaryParser().parse(summary) == expected
+
+
+def test_matches_full_pattern_on_random_summaries():
+    rng = random.Random(20250519)
+    pieces = ['Foo', 'Re:Zero', ' ', ' ', '-', '.', 'S', 's', '2', '12', 'Season', 'season ', 'Episode', ' Episode ']
+    parser = SummaryParser(cache_size=0)
+    for _ in range(20000):
+        summary = ''.join(rng.choice(pieces) for _ in range(rng.randint(1, 10)))
+        assert parser.parse(summary) == reference_parse(summary), summary
+
+
+def test_aliases_and_custom_patterns():
+    parser = SummaryParser(aliases={'Kusuriya no Hitorigoto': 'The Apothecary Diaries'},
+                           patterns=[r'^(?P<series>.+?) #(?P<episode>\d+)$'])
+    assert parser.parse('Kusuriya no Hitorigoto S2 - Episode 3') == ('The Apothecary Diaries', 2, 3)
+    assert parser.parse('Frieren #5') == ('Frieren', 1, 5)
+    with pytest.raises(ValueError):
+        parser.register_pattern(r'(?P<series>.+)')
@@ -0,0 +1,52 @@
+from show_catalog import ShowCatalog, normalize_title
+
+APOTHECARY = {'id': 1, 'name': 'The Apothecary Diaries', 'original_name': '薬屋のひとりごと',
+              'popularity': 80.0, 'genre_ids': [16], 'first_air_date': '2023-10-22'}
+
+
+def test_normalize_title_keeps_cjk():
+    assert normalize_title('Re:Zero - Starting Life!') == 're zero starting life'
+    assert normalize_title('進撃の巨人') == '進撃の巨人'
+
+
+def test_lookup_matches_close_titles():
+    catalog = ShowCatalog()
+    catalog.add(APOTHECARY)
+    assert catalog.lookup('The Apothecary Diaries')['id'] == 1
+    assert catalog.lookup('Apothecary Diaries')['id'] == 1
+    assert catalog.lookup('Demon Slayer') is None
+
+
+def test_add_invalidates_memoized_lookups():
+    catalog = ShowCatalog()
+    assert catalog.lookup('Demon Slayer') is None
+    catalog.add({'id': 2, 'name': 'Demon Slayer', 'genre_ids': [16]})
+    assert catalog.lookup('Demon Slayer')['id'] == 2
+
+
+def test_catalogs_do_not_share_lookups():
+    first, second = ShowCatalog(), ShowCatalog()
+    first.add(APOTHECARY)
+    assert first.lookup('The Apothecary Diaries')['id'] == 1
+    assert second.lookup('The Apothecary Diaries') is None
+
+
+def test_shows_without_genres_rank_below_known_anime():
+    catalog = ShowCatalog()
+    # As imported from a TMDB ID export: no genres, but popular
+    catalog.add({'id': 3, 'original_name': 'Monster', 'popularity': 90.0})
+    catalog.add({'id': 4, 'name': 'Monster', 'popularity': 10.0, 'genre_ids': [16]})
+    catalog.add({'id': 5, 'name': 'Monster', 'popularity': 50.0, 'genre_ids': [18]})
+
+    assert [show['id'] for show, _ in catalog.candidates('Monster')] == [4, 3, 5]
+
+
+def test_renamed_show_no_longer_resolves_by_old_title():
+    catalog = ShowCatalog()
+    catalog.add({'id': 6, 'name': 'Untitled Dungeon Project', 'genre_ids': [16]})
+    catalog.add({'id': 6, 'name': 'Delicious in Dungeon'})
+
+    assert catalog.lookup('Delicious in Dungeon')['id'] == 6
+    assert catalog.lookup('Untitled Dungeon Project') is None
+    assert 'untitled dungeon project' not in catalog.titles
+    assert not any('untitled dungeon project' in posting for posting in catalog.postings.values())
@@ -0,0 +1,51 @@
+import pytest
+
+from tmdb_api import CircuitBreaker, CircuitOpenError, TMDBApi
+
+
+def test_breaker_opens_after_threshold():
+    breaker = CircuitBreaker(3)
+    for _ in range(3):
+        breaker.check()
+        breaker.record_failure()
+    assert breaker.is_open
+    with pytest.raises(CircuitOpenError):
+        breaker.check()
+
+
+def test_success_resets_failure_count_while_closed():
+    breaker = CircuitBreaker(3)
+    breaker.record_failure()
+    breaker.record_failure()
+    breaker.record_success()
+    breaker.record_failure()
+    assert not breaker.is_open
+
+
+def test_success_does_not_close_open_breaker():
+    breaker = CircuitBreaker(1)
+    breaker.record_failure()
+    breaker.record_success()
+    assert breaker.is_open
+
+
+def test_reset_closes_open_breaker():
+    breaker = CircuitBreaker(2)
+    breaker.record_failure()
+    breaker.record_failure()
+    breaker.reset()
+    assert not breaker.is_open
+    breaker.check()
+
+
+def test_catalog_and_fixtures_are_saved_separately(tmp_path):
+    catalog_file = tmp_path / 'catalog.json'
+    tmdb_api = TMDBApi(api_key='key', cache_file=False, catalog_file=str(catalog_file))
+    tmdb_api.catalog.add({'id': 1, 'name': 'The Apothecary Diaries', 'genre_ids': [16]})
+
+    assert not tmdb_api.save_fixtures()
+    assert not catalog_file.exists()
+
+    assert tmdb_api.save_catalog()
+    assert catalog_file.exists()
+    assert not tmdb_api.save_catalog()
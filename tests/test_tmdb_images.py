@@ -0,0 +1,42 @@
+import pytest
+
+from tmdb_images import DEFAULT_IMAGE_CONFIGURATION, ImageSizes, pick_size
+
+STILL_SIZES = DEFAULT_IMAGE_CONFIGURATION['still_sizes']
+
+
+@pytest.mark.parametrize('width, expected', [
+    (1, 'w92'),
+    (92, 'w92'),
+    (93, 'w185'),
+    (300, 'w300'),
+    (301, 'original'),
+])
+def test_pick_size(width, expected):
+    assert pick_size(STILL_SIZES, width) == expected
+
+
+def test_pick_size_without_original_falls_back_to_largest_width():
+    assert pick_size(['w45', 'h632', 'w185'], 500) == 'w185'
+    assert pick_size(['h632'], 100) == 'original'
+
+
+def test_size_for_uses_type_sizes():
+    sizes = ImageSizes()
+    assert sizes.size_for('poster', 'preview') == 'w185'
+    assert sizes.size_for('poster', 'thumbnail') == 'w342'
+    assert sizes.size_for('still', 'thumbnail') == 'w300'
+    assert sizes.size_for('still', None) == 'original'
+
+
+def test_url_uses_configured_base():
+    sizes = ImageSizes({'images': {'secure_base_url': 'https://images.example/', 'still_sizes': ['w500']}})
+    assert sizes.url('/still.jpg', 'still', 'badge') == 'https://images.example/w500/still.jpg'
+
+
+def test_resize_url_only_rewrites_tmdb_urls():
+    sizes = ImageSizes()
+    assert (sizes.resize_url('https://image.tmdb.org/t/p/original/poster.jpg', 'badge')
+            == 'https://image.tmdb.org/t/p/w92/poster.jpg')
+    assert sizes.resize_url('https://example.com/poster.jpg', 'badge') == 'https://example.com/poster.jpg'
+    assert sizes.resize_url(None, 'badge') is None
@@ -0,0 +1,38 @@
+import threading
+
+from update_calendar_images import ImageLookupPlan, execute_plan
+
+
+class FakeTMDBApi:
+    """Stills for every episode of "Has Stills", none for "No Stills"."""
+
+    def __init__(self):
+        self.fallback_lookups = []
+        self._lock = threading.Lock()
+
+    def search_anime(self, title):
+        return {'results': [{'id': 1}]}
+
+    def get_episode_image(self, series, season, episode):
+        if series == 'Has Stills':
+            return {'episode_still': f"https://image.tmdb.org/t/p/w300/{season}-{episode}.jpg"}
+        return None
+
+    def get_anime_images(self, series, season):
+        with self._lock:
+            self.fallback_lookups.append((series, season))
+        return {'poster': 'https://image.tmdb.org/t/p/w300/poster.jpg'}
+
+
+def test_execute_plan_only_falls_back_for_seasons_missing_stills():
+    plan = ImageLookupPlan()
+    for episode in range(1, 4):
+        plan.add_event(None, 'Has Stills', 1, episode, f"2025060{episode}T120000Z")
+        plan.add_event(None, 'No Stills', 2, episode, f"2025050{episode}T120000Z")
+
+    api = FakeTMDBApi()
+    episode_images, show_images = execute_plan(plan, api, workers=2)
+
+    assert api.fallback_lookups == [('No Stills', 2)]
+    assert set(show_images) == {('No Stills', 2)}
+    assert episode_images[('Has Stills', 1, 2)]['episode_still'].endswith('/1-2.jpg')
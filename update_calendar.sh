@@ -78,6 +78,14 @@ python scripts/final_cleanup.py
 if python scripts/refresh_calendar.py $PREVIEW; then
   log_success "Calendar updated successfully!"
   
+  # Export the schedule as JSON for the website and other tools
+  log_info "Exporting schedule data to docs/data..."
+  python scripts/export_json.py --ics-file main.ics --output-dir docs/data
+  
+  # Regenerate the pages of the schedule site whose events changed
+  log_info "Updating the schedule site in docs/schedule..."
+  python scripts/build_site.py --ics-file main.ics --output-dir docs/schedule
+  
   # Show next steps
   echo -e "\n${BOLD}Next Steps:${RESET}"
   echo "1. If you've made changes to the calendar, commit them to Git"